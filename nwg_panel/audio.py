@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+"""
+In-process PulseAudio client, based on the optional `pulsectl` module. It also works with PipeWire, through
+pipewire-pulse. If the module is missing or the server can't be reached, `get_audio()` returns None, and the
+callers in tools fall back to `pactl` / `pamixer` commands.
+
+Requests share a single connection. Server events are received on a second connection, on a separate thread,
+and coalesced into one state fetch per burst, which is passed to subscribers on the GTK main loop. Volume changes
+are sent asynchronously: while a slider is being dragged, only the latest value for each sink / sink input is sent.
+"""
+
+import sys
+import threading
+import time
+
+from gi.repository import GLib
+
+try:
+    import pulsectl
+except ImportError:
+    pulsectl = None
+
+CLIENT_NAME = "nwg-panel"
+EVENT_DEBOUNCE = 20  # ms
+
+_backend = None
+_unavailable = False
+_backend_lock = threading.Lock()
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def sink_volume(sink):
+    # like `pactl get-sink-volume`, we take the loudest channel
+    return int(round(max(sink.volume.values) * 100)), bool(sink.mute)
+
+
+def sink_balance(sink):
+    # same as pa_cvolume_get_balance
+    left = [v for c, v in zip(sink.channel_list, sink.volume.values) if "left" in c]
+    right = [v for c, v in zip(sink.channel_list, sink.volume.values) if "right" in c]
+    if not left or not right:
+        return 0.0
+
+    left = sum(left) / len(left)
+    right = sum(right) / len(right)
+    if left == right:
+        return 0.0
+    elif left > right:
+        return -1.0 + right / left
+    else:
+        return 1.0 - left / right
+
+
+class AudioBackend:
+    def __init__(self):
+        self.pulse = pulsectl.Pulse(CLIENT_NAME)
+        self.lock = threading.Lock()
+
+        self.callbacks = []
+        self.state = None
+        self.coalescer = None
+
+        self.pending = {}  # {key: (function, args)} writes not sent yet
+        self.pending_lock = threading.Lock()
+        self.write_event = threading.Event()
+        self.writer = None
+
+    def start(self):
+        """
+        Start listening to server events; called on the first `connect`.
+        """
+        from nwg_panel.compositor_state import EventCoalescer
+        self.coalescer = EventCoalescer(self.fetch, self.dispatch, debounce=EVENT_DEBOUNCE)
+        self.coalescer.start()
+
+        thread = threading.Thread(target=self.listen, daemon=True)
+        thread.start()
+
+    def connect(self, callback, owner=None):
+        """
+        Register `callback(state)` to be called on the main loop whenever the default sink changes, where `state`
+        is `{"volume": (value, muted), "balance": float}`. The callback is removed when the `owner` gets destroyed.
+        """
+        self.callbacks.append(callback)
+        if owner:
+            owner.connect("destroy", lambda *args: self.disconnect(callback))
+
+        if not self.coalescer:
+            self.start()
+        elif self.state:
+            GLib.idle_add(self.dispatch_one, callback, self.state)
+
+    def disconnect(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def listen(self):
+        while True:
+            try:
+                with pulsectl.Pulse("{}-events".format(CLIENT_NAME)) as pulse:
+                    pulse.event_mask_set("sink", "server")
+                    pulse.event_callback_set(self.on_event)
+                    # (re)connected: get the current state
+                    self.coalescer.queue("server")
+                    pulse.event_listen()
+            except Exception as e:
+                eprint("Audio events: {}".format(e))
+            time.sleep(3)
+
+    def on_event(self, event):
+        # no requests allowed here, just pass the event to the coalescer
+        self.coalescer.queue(str(event.facility))
+
+    def fetch(self):
+        sink = self.default_sink()
+        return {"volume": sink_volume(sink), "balance": sink_balance(sink)}
+
+    def dispatch(self, state, changes):
+        self.state = state
+        for callback in list(self.callbacks):
+            self.dispatch_one(callback, state)
+
+    def dispatch_one(self, callback, state):
+        try:
+            callback(state)
+        except Exception as e:
+            eprint("Audio callback error: {}".format(e))
+
+        # GLib.SOURCE_REMOVE
+        return False
+
+    def request(self, method, *args):
+        """
+        Call a pulsectl method on the shared connection, reconnect once if the server has gone away.
+        """
+        with self.lock:
+            try:
+                return getattr(self.pulse, method)(*args)
+            except pulsectl.PulseDisconnected:
+                self.pulse.close()
+                self.pulse = pulsectl.Pulse(CLIENT_NAME)
+                return getattr(self.pulse, method)(*args)
+
+    def write(self, key, function, *args):
+        """
+        Send a write request asynchronously. Requests of the same key not sent yet are replaced.
+        """
+        with self.pending_lock:
+            self.pending[key] = (function, args)
+            if not self.writer:
+                self.writer = threading.Thread(target=self.write_loop, daemon=True)
+                self.writer.start()
+        self.write_event.set()
+
+    def write_loop(self):
+        while True:
+            self.write_event.wait()
+            with self.pending_lock:
+                self.write_event.clear()
+                pending = self.pending
+                self.pending = {}
+
+            for function, args in pending.values():
+                try:
+                    function(*args)
+                except Exception as e:
+                    eprint("Audio: {}".format(e))
+
+    def default_sink(self):
+        name = self.request("server_info").default_sink_name
+        return self.request("get_sink_by_name", name)
+
+    def get_volume(self):
+        return sink_volume(self.default_sink())
+
+    def get_balance(self):
+        return sink_balance(self.default_sink())
+
+    def list_sinks(self):
+        default_sink = self.request("server_info").default_sink_name
+        return [{"name": sink.name, "desc": sink.description, "running": sink.name == default_sink}
+                for sink in self.request("sink_list")]
+
+    def list_sink_inputs(self):
+        """
+        Same structure as parsed from `pactl list sink-inputs`, as far as the Controls popup needs it.
+        """
+        sink_inputs = {}
+        for inp in self.request("sink_input_list"):
+            sink_inputs[str(inp.index)] = {"Properties": dict(inp.proplist),
+                                           "Volume": "{}%".format(int(round(inp.volume.value_flat * 100)))}
+        return sink_inputs
+
+    def toggle_mute(self):
+        sink = self.default_sink()
+        self.request("mute", sink, not sink.mute)
+
+    def set_default_sink(self, name):
+        self.request("default_set", self.request("get_sink_by_name", name))
+
+    def set_volume(self, left, right):
+        self.write("sink", self.apply_volume, left, right)
+
+    def set_sink_input_volume(self, index, percent):
+        self.write(("sink-input", index), self.apply_sink_input_volume, index, percent)
+
+    def apply_volume(self, left, right):
+        sink = self.default_sink()
+        values = []
+        for channel in sink.channel_list:
+            if "left" in channel:
+                values.append(left / 100)
+            elif "right" in channel:
+                values.append(right / 100)
+            else:
+                values.append(max(left, right) / 100)
+        self.request("volume_set", sink, pulsectl.PulseVolumeInfo(values))
+
+    def apply_sink_input_volume(self, index, percent):
+        inp = self.request("sink_input_info", int(index))
+        self.request("volume_set_all_chans", inp, percent / 100)
+
+
+def get_audio():
+    """
+    :return: AudioBackend, or None if pulsectl is not installed or the server is not available
+    """
+    global _backend, _unavailable
+    with _backend_lock:
+        if _backend is None and not _unavailable:
+            if pulsectl is None:
+                _unavailable = True
+            else:
+                try:
+                    _backend = AudioBackend()
+                except Exception as e:
+                    eprint("Couldn't connect to the audio server: {}, falling back to pactl/pamixer".format(e))
+                    _unavailable = True
+
+    return _backend
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+"""
+In-process backlight control.
+
+For the `brightnessctl` and `light` controllers, brightness is read from /sys/class/backlight/<device>. The kernel
+notifies changes on `actual_brightness` (sysfs_notify), which we watch on the GTK main loop, so no polling is needed.
+The `ddcutil` controller still uses the command, but all its calls are serialized, as each DDC request takes
+hundreds of milliseconds.
+
+Writes are asynchronous and rate-limited: a single writer thread per device sends the latest requested value,
+values requested in the meantime are dropped. The sysfs value is written directly if the file is writable,
+through logind `SetBrightness` otherwise.
+"""
+
+import abc
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from gi.repository import GLib
+
+import nwg_panel.common
+
+try:
+    from dasbus.connection import SystemMessageBus
+except ImportError:
+    SystemMessageBus = None
+
+BACKLIGHT_DIR = "/sys/class/backlight"
+MIN_WRITE_INTERVAL = 0.05  # seconds
+
+_backlights = {}
+_backlights_lock = threading.Lock()
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+class Backlight(abc.ABC):
+    # True if change notifications are available, and polling is not needed
+    notifies = False
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = None
+        self.wake = threading.Event()
+        self.writer = None
+        self.writing = False
+
+    def set(self, percent):
+        """
+        Asynchronous; the latest requested value wins.
+        """
+        with self.lock:
+            self.pending = percent
+            self.writing = True
+            if not self.writer:
+                self.writer = threading.Thread(target=self.write_loop, daemon=True)
+                self.writer.start()
+        self.wake.set()
+
+    def write_loop(self):
+        while True:
+            self.wake.wait()
+            with self.lock:
+                self.wake.clear()
+                percent = self.pending
+                self.pending = None
+            if percent is None:
+                continue
+
+            try:
+                self.write(percent)
+            except Exception as e:
+                eprint("Backlight: {}".format(e))
+
+            time.sleep(MIN_WRITE_INTERVAL)
+            with self.lock:
+                if self.pending is None:
+                    self.writing = False
+
+    @abc.abstractmethod
+    def get(self):
+        """
+        :return: current brightness [%]
+        """
+
+    @abc.abstractmethod
+    def write(self, percent):
+        """
+        Blocking; called on the writer thread only.
+        """
+
+
+class SysfsBacklight(Backlight):
+    notifies = True
+
+    def __init__(self, path):
+        Backlight.__init__(self)
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "max_brightness")) as f:
+            self.max_brightness = int(f.read())
+
+        self.callbacks = []
+        self.fd = None
+        self.session = None
+
+    def to_percent(self, value):
+        return int(round(value * 100 / self.max_brightness, 0))
+
+    def get(self):
+        with open(os.path.join(self.path, "brightness")) as f:
+            return self.to_percent(int(f.read()))
+
+    def write(self, percent):
+        value = max(round(percent * self.max_brightness / 100), 1)
+        brightness_file = os.path.join(self.path, "brightness")
+        if os.access(brightness_file, os.W_OK):
+            with open(brightness_file, "w") as f:
+                f.write(str(value))
+        else:
+            if not SystemMessageBus:
+                raise RuntimeError("{} is not writable, and dasbus is not available".format(brightness_file))
+            if not self.session:
+                self.session = SystemMessageBus().get_proxy("org.freedesktop.login1",
+                                                            "/org/freedesktop/login1/session/auto")
+            self.session.SetBrightness("backlight", self.name, value)
+
+    def connect(self, callback, owner=None):
+        """
+        Register `callback(percent)` to be called on the main loop, whenever the brightness changes.
+        """
+        self.callbacks.append(callback)
+        if owner:
+            owner.connect("destroy", lambda *args: self.disconnect(callback))
+
+        if self.fd is None:
+            self.watch()
+        GLib.idle_add(self.dispatch_one, callback, self.get())
+
+    def disconnect(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def watch(self):
+        # sysfs_notify wakes up poll() with POLLPRI | POLLERR; the file must be read again to re-arm it
+        self.fd = os.open(os.path.join(self.path, "actual_brightness"), os.O_RDONLY)
+        os.read(self.fd, 32)
+        GLib.io_add_watch(self.fd, GLib.PRIORITY_DEFAULT, GLib.IO_PRI | GLib.IO_ERR, self.on_notify)
+
+    def on_notify(self, fd, condition):
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            percent = self.to_percent(int(os.read(fd, 32)))
+        except ValueError:
+            return True
+
+        # skip values we're just writing, so that a slider being dragged doesn't jump back
+        if not self.writing:
+            for callback in list(self.callbacks):
+                self.dispatch_one(callback, percent)
+
+        return True
+
+    def dispatch_one(self, callback, percent):
+        try:
+            callback(percent)
+        except Exception as e:
+            eprint("Backlight callback error: {}".format(e))
+
+        # GLib.SOURCE_REMOVE
+        return False
+
+
+class DdcutilBacklight(Backlight):
+    def __init__(self, bus):
+        Backlight.__init__(self)
+        self.bus = bus
+        # serializes all ddcutil calls, as the display can only handle one at a time
+        self.ddc_lock = threading.Lock()
+
+    def get(self):
+        cmd = ["ddcutil", "getvcp", "10"]
+        if self.bus:
+            cmd.append("--bus={}".format(self.bus))
+        with self.ddc_lock:
+            output = subprocess.check_output(cmd).decode("utf-8")
+        return int(output.split("current value =")[1].split(",")[0])
+
+    def write(self, percent):
+        cmd = ["ddcutil", "setvcp", "10", str(max(percent, 1))]
+        if self.bus:
+            cmd.append("--bus={}".format(self.bus))
+        with self.ddc_lock:
+            subprocess.call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+
+def find_backlight_dir(device=""):
+    # `light` takes e.g. "sysfs/backlight/intel_backlight", `brightnessctl` just the device name
+    name = os.path.basename(device.rstrip("/")) if device else ""
+    if name:
+        path = os.path.join(BACKLIGHT_DIR, name)
+        return path if os.path.isdir(path) else None
+
+    try:
+        names = sorted(os.listdir(BACKLIGHT_DIR))
+    except OSError:
+        return None
+    return os.path.join(BACKLIGHT_DIR, names[0]) if names else None
+
+
+def get_backlight(device="", controller=""):
+    """
+    :return: Backlight shared by all callers with the same device & controller, or None if tools should use
+    the controller command instead
+    """
+    key = (device, controller)
+    with _backlights_lock:
+        if key not in _backlights:
+            backlight = None
+            try:
+                if controller in ("brightnessctl", "light"):
+                    path = find_backlight_dir(device)
+                    if path:
+                        backlight = SysfsBacklight(path)
+                elif controller == "ddcutil" and nwg_panel.common.commands["ddcutil"]:
+                    backlight = DdcutilBacklight(device)
+            except Exception as e:
+                eprint("Backlight '{}': {}".format(device, e))
+            _backlights[key] = backlight
+
+        return _backlights[key]
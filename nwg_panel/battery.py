@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""
+Battery monitor shared by all Controls instances.
+
+Battery data is read straight from /sys/class/power_supply; multiple batteries are summed up by energy. If UPower
+is available, its `PropertiesChanged` signal on the DisplayDevice triggers a re-read, and polling is only used as
+a safety net. Subscribers are only called when the percentage, the charging state or the time left change.
+"""
+
+import os
+
+from gi.repository import GLib
+
+from nwg_panel.tools import eprint, get_battery, seconds2string
+from nwg_panel.scheduler import schedule
+
+try:
+    from dasbus.connection import SystemMessageBus
+except ImportError:
+    SystemMessageBus = None
+
+POWER_SUPPLY_DIR = "/sys/class/power_supply"
+POLL_INTERVAL = 5  # seconds, without UPower
+UPOWER_POLL_INTERVAL = 60  # seconds, just in case we missed a signal
+
+_monitor = None
+
+
+def read_value(path, name):
+    try:
+        with open(os.path.join(path, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def read_int(path, name):
+    value = read_value(path, name)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_sysfs():
+    """
+    :return: (percent, time left, charging) as in tools.get_battery, or None if no system battery found
+    """
+    energy_now = energy_full = power = 0
+    capacities = []
+    charging = discharging = ac_online = False
+    found = False
+
+    try:
+        supplies = sorted(os.listdir(POWER_SUPPLY_DIR))
+    except OSError:
+        return None
+
+    for name in supplies:
+        path = os.path.join(POWER_SUPPLY_DIR, name)
+        supply_type = read_value(path, "type")
+        if supply_type == "Mains":
+            if read_value(path, "online") == "1":
+                ac_online = True
+            continue
+        # skip peripherals, like wireless mice
+        if supply_type != "Battery" or read_value(path, "scope") == "Device":
+            continue
+        found = True
+
+        status = read_value(path, "status")
+        if status == "Charging":
+            charging = True
+        elif status == "Discharging":
+            discharging = True
+
+        # energy in µWh, or charge in µAh, to be converted with the voltage in µV
+        voltage = read_int(path, "voltage_now") or read_int(path, "voltage_min_design")
+        now = read_int(path, "energy_now")
+        full = read_int(path, "energy_full")
+        rate = read_int(path, "power_now")
+        if now is None and voltage:
+            charge_now = read_int(path, "charge_now")
+            charge_full = read_int(path, "charge_full")
+            current = read_int(path, "current_now")
+            if charge_now is not None and charge_full:
+                now = charge_now * voltage // 1000000
+                full = charge_full * voltage // 1000000
+            if current is not None:
+                rate = current * voltage // 1000000
+
+        if now is not None and full:
+            energy_now += now
+            energy_full += full
+            if rate and status in ("Charging", "Discharging"):
+                power += abs(rate)
+        else:
+            capacity = read_int(path, "capacity")
+            if capacity is not None:
+                capacities.append(capacity)
+
+    if not found:
+        return None
+
+    if energy_full:
+        percent = min(round(100 * energy_now / energy_full), 100)
+    elif capacities:
+        percent = round(sum(capacities) / len(capacities))
+    else:
+        return None
+
+    seconds = 0
+    if power and energy_full:
+        if charging:
+            seconds = int((energy_full - energy_now) * 3600 / power)
+        elif discharging:
+            seconds = int(energy_now * 3600 / power)
+    time = seconds2string(seconds) if seconds > 0 else ""
+
+    # like psutil's `power_plugged`
+    return percent, time, charging or (ac_online and not discharging)
+
+
+class BatteryMonitor:
+    def __init__(self):
+        self.callbacks = []
+        self.state = None
+        self.bus = None
+        self.proxy = None
+
+        interval = UPOWER_POLL_INTERVAL if self.subscribe_upower() else POLL_INTERVAL
+        self.job = schedule(self.update, interval)
+
+    def subscribe_upower(self):
+        if not SystemMessageBus:
+            return False
+        try:
+            self.bus = SystemMessageBus()
+            self.proxy = self.bus.get_proxy("org.freedesktop.UPower", "/org/freedesktop/UPower/devices/DisplayDevice")
+            self.proxy.PropertiesChanged.connect(self.on_properties_changed)
+            return True
+        except Exception as e:
+            eprint("UPower not available, polling battery data: {}".format(e))
+            return False
+
+    def on_properties_changed(self, interface, changed, invalidated):
+        self.job.run_now()
+
+    def connect(self, callback, owner=None):
+        """
+        Register `callback((percent, time, charging))` to be called on the main loop on battery state changes.
+        """
+        self.callbacks.append(callback)
+        if owner:
+            owner.connect("destroy", lambda *args: self.disconnect(callback))
+        if self.state:
+            GLib.idle_add(self.dispatch_one, callback, self.state)
+
+    def disconnect(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def update(self):
+        state = read_sysfs()
+        if state is None:
+            state = get_battery()
+        if state != self.state:
+            self.state = state
+            GLib.idle_add(self.dispatch, state)
+
+    def dispatch(self, state):
+        for callback in list(self.callbacks):
+            self.dispatch_one(callback, state)
+
+        # GLib.SOURCE_REMOVE
+        return False
+
+    def dispatch_one(self, callback, state):
+        try:
+            callback(state)
+        except Exception as e:
+            eprint("Battery callback error: {}".format(e))
+
+        return False
+
+
+def battery_monitor():
+    global _monitor
+    if _monitor is None:
+        _monitor = BatteryMonitor()
+    return _monitor
@@ -0,0 +1,13 @@
+"""
+Headless benchmark of the taskbar & workspaces modules.
+
+Stand-in IPC servers for sway, Hyprland and niri replay recorded event traces to the real modules, running
+under Xvfb or the GTK Broadway backend. Reports per-event refresh latency, refresh counts, IPC calls and
+(optionally) allocations. Usage:
+
+    python -m nwg_panel.benchmark [-c sway hyprland niri] [-t open-windows workspace-burst] [-b xvfb]
+
+The weather provider is checked separately, against a stand-in HTTP server:
+
+    python -m nwg_panel.benchmark.weather
+"""
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark runner. Every compositor / trace pair runs in a separate process, as the panel reads the compositor
+sockets from the environment on import. The parent starts the display server (Xvfb or broadwayd), collects
+results and prints the report.
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from nwg_panel.benchmark.world import World, TRACES, populate
+
+COMPOSITORS = ["sway", "hyprland", "niri"]
+SOCKET_VARS = ["SWAYSOCK", "I3SOCK", "HYPRLAND_INSTANCE_SIGNATURE", "NIRI_SOCKET"]
+STEP_TIMEOUT = 5  # seconds
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(round(p / 100 * (len(values) - 1))), len(values) - 1)]
+
+
+class Recorder:
+    """
+    Wraps the `refresh` method of module instances, to record when and how long they ran.
+    """
+
+    def __init__(self, allocations=False):
+        self.allocations = allocations
+        self.lock = threading.Lock()
+        self.records = []  # [(module name, start, end, allocated bytes peak)]
+        self.last_end = 0
+
+    def wrap(self, module):
+        refresh = module.refresh
+        name = type(module).__name__
+
+        def timed_refresh(*args, **kwargs):
+            base = 0
+            if self.allocations:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            try:
+                return refresh(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                peak = tracemalloc.get_traced_memory()[1] - base if self.allocations else 0
+                with self.lock:
+                    self.records.append((name, start, end, peak))
+                    self.last_end = end
+
+        module.refresh = timed_refresh
+
+    def count(self):
+        with self.lock:
+            return len(self.records)
+
+    def since(self, idx):
+        with self.lock:
+            return self.records[idx:]
+
+    def wait_settled(self, start, settle):
+        """
+        Wait until no refresh has finished for `settle` seconds since `start`.
+        """
+        deadline = start + STEP_TIMEOUT
+        while True:
+            now = time.perf_counter()
+            with self.lock:
+                last = max(self.last_end, start)
+            if now - last >= settle or now > deadline:
+                return
+            time.sleep(0.005)
+
+
+def setup_compositor(compositor, world, tmp_dir):
+    """
+    Start the stand-in server, and point the environment to it. Must be called before importing the panel.
+    """
+    from nwg_panel.benchmark.servers import SwayServer, HyprlandServer, NiriServer
+
+    if compositor == "sway":
+        server = SwayServer(world, os.path.join(tmp_dir, "sway-ipc.sock"))
+        os.environ["SWAYSOCK"] = server.path
+    elif compositor == "hyprland":
+        os.environ["XDG_RUNTIME_DIR"] = tmp_dir
+        os.environ["HYPRLAND_INSTANCE_SIGNATURE"] = "benchmark"
+        server = HyprlandServer(world, os.path.join(tmp_dir, "hypr", "benchmark"))
+    else:
+        server = NiriServer(world, os.path.join(tmp_dir, "niri.sock"))
+        os.environ["NIRI_SOCKET"] = server.path
+    server.start()
+
+    return server
+
+
+def create_modules(compositor, world, debounce):
+    """
+    Create the modules the way the panel does, and start the panel's own event watchers.
+    """
+    from nwg_panel import main as panel
+    from nwg_panel import common
+    from nwg_panel.tools import h_modules_get_all, niri_get_all
+
+    panel.common_settings = {"event-debounce": debounce, "restart-on-display": False, "restart-delay": 500}
+    modules = []
+    if compositor == "sway":
+        from nwg_panel.modules.sway_taskbar import SwayTaskbar
+        from nwg_panel.modules.sway_workspaces import SwayWorkspaces
+        modules.append(SwayTaskbar({}, common.i3, "top", display_name=world.output))
+        modules.append(SwayWorkspaces({"numbers": [str(num) for num in world.workspaces]}, common.i3, ""))
+
+        common.compositor_state.start(debounce=debounce)
+        thread = threading.Thread(target=common.i3.main, daemon=True)
+        thread.start()
+
+    elif compositor == "hyprland":
+        from nwg_panel.modules.hyprland_taskbar import HyprlandTaskbar
+        from nwg_panel.modules.hyprland_workspaces import HyprlandWorkspaces
+        monitors, workspaces, clients, activewindow, activeworkspace = h_modules_get_all()
+        taskbar = HyprlandTaskbar({}, "top", monitors, workspaces, clients, activewindow,
+                                  display_name=world.output)
+        common.h_taskbars_list.append(taskbar)
+        ws = HyprlandWorkspaces({}, world.output, monitors, workspaces, clients, activewindow, activeworkspace, "")
+        common.h_workspaces_list.append(ws)
+        modules += [taskbar, ws]
+
+        thread = threading.Thread(target=panel.hypr_watcher, daemon=True)
+        thread.start()
+
+    else:
+        from nwg_panel.modules.niri_taskbar import NiriTaskbar
+        outputs, workspaces, windows, focused_window = niri_get_all()
+        taskbar = NiriTaskbar({}, "top", outputs, workspaces, windows, focused_window, display_name=world.output)
+        common.niri_taskbars_list.append(taskbar)
+        modules.append(taskbar)
+
+        thread = threading.Thread(target=panel.niri_watcher, daemon=True)
+        thread.start()
+
+    return modules
+
+
+def run_trace(compositor, trace, args):
+    tmp_dir = tempfile.mkdtemp(prefix="nwg-panel-benchmark-")
+    world = World()
+    populate(world)
+    steps = TRACES[trace](world)
+    server = setup_compositor(compositor, world, tmp_dir)
+
+    if args.allocations:
+        tracemalloc.start()
+
+    import gi
+    gi.require_version('Gtk', '3.0')
+    from gi.repository import Gtk, GLib
+
+    modules = create_modules(compositor, world, args.debounce)
+    recorder = Recorder(allocations=args.allocations)
+    for module in modules:
+        recorder.wrap(module)
+
+    win = Gtk.Window()
+    box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+    win.add(box)
+    for module in modules:
+        box.pack_start(module, False, False, 0)
+    win.show_all()
+
+    result = {"compositor": compositor, "trace": trace, "steps": len(steps)}
+
+    def drive():
+        settle = args.settle / 1000
+        # let the initial state settle, and the event subscriptions get in place
+        time.sleep(0.5)
+        recorder.wait_settled(time.perf_counter(), settle)
+        server.reset_counts()
+        if args.allocations:
+            gc.collect()
+            memory_before = tracemalloc.get_traced_memory()[0]
+
+        latencies = []
+        events = 0
+        missed = 0
+        first = idx = recorder.count()
+        for step in steps:
+            with world.lock:
+                step_events = step()
+                start = time.perf_counter()
+                server.send(step_events)
+            events += len(step_events)
+
+            recorder.wait_settled(start, settle)
+            records = recorder.since(idx)
+            idx += len(records)
+            if records:
+                latencies.append((max(r[2] for r in records) - start) * 1000)
+            else:
+                missed += 1
+
+        measured = recorder.since(first)
+        durations = [(r[2] - r[1]) * 1000 for r in measured]
+        result.update({
+            "events": events,
+            "latency-ms": {"mean": sum(latencies) / len(latencies) if latencies else 0.0,
+                           "p50": percentile(latencies, 50),
+                           "p95": percentile(latencies, 95),
+                           "max": max(latencies) if latencies else 0.0},
+            "steps-without-refresh": missed,
+            "refreshes": len(measured),
+            "refreshes-by-module": {name: sum(1 for r in measured if r[0] == name) for name in
+                                    sorted(set(r[0] for r in measured))},
+            "refresh-ms": {"mean": sum(durations) / len(durations) if durations else 0.0,
+                           "max": max(durations) if durations else 0.0,
+                           "total": sum(durations)},
+            "ipc": dict(server.calls),
+            "ipc-total": sum(server.calls.values()),
+        })
+        if args.allocations:
+            gc.collect()
+            peaks = [r[3] for r in measured]
+            result["allocations-kib"] = {"peak-per-refresh": sum(peaks) / len(peaks) / 1024 if peaks else 0.0,
+                                         "net": (tracemalloc.get_traced_memory()[0] - memory_before) / 1024}
+
+        GLib.idle_add(Gtk.main_quit)
+
+    thread = threading.Thread(target=drive, daemon=True)
+    thread.start()
+    Gtk.main()
+
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return result
+
+
+def start_display(backend):
+    """
+    :return: (display server process or None, environment for the benchmark processes)
+    """
+    env = dict(os.environ)
+    for key in SOCKET_VARS:
+        env.pop(key, None)
+
+    if backend == "auto":
+        if shutil.which("Xvfb"):
+            backend = "xvfb"
+        elif shutil.which("broadwayd"):
+            backend = "broadway"
+        else:
+            backend = "current"
+
+    proc = None
+    if backend == "xvfb":
+        num = 99
+        while os.path.exists("/tmp/.X11-unix/X{}".format(num)):
+            num += 1
+        proc = subprocess.Popen(["Xvfb", ":{}".format(num), "-screen", "0", "1920x1080x24", "-nolisten", "tcp"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        env["DISPLAY"] = ":{}".format(num)
+        env["GDK_BACKEND"] = "x11"
+        env.pop("WAYLAND_DISPLAY", None)
+    elif backend == "broadway":
+        num = 5
+        proc = subprocess.Popen(["broadwayd", ":{}".format(num)], stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+        env["BROADWAY_DISPLAY"] = ":{}".format(num)
+        env["GDK_BACKEND"] = "broadway"
+    print("Display backend: {}".format(backend))
+
+    if proc:
+        time.sleep(1)
+        if proc.poll() is not None:
+            eprint("Couldn't start the {} display server".format(backend))
+            sys.exit(1)
+
+    return proc, env
+
+
+def print_report(results, allocations=False):
+    header = "{:<10}{:<18}{:>6}{:>7}{:>9}{:>9}{:>9}{:>10}{:>11}{:>7}".format(
+        "", "trace", "steps", "events", "p50 ms", "p95 ms", "max ms", "refreshes", "refresh ms", "ipc")
+    if allocations:
+        header += "{:>13}{:>10}".format("KiB/refresh", "net KiB")
+    print(header)
+    for r in results:
+        if "error" in r:
+            print("{:<10}{:<18}  {}".format(r["compositor"], r["trace"], r["error"]))
+            continue
+        line = "{:<10}{:<18}{:>6}{:>7}{:>9.1f}{:>9.1f}{:>9.1f}{:>10}{:>11.2f}{:>7}".format(
+            r["compositor"], r["trace"], r["steps"], r["events"], r["latency-ms"]["p50"], r["latency-ms"]["p95"],
+            r["latency-ms"]["max"], r["refreshes"], r["refresh-ms"]["mean"], r["ipc-total"])
+        if allocations:
+            line += "{:>13.1f}{:>10.1f}".format(r["allocations-kib"]["peak-per-refresh"],
+                                                r["allocations-kib"]["net"])
+        print(line)
+        print("{:<28}ipc: {}".format("", ", ".join("{}: {}".format(k, v) for k, v in sorted(r["ipc"].items()))))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m nwg_panel.benchmark",
+                                     description="Replay compositor event traces to the taskbar & workspaces "
+                                                 "modules, and measure the refresh cost")
+    parser.add_argument("-c", "--compositors", nargs="+", choices=COMPOSITORS, default=COMPOSITORS,
+                        help="compositors to emulate; default: all")
+    parser.add_argument("-t", "--traces", nargs="+", choices=list(TRACES), default=list(TRACES),
+                        help="traces to replay; default: all")
+    parser.add_argument("-b", "--backend", choices=["auto", "xvfb", "broadway", "current"], default="auto",
+                        help="GDK display: Xvfb, Broadway, or the current display; default: auto (Xvfb if found)")
+    parser.add_argument("-d", "--debounce", type=int, default=20,
+                        help="event debounce in milliseconds, as `event-debounce` in common settings; default: 20")
+    parser.add_argument("-s", "--settle", type=int, default=100,
+                        help="quiet time in milliseconds, after which a step is considered done; default: 100")
+    parser.add_argument("-a", "--allocations", action="store_true",
+                        help="trace allocations (slows refreshes down, compare latencies without it)")
+    parser.add_argument("-j", "--json", type=str, default="", help="save the results to a JSON file")
+    parser.add_argument("--run", nargs=3, metavar=("COMPOSITOR", "TRACE", "OUTPUT_FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        compositor, trace, output_file = args.run
+        result = run_trace(compositor, trace, args)
+        with open(output_file, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    display, env = start_display(args.backend)
+    results = []
+    try:
+        for compositor in args.compositors:
+            for trace in args.traces:
+                print("Running {} / {}...".format(compositor, trace))
+                fd, output_file = tempfile.mkstemp(prefix="nwg-panel-benchmark-", suffix=".json")
+                os.close(fd)
+                cmd = [sys.executable, "-m", "nwg_panel.benchmark", "--run", compositor, trace, output_file,
+                       "--debounce", str(args.debounce), "--settle", str(args.settle)]
+                if args.allocations:
+                    cmd.append("--allocations")
+                # the panel prints a lot; only show it if something went wrong
+                proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                try:
+                    with open(output_file) as f:
+                        results.append(json.load(f))
+                except (OSError, ValueError):
+                    eprint(proc.stdout.decode("utf-8", errors="replace"))
+                    results.append({"compositor": compositor, "trace": trace,
+                                    "error": "failed with exit code {}".format(proc.returncode)})
+                os.remove(output_file)
+    finally:
+        if display:
+            display.terminate()
+
+    print()
+    print_report(results, allocations=args.allocations)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
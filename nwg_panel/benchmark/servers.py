@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+
+"""
+Stand-in IPC servers for sway (i3ipc), Hyprland (.socket.sock / .socket2.sock) and niri.
+
+Replies are rendered from the shared World on every request, so the panel always sees the current state.
+Requests are counted by name, e.g. "GET_TREE", "j/clients" or "Windows". `send(events)` translates World events
+into each compositor's event format, and writes them to all subscribed connections.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+from collections import Counter
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def rect(x=0, y=0, width=1920, height=1080):
+    return {"x": x, "y": y, "width": width, "height": height}
+
+
+class Server:
+    def __init__(self, world):
+        self.world = world
+        self.calls = Counter()
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.sockets = []
+
+    def listen(self, path, handler):
+        if os.path.exists(path):
+            os.remove(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        sock.listen()
+        self.sockets.append(sock)
+
+        thread = threading.Thread(target=self.accept_loop, args=(sock, handler), daemon=True)
+        thread.start()
+
+    def accept_loop(self, sock, handler):
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            thread = threading.Thread(target=self.serve, args=(conn, handler), daemon=True)
+            thread.start()
+
+    def serve(self, conn, handler):
+        try:
+            handler(conn)
+        except (OSError, ValueError) as e:
+            eprint("{}: {}".format(type(self).__name__, e))
+        finally:
+            self.unsubscribe(conn)
+            conn.close()
+
+    def count(self, name):
+        with self.lock:
+            self.calls[name] += 1
+
+    def reset_counts(self):
+        with self.lock:
+            self.calls = Counter()
+
+    def subscribe(self, conn):
+        with self.lock:
+            self.subscribers.append(conn)
+
+    def unsubscribe(self, conn):
+        with self.lock:
+            if conn in self.subscribers:
+                self.subscribers.remove(conn)
+
+    def broadcast(self, data):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for conn in subscribers:
+            try:
+                conn.sendall(data)
+            except OSError:
+                self.unsubscribe(conn)
+
+    def send(self, events):
+        """
+        :param events: list of World events; must be called with the World lock held
+        """
+        raise NotImplementedError
+
+
+class SwayServer(Server):
+    MAGIC = b"i3-ipc"
+    HEADER = "=6sII"
+    HEADER_SIZE = struct.calcsize(HEADER)
+    EVENT_WORKSPACE = 0x80000000
+    EVENT_WINDOW = 0x80000003
+
+    MESSAGES = {0: "RUN_COMMAND", 1: "GET_WORKSPACES", 2: "SUBSCRIBE", 3: "GET_OUTPUTS", 4: "GET_TREE",
+                5: "GET_MARKS", 6: "GET_BAR_CONFIG", 7: "GET_VERSION", 8: "GET_BINDING_MODES", 9: "GET_CONFIG",
+                10: "SEND_TICK", 11: "SYNC", 12: "GET_BINDING_STATE", 100: "GET_INPUTS", 101: "GET_SEATS"}
+
+    def __init__(self, world, path):
+        Server.__init__(self, world)
+        self.path = path
+
+    def start(self):
+        self.listen(self.path, self.handle)
+
+    def pack(self, msg_type, payload):
+        data = json.dumps(payload).encode("utf-8")
+        return struct.pack(self.HEADER, self.MAGIC, len(data), msg_type) + data
+
+    def read_exactly(self, conn, size):
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ValueError("connection closed")
+            data += chunk
+        return data
+
+    def handle(self, conn):
+        while True:
+            try:
+                magic, length, msg_type = struct.unpack(self.HEADER, self.read_exactly(conn, self.HEADER_SIZE))
+            except ValueError:
+                return
+            payload = self.read_exactly(conn, length).decode("utf-8") if length else ""
+            name = self.MESSAGES.get(msg_type, str(msg_type))
+            self.count(name)
+
+            with self.world.lock:
+                reply = self.reply(name, payload)
+            conn.sendall(self.pack(msg_type, reply))
+            if name == "SUBSCRIBE":
+                self.subscribe(conn)
+
+    def reply(self, name, payload):
+        if name == "GET_TREE":
+            return self.tree()
+        elif name == "GET_WORKSPACES":
+            return [self.workspace(num, with_nodes=False) for num in self.existing_workspaces()]
+        elif name == "GET_OUTPUTS":
+            return [self.output()]
+        elif name == "RUN_COMMAND":
+            return [{"success": True} for _ in payload.split(";")]
+        elif name == "GET_VERSION":
+            return {"major": 1, "minor": 10, "patch": 0, "human_readable": "1.10", "loaded_config_file_name": ""}
+        elif name in ("GET_MARKS", "GET_BAR_CONFIG", "GET_INPUTS", "GET_SEATS"):
+            return []
+        elif name == "GET_BINDING_MODES":
+            return ["default"]
+        elif name == "GET_BINDING_STATE":
+            return {"name": "default"}
+        elif name == "GET_CONFIG":
+            return {"config": ""}
+        return {"success": True}
+
+    def existing_workspaces(self):
+        # like sway, list workspaces that have windows, or are focused
+        return [num for num in self.world.workspaces if num == self.world.focused_ws or self.world.windows_on(num)]
+
+    def con(self, w):
+        return {"id": 1000 + w["id"], "type": "con", "name": w["title"], "app_id": w["app_id"], "pid": w["pid"],
+                "shell": "xdg_shell", "focused": w["id"] == self.world.focused_id, "urgent": False,
+                "visible": w["workspace"] == self.world.focused_ws, "layout": "none", "orientation": "none",
+                "border": "normal", "current_border_width": 2, "percent": None, "rect": rect(),
+                "window_rect": rect(), "deco_rect": rect(0, 0, 0, 0), "geometry": rect(), "window": None,
+                "marks": [], "focus": [], "fullscreen_mode": 0, "sticky": False, "inhibit_idle": False,
+                "nodes": [], "floating_nodes": []}
+
+    def workspace(self, num, with_nodes=True):
+        windows = self.world.windows_on(num)
+        ws = {"id": 100 + num, "type": "workspace", "name": str(num), "num": num, "output": self.world.output,
+              "focused": num == self.world.focused_ws and self.world.focused_id is None,
+              "visible": num == self.world.focused_ws, "urgent": False, "layout": "splith",
+              "orientation": "horizontal", "representation": "H[{}]".format(" ".join(w["app_id"] for w in windows)),
+              "rect": rect(), "window_rect": rect(0, 0, 0, 0), "deco_rect": rect(0, 0, 0, 0),
+              "geometry": rect(0, 0, 0, 0), "border": "none", "current_border_width": 0, "percent": None,
+              "window": None, "marks": [], "focus": [1000 + w["id"] for w in reversed(windows)],
+              "fullscreen_mode": 1, "sticky": False, "floating_nodes": []}
+        ws["nodes"] = [self.con(w) for w in windows] if with_nodes else []
+        return ws
+
+    def output(self, with_nodes=False):
+        out = {"id": 4, "type": "output", "name": self.world.output, "active": True, "primary": False,
+               "make": "headless", "model": "headless", "serial": "", "scale": 1.0, "transform": "normal",
+               "current_workspace": str(self.world.focused_ws), "rect": rect(), "focused": False, "dpms": True,
+               "power": True, "modes": [], "current_mode": {"width": 1920, "height": 1080, "refresh": 60000},
+               "layout": "output", "orientation": "none", "marks": [], "focus": [], "nodes": [],
+               "floating_nodes": []}
+        if with_nodes:
+            out["nodes"] = [self.workspace(num) for num in self.existing_workspaces()]
+        return out
+
+    def tree(self):
+        scratch = {"id": 3, "type": "workspace", "name": "__i3_scratch", "num": -1, "rect": rect(), "layout": "splith",
+                   "focused": False, "marks": [], "focus": [], "nodes": [], "floating_nodes": []}
+        i3 = {"id": 2, "type": "output", "name": "__i3", "rect": rect(), "layout": "output", "focused": False,
+              "marks": [], "focus": [3], "nodes": [scratch], "floating_nodes": []}
+        return {"id": 1, "type": "root", "name": "root", "rect": rect(), "layout": "splith", "focused": False,
+                "marks": [], "focus": [4, 2], "nodes": [i3, self.output(with_nodes=True)], "floating_nodes": []}
+
+    def send(self, events):
+        data = b""
+        for kind, change, item in events:
+            if kind == "window":
+                data += self.pack(self.EVENT_WINDOW, {"change": change, "container": self.con(item)})
+            elif kind == "workspace":
+                num, old = item
+                data += self.pack(self.EVENT_WORKSPACE, {"change": change, "current": self.workspace(num),
+                                                         "old": self.workspace(old)})
+        self.broadcast(data)
+
+
+class HyprlandServer(Server):
+    def __init__(self, world, instance_dir):
+        Server.__init__(self, world)
+        self.instance_dir = instance_dir
+
+    def start(self):
+        os.makedirs(self.instance_dir, exist_ok=True)
+        self.listen(os.path.join(self.instance_dir, ".socket.sock"), self.handle_request)
+        self.listen(os.path.join(self.instance_dir, ".socket2.sock"), self.handle_events)
+
+    def handle_request(self, conn):
+        # like Hyprland: one request per connection, then close
+        request = conn.recv(65536).decode("utf-8", errors="replace")
+        if request.startswith("[[BATCH]]"):
+            commands = request[len("[[BATCH]]"):].split(";")
+        else:
+            commands = [request]
+
+        replies = []
+        with self.world.lock:
+            for cmd in commands:
+                self.count(cmd.split()[0] if cmd.startswith("dispatch") else cmd)
+                replies.append(self.reply(cmd.strip()))
+        conn.sendall("\n\n".join(replies).encode("utf-8"))
+
+    def handle_events(self, conn):
+        self.subscribe(conn)
+        # keep the connection open, until the client is gone
+        while conn.recv(1024):
+            pass
+
+    @staticmethod
+    def address(w):
+        return "0x{:x}".format(0x55550000 + w["id"])
+
+    def client(self, w):
+        return {"address": self.address(w), "mapped": True, "hidden": False, "at": [0, 0], "size": [1920, 1080],
+                "workspace": {"id": w["workspace"], "name": str(w["workspace"])}, "floating": w["floating"],
+                "pseudo": False, "monitor": 0, "class": w["app_id"], "title": w["title"],
+                "initialClass": w["app_id"], "initialTitle": w["title"], "pid": w["pid"], "xwayland": False,
+                "pinned": False, "fullscreen": 0, "fullscreenClient": 0, "grouped": [], "tags": [],
+                "swallowing": "0x0", "focusHistoryID": 0 if w["id"] == self.world.focused_id else 1,
+                "inhibitingIdle": False}
+
+    def workspace(self, num):
+        windows = self.world.windows_on(num)
+        return {"id": num, "name": str(num), "monitor": self.world.output, "monitorID": 0, "windows": len(windows),
+                "hasfullscreen": False, "lastwindow": self.address(windows[-1]) if windows else "0x0",
+                "lastwindowtitle": windows[-1]["title"] if windows else "", "ispersistent": False}
+
+    def reply(self, cmd):
+        world = self.world
+        if cmd == "j/monitors":
+            data = [{"id": 0, "name": world.output, "description": "Headless", "make": "", "model": "",
+                     "serial": "", "width": 1920, "height": 1080, "refreshRate": 60.0, "x": 0, "y": 0,
+                     "activeWorkspace": {"id": world.focused_ws, "name": str(world.focused_ws)},
+                     "specialWorkspace": {"id": 0, "name": ""}, "reserved": [0, 0, 0, 0], "scale": 1.0,
+                     "transform": 0, "focused": True, "dpmsStatus": True, "vrr": False, "disabled": False}]
+        elif cmd == "j/workspaces":
+            data = [self.workspace(num) for num in world.workspaces
+                    if num == world.focused_ws or world.windows_on(num)]
+        elif cmd == "j/clients":
+            data = [self.client(w) for w in world.windows]
+        elif cmd == "j/activewindow":
+            w = world.focused_window()
+            data = self.client(w) if w else {}
+        elif cmd == "j/activeworkspace":
+            data = self.workspace(world.focused_ws)
+        elif cmd in ("j/workspacerules", "j/devices", "j/binds"):
+            data = []
+        elif cmd.startswith("dispatch"):
+            return "ok"
+        else:
+            return "unknown request"
+        return json.dumps(data)
+
+    def send(self, events):
+        lines = []
+        for kind, change, item in events:
+            if kind == "window":
+                address = self.address(item)[2:]
+                if change == "new":
+                    lines.append("openwindow>>{},{},{},{}".format(address, item["workspace"], item["app_id"],
+                                                                  item["title"]))
+                elif change == "close":
+                    lines.append("closewindow>>{}".format(address))
+                elif change == "title":
+                    lines.append("windowtitle>>{}".format(address))
+                    lines.append("windowtitlev2>>{},{}".format(address, item["title"]))
+                elif change == "focus":
+                    lines.append("activewindow>>{},{}".format(item["app_id"], item["title"]))
+                    lines.append("activewindowv2>>{}".format(address))
+            elif kind == "workspace":
+                num, old = item
+                lines.append("workspace>>{}".format(num))
+                lines.append("workspacev2>>{},{}".format(num, num))
+        if lines:
+            self.broadcast(("\n".join(lines) + "\n").encode("utf-8"))
+
+
+class NiriServer(Server):
+    def __init__(self, world, path):
+        Server.__init__(self, world)
+        self.path = path
+
+    def start(self):
+        self.listen(self.path, self.handle)
+
+    def handle(self, conn):
+        buffer = b""
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk:
+                return
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                request = json.loads(line)
+                name = request if isinstance(request, str) else next(iter(request))
+                self.count(name)
+
+                with self.world.lock:
+                    if name == "EventStream":
+                        conn.sendall(b'{"Ok":"Handled"}\n')
+                        conn.sendall(self.pack({"WorkspacesChanged": {"workspaces": self.workspaces()}}) +
+                                     self.pack({"WindowsChanged": {"windows": self.windows()}}))
+                        self.subscribe(conn)
+                    else:
+                        conn.sendall(self.pack({"Ok": self.reply(name)}))
+
+    @staticmethod
+    def pack(message):
+        return (json.dumps(message) + "\n").encode("utf-8")
+
+    def window(self, w):
+        return {"id": w["id"], "title": w["title"], "app_id": w["app_id"], "pid": w["pid"],
+                "workspace_id": w["workspace"], "is_focused": w["id"] == self.world.focused_id,
+                "is_floating": w["floating"], "is_urgent": False}
+
+    def windows(self):
+        return [self.window(w) for w in self.world.windows]
+
+    def workspaces(self):
+        world = self.world
+        result = []
+        for num in world.workspaces:
+            windows = world.windows_on(num)
+            result.append({"id": num, "idx": num, "name": None, "output": world.output,
+                           "is_urgent": False, "is_active": num == world.focused_ws,
+                           "is_focused": num == world.focused_ws,
+                           "active_window_id": windows[-1]["id"] if windows else None})
+        return result
+
+    def reply(self, name):
+        world = self.world
+        if name == "Outputs":
+            return {"Outputs": {world.output: {"name": world.output, "make": "headless", "model": "headless",
+                                               "serial": None, "physical_size": None, "modes": [],
+                                               "current_mode": None, "vrr_supported": False,
+                                               "vrr_enabled": False,
+                                               "logical": {"x": 0, "y": 0, "width": 1920, "height": 1080,
+                                                           "scale": 1.0, "transform": "Normal"}}}}
+        elif name == "Workspaces":
+            return {"Workspaces": self.workspaces()}
+        elif name == "Windows":
+            return {"Windows": self.windows()}
+        elif name == "FocusedWindow":
+            w = world.focused_window()
+            return {"FocusedWindow": self.window(w) if w else None}
+        return "Handled"
+
+    def send(self, events):
+        data = b""
+        for kind, change, item in events:
+            if kind == "window":
+                if change in ("new", "title"):
+                    data += self.pack({"WindowOpenedOrChanged": {"window": self.window(item)}})
+                elif change == "close":
+                    data += self.pack({"WindowClosed": {"id": item["id"]}})
+                elif change == "focus":
+                    data += self.pack({"WindowFocusChanged": {"id": item["id"]}})
+            elif kind == "workspace":
+                num, old = item
+                data += self.pack({"WorkspaceActivated": {"id": num, "focused": True}})
+        if data:
+            self.broadcast(data)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+"""
+Stand-in OpenWeather / Weatherbit HTTP server, and a check of the weather provider against it. Usage:
+
+    python -m nwg_panel.benchmark.weather
+
+Replies carry an ETag, and the server answers 304 to requests that send a matching one. `update()` changes the
+data (and the ETag), `fail` makes the next N requests (to `fail_path` only, if set) fail with 503. Requests are
+counted by path and status.
+"""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from nwg_panel.weather import WeatherProvider
+
+
+def weather_reply(version):
+    return {"cod": 200, "name": "Stand-in", "dt": int(time.time()),
+            "coord": {"lat": 51.5008, "lon": -0.1246},
+            "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
+            "main": {"temp": 20.0 + version, "feels_like": 19.5, "pressure": 1015, "humidity": 60},
+            "wind": {"speed": 3.1, "deg": 240}, "clouds": {"all": 0}, "visibility": 10000,
+            "sys": {"sunrise": 1700000000, "sunset": 1700030000}, "timezone": 0}
+
+
+def forecast_reply(version):
+    items = []
+    for i in range(40):
+        items.append({"dt": 1700000000 + i * 10800,
+                      "main": {"temp": 15.0 + version + i % 8, "feels_like": 14.0, "pressure": 1012, "humidity": 70},
+                      "weather": [{"id": 500, "main": "Rain", "description": "light rain", "icon": "10d"}],
+                      "wind": {"speed": 4.2, "deg": 200}, "clouds": {"all": 75}, "pop": 0.4,
+                      "rain": {"3h": 0.5}})
+    return {"cod": "200", "cnt": len(items), "list": items, "city": {"name": "Stand-in", "timezone": 0}}
+
+
+def alerts_reply(version):
+    return {"lat": 51.5008, "lon": -0.1246, "alerts": [{"title": "Stand-in alert #{}".format(version),
+                                                        "description": "Nothing to worry about",
+                                                        "severity": "Advisory", "regions": ["Stand-in"],
+                                                        "effective_utc": "2023-11-14T22:13:20",
+                                                        "expires_utc": "2023-11-15T22:13:20"}]}
+
+
+REPLIES = {"/data/2.5/weather": weather_reply, "/data/2.5/forecast": forecast_reply, "/v2.0/alerts": alerts_reply}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = urlparse(self.path).path
+        status = self.server.owner.reply(self, path)
+        self.server.owner.count(path, status)
+
+    def log_message(self, *args):
+        pass
+
+
+class WeatherServer:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.fail = 0
+        self.fail_path = None
+        self.version = 1
+        self.calls = Counter()  # {(path, status): count}
+        self.lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        url = "http://127.0.0.1:{}".format(self.httpd.server_address[1])
+        self.owm_url = url + "/data/2.5"
+        self.weatherbit_url = url + "/v2.0"
+
+    def start(self):
+        thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def update(self):
+        with self.lock:
+            self.version += 1
+
+    def count(self, path, status):
+        with self.lock:
+            self.calls[(path, status)] += 1
+
+    def reply(self, handler, path):
+        if self.delay:
+            time.sleep(self.delay)
+        with self.lock:
+            version = self.version
+            failing = self.fail > 0 and self.fail_path in [None, path]
+            if failing:
+                self.fail -= 1
+
+        if path not in REPLIES:
+            status, body, etag = 404, b'{"cod": "404", "message": "not found"}', None
+        elif failing:
+            status, body, etag = 503, b"", None
+        else:
+            etag = '"v{}"'.format(version)
+            if handler.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+            else:
+                status, body = 200, json.dumps(REPLIES[path](version)).encode("utf-8")
+
+        handler.send_response(status)
+        if etag:
+            handler.send_header("ETag", etag)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+        return status
+
+    def take_calls(self):
+        with self.lock:
+            calls = self.calls
+            self.calls = Counter()
+        return calls
+
+
+def main():
+    server = WeatherServer(delay=0.2)
+    server.start()
+    cache_dir = tempfile.mkdtemp(prefix="nwg-weather-check-")
+
+    def new_provider():
+        return WeatherProvider(51.5008, -0.1246, "metric", "en", "appid", "weatherbit-key",
+                               owm_url=server.owm_url, weatherbit_url=server.weatherbit_url, cache_dir=cache_dir)
+
+    provider = new_provider()
+    results = []
+
+    def concurrent_fetch(p, max_age, widgets=8):
+        threads = [threading.Thread(target=lambda: results.append(p.fetch(max_age))) for _ in range(widgets)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def fail(count, path=None):
+        server.fail = count
+        server.fail_path = path
+
+    def check_weather_version():
+        # results of the previous scenario must not be revived by a 304
+        if provider.fetch(600)["weather"]["main"]["temp"] != 20.0 + server.version:
+            print("Outdated weather data  FAILED")
+            sys.exit(1)
+
+    # name, action, expected {status: count}
+    scenarios = [
+        ("8 widgets, cold", lambda: concurrent_fetch(provider, 600), {200: 3}),
+        ("8 widgets, fresh data", lambda: concurrent_fetch(provider, 600), {}),
+        ("expired, not modified", lambda: provider.fetch(0), {304: 3}),
+        ("expired, modified", lambda: (server.update(), provider.fetch(0)), {200: 3}),
+        ("restart, file cache", lambda: new_provider().fetch(600), {}),
+        ("503 x2, retried", lambda: (fail(2), server.update(), provider.fetch(0)), {503: 2, 200: 3}),
+        ("forecast failed", lambda: (fail(4, "/data/2.5/forecast"), server.update(), provider.fetch(0)),
+         {200: 2, 503: 4}),
+        ("after failed forecast", lambda: (provider.fetch(0), check_weather_version()), {200: 3}),
+    ]
+
+    failed = False
+    print("{:<26}{:>10}{:>10}  {}".format("Scenario", "requests", "ms", "statuses"))
+    for name, action, expected in scenarios:
+        del results[:]
+        start = time.perf_counter()
+        action()
+        ms = (time.perf_counter() - start) * 1000
+        statuses = Counter()
+        for (path, status), n in server.take_calls().items():
+            statuses[status] += n
+        ok = dict(statuses) == expected and all(r and r["weather"]["cod"] == 200 for r in results)
+        failed = failed or not ok
+        print("{:<26}{:>10}{:>10.0f}  {}{}".format(name, sum(statuses.values()), ms,
+                                                  dict(sorted(statuses.items())), "" if ok else "  FAILED"))
+
+    data = provider.fetch(600)
+    if data["alerts"]["alerts"][0]["title"] != "Stand-in alert #{}".format(server.version):
+        print("Alerts not updated  FAILED")
+        failed = True
+
+    server.stop()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
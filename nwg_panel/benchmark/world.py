@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+"""
+Compositor-agnostic model of outputs, workspaces and windows, and the event traces the benchmark replays.
+
+Each change to the World returns a list of events, e.g. `("window", "new", window)`, which the stand-in servers
+translate into their own wire format.
+"""
+
+import threading
+
+OUTPUT = "HEADLESS-1"
+NUM_WORKSPACES = 5
+
+APPS = ["foot", "firefox", "org.gnome.Nautilus", "thunar", "gimp", "Alacritty", "org.telegram.desktop",
+        "code", "mpv", "pavucontrol"]
+
+
+class World:
+    def __init__(self, num_workspaces=NUM_WORKSPACES):
+        self.output = OUTPUT
+        self.workspaces = list(range(1, num_workspaces + 1))
+        self.focused_ws = 1
+        self.windows = []  # [{"id", "pid", "app_id", "title", "workspace", "floating"}]
+        self.focused_id = None
+        self.next_id = 1
+        # held by the servers while rendering replies, and by the benchmark while applying a step
+        self.lock = threading.RLock()
+
+    def windows_on(self, num):
+        return [w for w in self.windows if w["workspace"] == num]
+
+    def focused_window(self):
+        for w in self.windows:
+            if w["id"] == self.focused_id:
+                return w
+        return None
+
+    def get_window(self, window_id):
+        for w in self.windows:
+            if w["id"] == window_id:
+                return w
+        return None
+
+    def open_window(self, app_id, title, num=None):
+        num = num if num else self.focused_ws
+        w = {"id": self.next_id, "pid": 10000 + self.next_id, "app_id": app_id, "title": title, "workspace": num,
+             "floating": False}
+        self.next_id += 1
+        self.windows.append(w)
+        events = [("window", "new", w)]
+        if num != self.focused_ws:
+            events += self.focus_workspace(num)
+        self.focused_id = w["id"]
+        events.append(("window", "focus", w))
+        return events
+
+    def close_window(self, w):
+        self.windows.remove(w)
+        events = [("window", "close", w)]
+        if self.focused_id == w["id"]:
+            remaining = self.windows_on(self.focused_ws)
+            self.focused_id = remaining[-1]["id"] if remaining else None
+            if remaining:
+                events.append(("window", "focus", remaining[-1]))
+        return events
+
+    def set_title(self, w, title):
+        w["title"] = title
+        return [("window", "title", w)]
+
+    def focus_workspace(self, num):
+        old = self.focused_ws
+        self.focused_ws = num
+        on_ws = self.windows_on(num)
+        self.focused_id = on_ws[-1]["id"] if on_ws else None
+        events = [("workspace", "focus", (num, old))]
+        if on_ws:
+            events.append(("window", "focus", on_ws[-1]))
+        return events
+
+
+def populate(world, count=5):
+    for i in range(count):
+        world.open_window(APPS[i % len(APPS)], "{} - window {}".format(APPS[i % len(APPS)], i + 1),
+                          num=world.workspaces[i % len(world.workspaces)])
+    world.focus_workspace(world.workspaces[0])
+
+
+# Traces: functions taking a World, returning a list of steps. A step is a function that changes the World and
+# returns events; all events of a step are sent back to back, and the benchmark waits for the panel to settle
+# before the next step. Steps containing many events model bursts. Traces are built before the servers start,
+# so any setup they do is part of the initial state.
+
+
+def trace_open_windows(world, count=50):
+    steps = []
+    for i in range(count):
+        app = APPS[i % len(APPS)]
+        num = world.workspaces[i % len(world.workspaces)]
+        steps.append(lambda app=app, i=i, num=num: world.open_window(app, "{} - new window {}".format(app, i), num))
+    return steps
+
+
+def trace_close_windows(world, count=50):
+    steps = trace_open_windows(world, count)
+    for step in steps:
+        step()
+
+    def close_last():
+        return world.close_window(world.windows[-1])
+
+    return [close_last for _ in range(count)]
+
+
+def trace_workspace_switch(world, count=100):
+    return [lambda i=i: world.focus_workspace(world.workspaces[(i + 1) % len(world.workspaces)])
+            for i in range(count)]
+
+
+def trace_workspace_burst(world, bursts=10, switches=20):
+    def burst():
+        events = []
+        for i in range(switches):
+            events += world.focus_workspace(world.workspaces[(i + 1) % len(world.workspaces)])
+        return events
+
+    return [burst for _ in range(bursts)]
+
+
+def trace_title_churn(world, count=100):
+    def change_title(i):
+        w = world.focused_window()
+        return world.set_title(w, "{} - progress {}%".format(w["app_id"], i)) if w else []
+
+    return [lambda i=i: change_title(i) for i in range(count)]
+
+
+TRACES = {
+    "open-windows": trace_open_windows,
+    "close-windows": trace_close_windows,
+    "workspace-switch": trace_workspace_switch,
+    "workspace-burst": trace_workspace_burst,
+    "title-churn": trace_title_churn,
+}
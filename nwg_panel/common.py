@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 sway = False
+debug = False  # -d / --debug argument
 
 i3 = None
+compositor_state = None  # CompositorState instance (sway only)
 
 outputs = {}
 mon_desc2output_name = {}  # {'Samsung Electric Company SyncMaster 0x4B493234': 'HDMI-A-1', (...)}
@@ -18,6 +20,7 @@ tray_list = []
 config_dir = ""
 dwl_data_file = None
 dwl_instances = []
+dwl_data = {}  # {output: {"title": ..., "selmon": ..., "tags": ..., "layout": ...}}
 name2icon_dict = {}
 scratchpad_cons = {}
 
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+"""
+Shared compositor state.
+
+A single event subscription replaces per-module state requests. Events are collected in bursts: the state is
+fetched once per burst on a worker thread, and the same snapshot is handed to all registered callbacks on the GTK
+main loop. The debounce window (`event-debounce` in common-settings.json, in milliseconds) lets a burst grow
+before the fetch starts.
+"""
+
+import threading
+import time
+
+from gi.repository import GLib
+
+from nwg_panel.tools import eprint
+
+
+class EventCoalescer:
+    def __init__(self, fetch, dispatch, debounce=0):
+        """
+        :param fetch: called on the worker thread, once per event burst; returns data to be dispatched
+        :param dispatch: called on the main loop as `dispatch(data, changes)`
+        :param debounce: time in milliseconds to wait for more events, before fetching
+        """
+        self.fetch = fetch
+        self.dispatch = dispatch
+        self.debounce = debounce
+
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.wake = threading.Event()
+        self.worker = None
+
+    def start(self):
+        if not self.worker:
+            self.worker = threading.Thread(target=self.fetch_loop, daemon=True)
+            self.worker.start()
+
+    def queue(self, change):
+        """
+        Called from the event thread for every qualifying event.
+        """
+        with self.lock:
+            self.pending.add(change)
+        self.wake.set()
+
+    def fetch_loop(self):
+        while True:
+            self.wake.wait()
+            if self.debounce > 0:
+                time.sleep(self.debounce / 1000)
+            with self.lock:
+                self.wake.clear()
+                changes = self.pending
+                self.pending = set()
+            if not changes:
+                continue
+
+            try:
+                data = self.fetch()
+            except Exception as e:
+                eprint("EventCoalescer: {}".format(e))
+                continue
+
+            GLib.idle_add(self.on_fetched, data, changes, priority=GLib.PRIORITY_HIGH)
+
+    def on_fetched(self, data, changes):
+        try:
+            self.dispatch(data, changes)
+        except Exception as e:
+            eprint("EventCoalescer dispatch error: {}".format(e))
+
+        # GLib.SOURCE_REMOVE
+        return False
+
+
+class SwaySnapshot:
+    def __init__(self, tree, workspaces, generation, changes):
+        self.tree = tree
+        self.workspaces = workspaces
+        # increases by 1 with every fetch; modules may compare it to skip redundant work
+        self.generation = generation
+        # set of (event_type, change) tuples collected in the burst, e.g. {("window", "title"), ("workspace", "focus")}
+        self.changes = changes
+
+    def has_event(self, event_types):
+        for event_type, change in self.changes:
+            if event_type in event_types:
+                return True
+        return False
+
+
+class CompositorState:
+    def __init__(self, i3):
+        self.i3 = i3
+        self.generation = 0
+        self.snapshot = None
+        self.callbacks = []  # [(callback, event_types)]
+        self.coalescer = EventCoalescer(self.fetch, self.dispatch)
+
+    def start(self, debounce=0):
+        """
+        Subscribe to i3ipc events. Must be called before the `i3.main` thread starts.
+        """
+        from i3ipc import Event
+        self.i3.on(Event.WINDOW, self.on_window_event)
+        self.i3.on(Event.WORKSPACE, self.on_workspace_event)
+
+        self.coalescer.debounce = debounce
+        self.coalescer.start()
+
+    def connect(self, callback, event_types=("window", "workspace")):
+        """
+        Register a callback to be called on the main loop as `callback(snapshot)`, if the event burst contained
+        at least one event of the given types.
+        """
+        self.callbacks.append((callback, event_types))
+
+    def disconnect(self, callback):
+        self.callbacks = [c for c in self.callbacks if c[0] != callback]
+
+    def get_snapshot(self):
+        """
+        Return the latest snapshot; fetch synchronously on first use (panel startup).
+        """
+        if not self.snapshot:
+            self.generation += 1
+            self.snapshot = SwaySnapshot(self.i3.get_tree(), self.i3.get_workspaces(), self.generation, set())
+        return self.snapshot
+
+    def on_window_event(self, i3conn, event):
+        self.coalescer.queue(("window", event.change))
+
+    def on_workspace_event(self, i3conn, event):
+        self.coalescer.queue(("workspace", event.change))
+
+    def fetch(self):
+        return self.i3.get_tree(), self.i3.get_workspaces()
+
+    def dispatch(self, data, changes):
+        tree, workspaces = data
+        self.generation += 1
+        self.snapshot = SwaySnapshot(tree, workspaces, self.generation, changes)
+        for callback, event_types in list(self.callbacks):
+            if self.snapshot.has_event(event_types):
+                try:
+                    callback(self.snapshot)
+                except Exception as e:
+                    eprint("CompositorState callback error: {}".format(e))
@@ -35,7 +35,8 @@ if not os.path.isfile(cs_file):
         "processes-background-only": False,
         "processes-own-only": True,
         "processes-interval-ms": 2000,
-        "run-through-compositor": True
+        "run-through-compositor": True,
+        "event-debounce": 20
     }
     save_json(common_settings, cs_file)
 else:
@@ -319,6 +320,20 @@ def rt_sig_handler(sig, frame):
     print("{} RT signal received".format(sig))
 
 
+def get_panel_pid():
+    """
+    :return: pid of the running nwg-panel instance, if any
+    """
+    try:
+        pid = int(load_string(os.path.join(temp_dir(), "nwg-panel.pid")))
+        with open("/proc/{}/cmdline".format(pid)) as f:
+            if "nwg-panel" in f.read():
+                return pid
+    except Exception:
+        pass
+    return None
+
+
 def handle_keyboard(window, event):
     if event.type == Gdk.EventType.KEY_RELEASE and event.keyval == Gdk.KEY_Escape:
         window.close()
@@ -331,6 +346,7 @@ def build_common_settings_window():
     check_key(common_settings, "processes-interval-ms", 2000)
     check_key(common_settings, "run-through-compositor", True)
     check_key(common_settings, "run-through-uwsm", False)
+    check_key(common_settings, "event-debounce", 20)
 
     win = Gtk.Window.new(Gtk.WindowType.TOPLEVEL)
     win.set_modal(True)
@@ -375,17 +391,27 @@ def build_common_settings_window():
     sb.set_tooltip_text(voc["processes-polling-rate-tooltip"])
     grid.attach(sb, 1, 2, 1, 1)
 
+    lbl = Gtk.Label.new(f'{voc["event-debounce"]} [ms]:')
+    lbl.set_property("halign", Gtk.Align.END)
+    grid.attach(lbl, 0, 3, 1, 1)
+
+    sb = Gtk.SpinButton.new_with_range(0, 1000, 10)
+    sb.set_value(common_settings["event-debounce"])
+    sb.connect("value-changed", set_int_from_spin_button, "event-debounce")
+    sb.set_tooltip_text(voc["event-debounce-tooltip"])
+    grid.attach(sb, 1, 3, 1, 1)
+
     cb_run_through_compositor = Gtk.CheckButton.new_with_label(voc["run-through-compositor"])
     cb_run_through_compositor.set_tooltip_text(voc["run-through-compositor-tooltip"])
     cb_run_through_compositor.set_active(common_settings["run-through-compositor"])
 
-    grid.attach(cb_run_through_compositor, 0, 3, 3, 1)
+    grid.attach(cb_run_through_compositor, 0, 4, 3, 1)
 
     cb_run_through_uwsm = Gtk.CheckButton.new_with_label(voc["run-through-uwsm"])
     cb_run_through_uwsm.set_tooltip_text(voc["run-through-uwsm-tooltip"])
     cb_run_through_uwsm.set_active(common_settings["run-through-uwsm"])
 
-    grid.attach(cb_run_through_uwsm, 0, 4, 3, 1)
+    grid.attach(cb_run_through_uwsm, 0, 5, 3, 1)
 
     cb_run_through_compositor.connect("toggled", on_compositor_check_button, cb_run_through_uwsm)
     if is_command("uwsm"):
@@ -1353,14 +1379,13 @@ class EditorWrapper(object):
             save_json(self.config, self.file)
 
         if self.delete_weather_data:
+            # Cache files are named after a hash of the location, which may be set at runtime; delete them all.
             tmp_dir = temp_dir()
-            for item in ["nwg-openweather-weather", "nwg-openweather-forecast", "nwg-weatherbit-alerts"]:
-                f = "{}-{}".format(os.path.join(tmp_dir, item), self.panel["openweather"]["module-id"])
-                if os.path.exists(f):
+            for item in os.listdir(tmp_dir):
+                if item.startswith("nwg-weather-") and item.endswith(".json"):
+                    f = os.path.join(tmp_dir, item)
                     eprint("Deleting {}".format(f))
                     os.remove(f)
-                else:
-                    eprint("{} file not found".format(f))
 
         self.panel_name_label.set_text("Editing: '{}'".format(self.panel["name"]))
         selector_window.refresh(reload=True)
@@ -1368,6 +1393,13 @@ class EditorWrapper(object):
     def restart_panel(self, *args):
         self.apply_changes()
 
+        # the running panel reloads its config in place, rebuilding only changed panels
+        pid = get_panel_pid()
+        if pid:
+            print("Reloading panels")
+            os.kill(pid, signal.SIGHUP)
+            return
+
         cmd = "nwg-panel"
         try:
             args_string = load_string(os.path.join(local_dir(), "args"))
@@ -3637,6 +3669,8 @@ class EditorWrapper(object):
             "icon-placement": "left",
             "icon-size": 16,
             "interval": 1,
+            "timeout": 30,
+            "continuous": False,
             "angle": 0.0,
             "sigrt": signal.SIGRTMIN,
             "use-sigrt": False
@@ -3661,6 +3695,7 @@ class EditorWrapper(object):
         builder.get_object("lbl-icon-placement").set_text("{}: ".format(voc["icon-placement"]))
         builder.get_object("lbl-icon-size").set_text("{}: ".format(voc["icon-size"]))
         builder.get_object("lbl-interval").set_text("{}: ".format(voc["refresh-interval"]))
+        builder.get_object("lbl-timeout").set_text("{}: ".format(voc["timeout"]))
         builder.get_object("lbl-angle").set_text("{}: ".format(voc["angle"]))
         builder.get_object("lbl-refresh-on-signal").set_text("{}: ".format(voc["refresh-on-signal"]))
 
@@ -3714,6 +3749,18 @@ class EditorWrapper(object):
         self.executor_interval.configure(adj, 1, 0)
         self.executor_interval.set_value(settings["interval"])
 
+        self.executor_continuous = builder.get_object("continuous")
+        self.executor_continuous.set_label(voc["continuous"])
+        self.executor_continuous.set_tooltip_text(voc["continuous-tooltip"])
+        self.executor_continuous.set_active(settings["continuous"])
+
+        self.executor_timeout = builder.get_object("timeout")
+        self.executor_timeout.set_tooltip_text(voc["timeout-tooltip"])
+        self.executor_timeout.set_numeric(True)
+        adj = Gtk.Adjustment(value=0, lower=0, upper=3600, step_increment=1, page_increment=10, page_size=1)
+        self.executor_timeout.configure(adj, 1, 0)
+        self.executor_timeout.set_value(settings["timeout"])
+
         self.executor_angle = builder.get_object("angle")
         self.executor_angle.set_tooltip_text(voc["angle-tooltip"])
         self.executor_angle.set_active_id(str(settings["angle"]))
@@ -3779,6 +3826,8 @@ class EditorWrapper(object):
                 settings["icon-placement"] = val
             settings["icon-size"] = int(self.executor_icon_size.get_value())
             settings["interval"] = int(self.executor_interval.get_value())
+            settings["continuous"] = self.executor_continuous.get_active()
+            settings["timeout"] = int(self.executor_timeout.get_value())
 
             try:
                 settings["angle"] = float(self.executor_angle.get_active_id())
@@ -4,15 +4,20 @@
 This command has two purposes:
 
 1. Execute commands from ~./config/nwg-panel/autostart-dwl.sh file (if found);
-2. save data provided by dwl (title, tags, layout for each output) to the cache file
-   in json format, for further use by the dwl module.
+2. pass data provided by dwl (title, tags, layout for each output) to the dwl module.
+
+Panels connect to the $XDG_RUNTIME_DIR/nwg-dwl.sock socket. On connection they receive the whole state, and then,
+after each status block, only the fields that changed, as one JSON object per line: {"output": {"field": "value"}}.
+While no panel is connected, the data is saved to the cache file in json format, and the panel gets signalled
+to re-read it (the former protocol).
 
 You need to start dwl with `dwl -s nwg-dwl-interface`.
 """
 
 import subprocess
-import fileinput
 import os
+import selectors
+import socket
 import sys
 import json
 from time import sleep
@@ -54,6 +59,58 @@ def get_cache_dir():
         return None
 
 
+def get_socket_path():
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        runtime_dir = get_cache_dir()
+    return os.path.join(runtime_dir, "nwg-dwl.sock") if runtime_dir else None
+
+
+def get_changes(data, sent):
+    """
+    :return: {output: {field: value}} of fields that differ from what has been sent
+    """
+    changes = {}
+    for output in data:
+        for key, value in data[output].items():
+            if output not in sent or sent[output].get(key) != value:
+                if output not in changes:
+                    changes[output] = {}
+                changes[output][key] = value
+    return changes
+
+
+class PanelServer:
+    def __init__(self, path):
+        self.path = path
+        self.clients = []
+
+        if os.path.exists(path):
+            os.remove(path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+
+    def accept(self, data):
+        client, _ = self.server.accept()
+        # a panel that doesn't read must not block dwl
+        client.settimeout(1)
+        self.clients.append(client)
+        if data:
+            self.send_to(client, data)
+
+    def send(self, changes):
+        for client in list(self.clients):
+            self.send_to(client, changes)
+
+    def send_to(self, client, changes):
+        try:
+            client.sendall((json.dumps(changes) + "\n").encode("utf-8"))
+        except OSError:
+            client.close()
+            self.clients.remove(client)
+
+
 def get_config_dir():
     xdg_config_home = os.getenv('XDG_CONFIG_HOME')
     config_home = xdg_config_home if xdg_config_home else os.path.join(os.getenv("HOME"), ".config")
@@ -75,6 +132,7 @@ def main():
         sys.exit(1)
 
     data = {}
+    sent = {}
 
     # Determine output file location
     cache_dir = get_cache_dir()
@@ -100,46 +158,77 @@ def main():
     if os.path.isfile(output_file):
         os.remove(output_file)
 
-    # read stdin, parse data, save in json format
+    server = None
+    socket_path = get_socket_path()
+    if socket_path:
+        try:
+            server = PanelServer(socket_path)
+        except OSError as e:
+            print("Couldn't create socket '{}': {}".format(socket_path, e))
+
+    selector = selectors.DefaultSelector()
+    stdin = sys.stdin.fileno()
+    selector.register(stdin, selectors.EVENT_READ)
+    if server:
+        selector.register(server.server, selectors.EVENT_READ)
+
+    # read stdin, parse data, pass on to panels
     cnt = 0
+    buffer = b""
     print("num_lines = {}".format(num_lines))
-    for line in fileinput.input():
-        parts = line.split()
-
-        output = parts[0]
-        if output not in data:
-            data[output] = {}
-
-        if parts[1] == "title":
-            if len(parts) >= 3:
-                title = ' '.join(parts[2:])
-                if "title" not in data[output] or data[output]["title"] != title:
-                    data[output]["title"] = title
+    while True:
+        lines = []
+        for key, mask in selector.select():
+            if key.fileobj == stdin:
+                chunk = os.read(stdin, 4096)
+                if not chunk:
+                    # dwl quit
+                    if server:
+                        os.remove(socket_path)
+                    return
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
             else:
-                if "title" not in data[output] or data[output]["title"] != "":
-                    data[output]["title"] = ""
+                server.accept(sent)
 
-        elif parts[1] == "selmon":
-            if "selmon" not in data[output] or data[output]["selmon"] != parts[2]:
-                data[output]["selmon"] = parts[2]
+        for line in lines:
+            line = line.decode("utf-8", errors="replace")
+            parts = line.split()
+            if len(parts) < 2:
+                continue
 
-        elif parts[1] == "tags":
-            tags = line.split("{} tags".format(output))[1].strip()
-            if "tags" not in data[output] or data[output]["tags"] != tags:
-                data[output]["tags"] = tags
+            output = parts[0]
+            if output not in data:
+                data[output] = {}
 
-        elif parts[1] == "layout":
-            if "layout" not in data[output] or data[output]["layout"] != parts[2]:
-                data[output]["layout"] = parts[2]
+            if parts[1] == "title":
+                data[output]["title"] = ' '.join(parts[2:])
+
+            elif parts[1] == "selmon":
+                data[output]["selmon"] = parts[2]
 
-        cnt += 1
+            elif parts[1] == "tags":
+                data[output]["tags"] = line.split("{} tags".format(output))[1].strip()
 
-        if cnt == num_lines:
-            with open(output_file, 'w') as fp:
-                json.dump(data, fp, indent=4)
+            elif parts[1] == "layout":
+                data[output]["layout"] = parts[2]
 
-            subprocess.Popen("pkill -f -{} nwg-panel".format(refresh_signal), shell=True)
-            cnt = 0
+            cnt += 1
+
+            if cnt == num_lines:
+                cnt = 0
+                changes = get_changes(data, sent)
+                if not changes:
+                    continue
+                for output in changes:
+                    sent.setdefault(output, {}).update(changes[output])
+
+                if server and server.clients:
+                    server.send(changes)
+                else:
+                    with open(output_file, 'w') as fp:
+                        json.dump(data, fp, indent=4)
+                    subprocess.Popen(["pkill", "-f", "-{}".format(refresh_signal), "nwg-panel"])
 
 
 if __name__ == '__main__':
@@ -1,15 +1,28 @@
+"""
+Desktop entry index, used to find icons for app ids / window classes, and by the Pinned module.
+
+The index is saved to $XDG_CACHE_HOME/nwg-panel/desktop-index.json, along with the mtimes of all the scanned
+directories. On startup only applications dirs with a changed mtime are scanned again. While the panel is running,
+Gio file monitors update the index per file.
+"""
+
+import json
 import os
 import sys
 
-class_to_icon_cache = {}
-name_to_icon_cache = {}
-filename_to_icon_cache = {}
+from gi.repository import Gio, GLib
+
+INDEX_VERSION = 2
+SAVE_DELAY = 2  # seconds
+
+_index = None
 
 
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
-def __get_app_dirs():
+
+def get_app_dirs():
     desktop_dirs = []
 
     home = os.getenv("HOME")
@@ -32,95 +45,293 @@ def __get_app_dirs():
         if d not in desktop_dirs:
             desktop_dirs.append(d)
 
-    return desktop_dirs
+    # remove duplicates, keeping the order
+    return list(dict.fromkeys(desktop_dirs))
+
 
+def get_index_path():
+    cache_dir = os.getenv("XDG_CACHE_HOME")
+    if not cache_dir and os.getenv("HOME"):
+        cache_dir = os.path.join(os.getenv("HOME"), ".cache")
+    return os.path.join(cache_dir, "nwg-panel", "desktop-index.json") if cache_dir else None
 
-def __process_desktop_file(file_path):
+
+def parse_desktop_file(file_path):
+    """
+    :return: dict of the values we need from the [Desktop Entry] section, or None
+    """
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             content = f.read()
     except UnicodeDecodeError:
         eprint(f"Warning: Invalid .desktop file '{file_path}'")
-        return
+        return None
     except OSError as e:
         eprint(f"Warning: Unable to read .desktop file '{file_path}': {e}")
-        return
+        return None
 
-    icon_name = None
-    app_names = []
-    startup_wm_class = None
+    entry = {"icon": "", "exec": "", "name": "", "names": [], "localized-names": {}, "wm-class": ""}
     for line in content.splitlines():
         if line.startswith("[") and line != "[Desktop Entry]":
             break
-        if line.upper().startswith("ICON"):
-            icon_name = line.split("=", 1)[1].strip()
-        elif line.upper().startswith("NAME"):
-            app_names.append(line.split("=", 1)[1].strip())
-        elif line.upper().startswith("STARTUPWMCLASS"):
-            startup_wm_class = line.split("=", 1)[1].strip()
-
-    if not icon_name:
-        return
-
-    if startup_wm_class:
-        if not class_to_icon_cache.get(startup_wm_class):
-            class_to_icon_cache[startup_wm_class] = icon_name
-        # elif class_to_icon_cache.get(startup_wm_class) != icon_name:
-        #     eprint(f"Warning: Duplicate class name '{startup_wm_class}' found in cache.")
-
-    for app_name in app_names:
-        if not name_to_icon_cache.get(app_name):
-            name_to_icon_cache[app_name] = icon_name
-        # elif name_to_icon_cache.get(app_name) != icon_name:
-        #     eprint(f"Warning: Duplicate app name '{app_name}' found in cache.")
-
-    base_filename = os.path.basename(file_path).upper()
-    if not filename_to_icon_cache.get(base_filename):
-        filename_to_icon_cache[base_filename] = icon_name
-    elif filename_to_icon_cache.get(base_filename) != icon_name:
-        eprint(f"Warning: Duplicate .desktop file name '{base_filename}' found in cache.")
-
-
-def __populate_caches():
-    app_dirs = __get_app_dirs()
-    seen_dirs = set()
-    while app_dirs:
-        d = app_dirs.pop(0)
-        if d in seen_dirs:
+        upper = line.upper()
+        if upper.startswith("ICON"):
+            entry["icon"] = line.split("=", 1)[1].strip()
+        elif upper.startswith("EXEC"):
+            entry["exec"] = line.split("=", 1)[1].strip()
+        elif upper.startswith("NAME"):
+            value = line.split("=", 1)[1].strip()
+            entry["names"].append(value)
+            key = line.split("=", 1)[0].strip()
+            if "[" in key:
+                entry["localized-names"][key[key.index("[") + 1:].rstrip("]").upper()] = value
+            if not entry["name"]:
+                entry["name"] = value
+        elif upper.startswith("STARTUPWMCLASS"):
+            entry["wm-class"] = line.split("=", 1)[1].strip()
+
+    return entry
+
+
+def scan_dir(app_dir, rel_dir=""):
+    """
+    :return: ({relative file path: entry}, {scanned dir real path: [mtime, relative dir path]})
+    """
+    files = {}
+    dirs = {}
+    queue = [rel_dir]
+    while queue:
+        rel = queue.pop(0)
+        real = os.path.realpath(os.path.join(app_dir, rel))
+        if real in dirs or not os.path.isdir(real):
+            continue
+        try:
+            dirs[real] = [os.path.getmtime(real), rel]
+            names = sorted(os.listdir(real))
+        except OSError as e:
+            eprint(f"Warning: Can't list files in directory '{real}': {e}")
             continue
-        seen_dirs.add(d)
-        if os.path.isdir(d):
+
+        for file_name in names:
+            file_path = os.path.join(real, file_name)
+            if os.path.isdir(file_path):
+                queue.append(os.path.join(rel, file_name))
+            elif file_name.endswith(".desktop") and os.path.exists(file_path):
+                entry = parse_desktop_file(file_path)
+                if entry:
+                    files[os.path.join(rel, file_name)] = entry
+
+    return files, dirs
+
+
+class DesktopIndex:
+    def __init__(self):
+        self.app_dirs = get_app_dirs()
+        self.index_path = get_index_path()
+        self.dirs = {}  # {app dir: {"files": {rel path: entry}, "dirs": {real path: [mtime, rel path]}}}
+
+        self.class_to_icon = {}
+        self.name_to_icon = {}
+        self.filename_to_icon = {}
+        self.filenames = []  # upper case .desktop file names, in search order
+        self.trigrams = {}  # {trigram: set of indexes to self.filenames}
+        self.matches = {}  # {app name: icon name} fuzzy match results
+
+        self.monitors = {}
+        self.save_tag = 0
+
+        self.load()
+
+    def load(self):
+        saved = {}
+        if self.index_path and os.path.isfile(self.index_path):
             try:
-                files = os.listdir(d)
-            except OSError as e:
-                eprint(f"Warning: Can't list files in directory '{d}': {e}")
-                continue
-
-            for file_name in files:
-                file_path = os.path.realpath(os.path.join(d, file_name))
-                if not os.path.exists(file_path):
-                    continue
-                if os.path.isdir(file_path):
-                    app_dirs.insert(0, file_path)
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION:
+                    saved = data["dirs"]
+            except Exception as e:
+                eprint(f"Couldn't load desktop index: {e}")
+
+        changed = False
+        for app_dir in self.app_dirs:
+            if app_dir in saved and self.is_valid(saved[app_dir]):
+                self.dirs[app_dir] = saved[app_dir]
+            else:
+                files, dirs = scan_dir(app_dir)
+                self.dirs[app_dir] = {"files": files, "dirs": dirs}
+                changed = True
+
+        self.build_lookups()
+        if changed:
+            self.save()
+
+    @staticmethod
+    def is_valid(saved_dir):
+        for path, (mtime, rel) in saved_dir["dirs"].items():
+            try:
+                if os.path.getmtime(path) != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def save(self):
+        self.save_tag = 0
+        if not self.index_path:
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "dirs": self.dirs}, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            eprint(f"Couldn't save desktop index: {e}")
+
+        # GLib.SOURCE_REMOVE
+        return False
+
+    def build_lookups(self):
+        self.class_to_icon = {}
+        self.name_to_icon = {}
+        self.filename_to_icon = {}
+        # first found wins, in the XDG data dirs order
+        for app_dir in self.app_dirs:
+            for rel_path, entry in self.dirs[app_dir]["files"].items():
+                icon_name = entry["icon"]
+                if not icon_name:
                     continue
-                __process_desktop_file(file_path)
+                if entry["wm-class"] and entry["wm-class"] not in self.class_to_icon:
+                    self.class_to_icon[entry["wm-class"]] = icon_name
+                for app_name in entry["names"]:
+                    if app_name not in self.name_to_icon:
+                        self.name_to_icon[app_name] = icon_name
+                base_filename = os.path.basename(rel_path).upper()
+                if base_filename not in self.filename_to_icon:
+                    self.filename_to_icon[base_filename] = icon_name
+
+        self.filenames = list(self.filename_to_icon)
+        self.trigrams = {}
+        for idx, filename in enumerate(self.filenames):
+            for i in range(len(filename) - 2):
+                self.trigrams.setdefault(filename[i:i + 3], set()).add(idx)
+        self.matches = {}
+
+    def find_filename(self, app_name):
+        """
+        Icon of the first .desktop file whose name contains `app_name` (case-insensitive). Candidates are taken
+        from the trigram index, and verified.
+        """
+        if app_name in self.matches:
+            return self.matches[app_name]
+
+        query = app_name.upper()
+        if len(query) < 3:
+            candidates = range(len(self.filenames))
+        else:
+            postings = sorted((self.trigrams.get(query[i:i + 3], set()) for i in range(len(query) - 2)), key=len)
+            candidates = sorted(set.intersection(*postings)) if postings[0] else []
+
+        result = None
+        for idx in candidates:
+            if query in self.filenames[idx]:
+                result = self.filename_to_icon[self.filenames[idx]]
+                break
+
+        self.matches[app_name] = result
+        return result
+
+    def get_icon_name(self, app_name):
+        # Search priority: window class > app name > .desktop filename
+        if app_name in self.class_to_icon:
+            return self.class_to_icon[app_name]
+        if app_name in self.name_to_icon:
+            return self.name_to_icon[app_name]
+        return self.find_filename(app_name)
+
+    def get_entry(self, desktop_id):
+        """
+        :param desktop_id: .desktop file path, relative to the applications dir, e.g. "firefox.desktop"
+        """
+        for app_dir in self.app_dirs:
+            entry = self.dirs[app_dir]["files"].get(desktop_id)
+            if entry:
+                return entry
+        return None
+
+    def start_monitoring(self):
+        for app_dir in self.app_dirs:
+            for path in self.dirs[app_dir]["dirs"]:
+                self.monitor_dir(app_dir, path)
+
+    def monitor_dir(self, app_dir, path):
+        if path in self.monitors:
+            return
+        try:
+            monitor = Gio.File.new_for_path(path).monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+            monitor.connect("changed", self.on_dir_changed, app_dir, path)
+            self.monitors[path] = monitor
+        except Exception as e:
+            eprint(f"Couldn't monitor '{path}': {e}")
+
+    def on_dir_changed(self, monitor, file, other_file, event_type, app_dir, dir_path):
+        events = [Gio.FileMonitorEvent.CHANGES_DONE_HINT, Gio.FileMonitorEvent.CREATED, Gio.FileMonitorEvent.DELETED,
+                  Gio.FileMonitorEvent.MOVED_IN, Gio.FileMonitorEvent.MOVED_OUT, Gio.FileMonitorEvent.RENAMED]
+        if event_type not in events:
+            return
+
+        paths = [file.get_path()]
+        if other_file and event_type == Gio.FileMonitorEvent.RENAMED:
+            paths.append(other_file.get_path())
+
+        data = self.dirs[app_dir]
+        rel_dir = data["dirs"][dir_path][1]
+        for path in paths:
+            rel_path = os.path.join(rel_dir, os.path.basename(path))
+            if os.path.isdir(path):
+                # new subdirectory: scan and watch it
+                files, dirs = scan_dir(app_dir, rel_path)
+                data["files"].update(files)
+                data["dirs"].update(dirs)
+                for d in dirs:
+                    self.monitor_dir(app_dir, d)
+            elif path.endswith(".desktop"):
+                entry = parse_desktop_file(path) if os.path.isfile(path) else None
+                if entry:
+                    data["files"][rel_path] = entry
+                else:
+                    data["files"].pop(rel_path, None)
+
+        try:
+            data["dirs"][dir_path][0] = os.path.getmtime(dir_path)
+        except OSError:
+            pass
+
+        self.build_lookups()
+        if not self.save_tag:
+            self.save_tag = GLib.timeout_add_seconds(SAVE_DELAY, self.save)
+
+
+def desktop_index():
+    global _index
+    if _index is None:
+        _index = DesktopIndex()
+        _index.start_monitoring()
+    return _index
+
+
+def get_desktop_entry(desktop_id):
+    return desktop_index().get_entry(desktop_id)
 
 
 def get_icon_name(app_name):
     if not app_name:
         return ""
 
-    if not class_to_icon_cache and not name_to_icon_cache:
-        __populate_caches()
-
-    # Search priority: window class > app name > .desktop filename
-    if app_name in class_to_icon_cache:
-        return class_to_icon_cache[app_name]
-    if app_name in name_to_icon_cache:
-        return name_to_icon_cache[app_name]
-    for filename, icon in filename_to_icon_cache.items():
-        if app_name.upper() in filename:
-            return icon
+    icon_name = desktop_index().get_icon_name(app_name)
+    if icon_name:
+        return icon_name
 
     # GIMP returns "app_id": null and for some reason "class": "Gimp-2.10" instead of just "gimp".
     # Until the GTK3 version is released, let's make an exception for GIMP.
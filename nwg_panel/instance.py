@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""
+Single instance handling over an abstract Unix socket, one per user and Wayland display.
+
+The running panel listens on the socket. A new instance that fails to bind it connects instead, asks the old one
+to quit, and waits for it to exit on a pidfd (or for the connection to close, if pidfds are not available), so the
+handover takes no longer than the old instance's shutdown. The socket also accepts the "reload" command.
+"""
+
+import os
+import select
+import signal
+import socket
+import struct
+import sys
+import time
+
+from gi.repository import GLib
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def get_socket_name():
+    return "\0nwg-panel-{}-{}".format(os.getuid(), os.getenv("WAYLAND_DISPLAY", ""))
+
+
+def bind():
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(get_socket_name())
+    except OSError:
+        server.close()
+        return None
+    server.listen(4)
+    return server
+
+
+def wait_for_exit(pid, conn, timeout):
+    """
+    :return: True if `pid` exited within `timeout` seconds
+    """
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        # Python < 3.9 or kernel < 5.3: the connection gets closed when the process exits
+        pidfd = None
+
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([pidfd if pidfd is not None else conn], [], [], remaining)
+            if not ready:
+                return False
+            if pidfd is not None or not conn.recv(64):
+                return True
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def take_over(timeout=3.0):
+    """
+    Ask the running instance, if any, to quit, and wait until it does; SIGKILL it after `timeout` seconds.
+    :return: listening socket of this instance, to pass to `listen`; None if it couldn't be bound
+    """
+    server = bind()
+    if server:
+        return server
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(get_socket_name())
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        pid = struct.unpack("3i", creds)[0]
+        print("Running instance found, PID {}, asking it to quit".format(pid))
+        conn.sendall(b"quit\n")
+        if not wait_for_exit(pid, conn, timeout):
+            print("PID {} still alive after {}s, sending SIGKILL".format(pid, timeout))
+            os.kill(pid, signal.SIGKILL)
+            wait_for_exit(pid, conn, 1.0)
+    except OSError as e:
+        eprint("Couldn't hand over from the running instance: {}".format(e))
+    finally:
+        conn.close()
+
+    # the old instance's socket is normally released by the time it exits; allow for a short delay
+    for attempt in range(20):
+        server = bind()
+        if server:
+            return server
+        time.sleep(0.05)
+
+    eprint("Couldn't bind the instance socket")
+    return None
+
+
+def listen(server, commands):
+    """
+    Handle commands sent to this instance on the GLib main loop.
+    :param commands: {command: callback}, e.g. {"quit": Gtk.main_quit}
+    """
+    # connections are kept open until this instance exits, so that the client knows when it's gone
+    clients = []
+
+    def on_client_data(fd, condition, client, buffer):
+        data = b""
+        if condition & GLib.IO_IN:
+            try:
+                data = client.recv(1024)
+            except OSError:
+                pass
+        if not data:
+            clients.remove(client)
+            client.close()
+            return False
+
+        buffer += data
+        while b"\n" in buffer:
+            line, buffer[:] = buffer.split(b"\n", 1)
+            command = line.decode("utf-8", errors="replace").strip()
+            if command in commands:
+                print("Received '{}' command".format(command))
+                commands[command]()
+            elif command:
+                eprint("Unknown command '{}'".format(command))
+        return True
+
+    def on_connection(fd, condition):
+        try:
+            client, _ = server.accept()
+        except OSError:
+            return True
+        clients.append(client)
+        GLib.io_add_watch(client.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+                          on_client_data, client, bytearray())
+        return True
+
+    GLib.io_add_watch(server.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, on_connection)
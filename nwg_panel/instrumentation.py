@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+"""
+Opt-in per-module instrumentation, enabled with `--debug` or `"instrumentation": true` in common-settings.json.
+
+For every instance of the instrumented classes it records the time spent in their refresh methods, and counts
+`GLib.idle_add` callbacks, subprocess forks, IPC round trips and threads started on their behalf. Work done on
+scheduler threads is attributed to the widget owning the job. The stats are dumped as JSON on SIGUSR2.
+
+When not enabled, nothing gets patched, and the hooks left in the code cost a single flag check.
+"""
+
+import json
+import subprocess
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# method names wrapped on the instrumented classes, if defined
+METHODS = ["refresh", "update_widget", "build_box", "refresh_bat", "on_state_changed", "update_volume",
+           "on_audio_state", "on_brightness", "on_battery", "add_item", "update_item", "remove_item"]
+
+OTHER = "(other)"
+
+enabled = False
+
+_lock = threading.Lock()
+_local = threading.local()
+# {instance: "ClassName-N"}; weak, as ids of destroyed instances get reused (e.g. after a reload), while their stats
+# stay under the old name
+_names = weakref.WeakKeyDictionary()
+_counters = {}  # {class name: instances so far}
+_stats = {}  # {instance name: stats dict}
+_started = 0
+
+
+def new_stats():
+    return {"calls": {}, "idle-add": 0, "forks": 0, "ipc": 0, "threads-started": 0}
+
+
+def instance_name(obj):
+    """
+    :return: "ClassName-N", N counting instances of the class in the order they were first seen
+    """
+    with _lock:
+        if obj not in _names:
+            cls = type(obj).__name__
+            _counters[cls] = _counters.get(cls, 0) + 1
+            _names[obj] = "{}-{}".format(cls, _counters[cls])
+            _stats[_names[obj]] = new_stats()
+        return _names[obj]
+
+
+def current():
+    """
+    :return: name of the instance the current thread works for, if any
+    """
+    return getattr(_local, "name", None)
+
+
+@contextmanager
+def context(obj):
+    """
+    Attribute counters on the current thread to `obj` (a widget instance), or to no module if None.
+    """
+    if not enabled:
+        yield
+        return
+    previous = current()
+    _local.name = instance_name(obj) if obj is not None else None
+    try:
+        yield
+    finally:
+        _local.name = previous
+
+
+def count(counter, name=None):
+    """
+    Increase a counter ("idle-add", "forks", "ipc" or "threads-started") of the `name` instance, or of
+    the one the current thread works for.
+    """
+    if not enabled:
+        return
+    name = name or current() or OTHER
+    with _lock:
+        if name not in _stats:
+            _stats[name] = new_stats()
+        _stats[name][counter] += 1
+
+
+def record_call(name, method, duration):
+    with _lock:
+        calls = _stats[name]["calls"]
+        if method not in calls:
+            calls[method] = {"count": 0, "total-ms": 0.0, "max-ms": 0.0}
+        calls[method]["count"] += 1
+        calls[method]["total-ms"] += duration
+        calls[method]["max-ms"] = max(calls[method]["max-ms"], duration)
+
+
+def wrap_method(cls, method):
+    function = getattr(cls, method)
+
+    def timed(self, *args, **kwargs):
+        name = instance_name(self)
+        previous = current()
+        _local.name = name
+        start = time.perf_counter()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            record_call(name, method, (time.perf_counter() - start) * 1000)
+            _local.name = previous
+
+    timed.__name__ = function.__name__
+    timed.__qualname__ = function.__qualname__
+    setattr(cls, method, timed)
+
+
+def instrument_classes(classes):
+    """
+    Wrap the METHODS of the given classes. Must be called before they get instantiated, as modules pass their
+    bound methods to the scheduler and signal handlers in `__init__`.
+    """
+    if not enabled:
+        return
+    for cls in classes:
+        for method in METHODS:
+            # only methods defined by the class itself, to avoid wrapping twice
+            if method in cls.__dict__:
+                wrap_method(cls, method)
+
+
+def callback_owner(callback, args):
+    # bound methods of instrumented instances, directly or passed as the first argument (SharedJob.deliver)
+    for candidate in [callback] + list(args[:1]):
+        owner = getattr(candidate, "__self__", None)
+        # `in` is False for objects which can't be weakly referenced, e.g. the `__self__` of builtins
+        if owner is not None and owner in _names:
+            return _names[owner]
+    return None
+
+
+def patch_glib():
+    from gi.repository import GLib
+    idle_add = GLib.idle_add
+
+    def counted_idle_add(callback, *args, **kwargs):
+        count("idle-add", callback_owner(callback, args))
+        return idle_add(callback, *args, **kwargs)
+
+    GLib.idle_add = counted_idle_add
+
+
+def patch_subprocess():
+    popen_init = subprocess.Popen.__init__
+
+    def counted_init(self, *args, **kwargs):
+        count("forks")
+        popen_init(self, *args, **kwargs)
+
+    subprocess.Popen.__init__ = counted_init
+
+
+def patch_threading():
+    thread_start = threading.Thread.start
+
+    def counted_start(self):
+        count("threads-started")
+        # threads inherit the context of the thread that started them
+        name = current()
+        run = self.run
+
+        def run_in_context():
+            _local.name = name
+            run()
+
+        self.run = run_in_context
+        thread_start(self)
+
+    threading.Thread.start = counted_start
+
+
+def patch_i3ipc():
+    try:
+        from i3ipc import Connection
+    except ImportError:
+        return
+    message = Connection._message
+
+    def counted_message(self, *args, **kwargs):
+        count("ipc")
+        return message(self, *args, **kwargs)
+
+    Connection._message = counted_message
+
+
+def enable():
+    global enabled, _started
+    if enabled:
+        return
+    enabled = True
+    _started = time.time()
+    patch_glib()
+    patch_subprocess()
+    patch_threading()
+    patch_i3ipc()
+
+
+def get_stats():
+    from nwg_panel.scheduler import get_scheduler
+
+    with _lock:
+        modules = json.loads(json.dumps(_stats))
+    totals = new_stats()
+    del totals["calls"]
+    for stats in modules.values():
+        stats["total-ms"] = round(sum(c["total-ms"] for c in stats["calls"].values()), 3)
+        for key in totals:
+            totals[key] += stats[key]
+
+    return {"uptime-s": round(time.time() - _started, 1),
+            "threads": threading.active_count(),
+            "scheduler": get_scheduler().stats(),
+            "totals": totals,
+            "modules": modules}
+
+
+def dump(path):
+    """
+    Save stats to `path` as JSON, and return a short summary: the modules which took most main loop time.
+    """
+    stats = get_stats()
+    with open(path, "w") as f:
+        json.dump(stats, f, indent=2)
+
+    top = sorted(stats["modules"].items(), key=lambda item: item[1]["total-ms"], reverse=True)[:5]
+    lines = ["{} (threads: {}, idle_add: {}, forks: {}, ipc: {})".format(
+        path, stats["threads"], stats["totals"]["idle-add"], stats["totals"]["forks"], stats["totals"]["ipc"])]
+    for name, s in top:
+        lines.append("  {}: {:.1f} ms in {} calls".format(name, s["total-ms"],
+                                                           sum(c["count"] for c in s["calls"].values())))
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Request socket clients for Hyprland and niri.
+
+Socket paths are resolved once per process. Niri accepts multiple requests per connection, so a single
+connection is kept open and reused. Hyprland closes the connection after each reply, but accepts `[[BATCH]]`
+requests, which return replies to several commands in one round trip.
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+
+from nwg_panel import instrumentation
+
+_hypr_dir = None
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def hypr_socket_path(name=".socket.sock"):
+    """
+    :param name: ".socket.sock" for requests, ".socket2.sock" for events
+    """
+    global _hypr_dir
+    if _hypr_dir is None:
+        # /tmp/hypr moved to $XDG_RUNTIME_DIR/hypr in #5788
+        xdg_runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+        hypr_dir = f"{xdg_runtime_dir}/hypr" if xdg_runtime_dir and os.path.isdir(
+            f"{xdg_runtime_dir}/hypr") else "/tmp/hypr"
+        _hypr_dir = f"{hypr_dir}/{os.getenv('HYPRLAND_INSTANCE_SIGNATURE')}"
+
+    return f"{_hypr_dir}/{name}"
+
+
+def hypr_request(cmd, buf_size=8192):
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(hypr_socket_path())
+        instrumentation.count("ipc")
+        s.sendall(cmd.encode("utf-8"))
+
+        chunks = []
+        while True:
+            buffer = s.recv(buf_size)
+            if buffer:
+                chunks.append(buffer)
+            else:
+                break
+        return b"".join(chunks).decode('utf-8', errors='replace')
+    except Exception as e:
+        eprint(f"hyprctl: {e}")
+        return ""
+    finally:
+        s.close()
+
+
+def hypr_batch(commands):
+    """
+    Send JSON commands (e.g. ["j/monitors", "j/clients"]) in a single `[[BATCH]]` request.
+    :return: list of decoded replies, in the order of commands; falls back to separate requests if the batch
+    reply can't be split
+    """
+    reply = hypr_request("[[BATCH]]{}".format(";".join(commands)))
+    results = []
+    decoder = json.JSONDecoder()
+    idx = 0
+    try:
+        while len(results) < len(commands):
+            # skip whitespace between the replies
+            while idx < len(reply) and reply[idx].isspace():
+                idx += 1
+            obj, idx = decoder.raw_decode(reply, idx)
+            results.append(obj)
+    except ValueError:
+        results = []
+
+    if len(results) != len(commands):
+        results = []
+        for cmd in commands:
+            try:
+                results.append(json.loads(hypr_request(cmd)))
+            except Exception as e:
+                eprint(e)
+                results.append({})
+
+    return results
+
+
+class NiriConnection:
+    def __init__(self, path):
+        self.path = path
+        self.sock = None
+        self.buffer = b""
+        self.lock = threading.Lock()
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+        self.buffer = b""
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.buffer = b""
+
+    def read_line(self):
+        while b"\n" not in self.buffer:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("connection closed by niri")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode("utf-8", errors="replace")
+
+    def request(self, payload):
+        """
+        Send a JSON request line, return the decoded reply. Reconnects once if the connection was dropped.
+        """
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if not self.sock:
+                        self.connect()
+                    instrumentation.count("ipc")
+                    self.sock.sendall(f"{payload}\n".encode("utf-8"))
+                    line = self.read_line()
+                    break
+                except (socket.error, OSError) as e:
+                    self.close()
+                    if attempt > 0:
+                        eprint("Socket error:", e)
+                        return None
+
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as e:
+            eprint("Failed to decode JSON:", e)
+            eprint("Buffer:", line)
+            return None
+
+
+_niri_connection = None
+
+
+def niri_request(payload):
+    global _niri_connection
+    if _niri_connection is None:
+        niri_sock = os.getenv("NIRI_SOCKET")
+        if not niri_sock:
+            eprint("NIRI_SOCKET environment variable not set.")
+            return None
+        _niri_connection = NiriConnection(niri_sock)
+
+    return _niri_connection.request(payload)
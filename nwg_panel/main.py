@@ -12,11 +12,11 @@ import os
 import signal
 import sys
 import threading
+import time
 
 import gi
 
 from nwg_panel.__about__ import __version__
-from nwg_panel.modules.pinned import Pinned
 
 gi.require_version('Gtk', '3.0')
 try:
@@ -29,7 +29,7 @@ except ValueError:
                        'For example you might need to run:\n\n' +
                        'GI_TYPELIB_PATH=build/src LD_LIBRARY_PATH=build/src python3 ' + ' '.join(sys.argv))
 
-from gi.repository import GtkLayerShell, GLib
+from gi.repository import GtkLayerShell, GLib, Gio
 
 try:
     import psutil
@@ -39,69 +39,51 @@ except ModuleNotFoundError:
 
 from nwg_panel.tools import *
 
-from nwg_panel.modules.custom_button import CustomButton
-from nwg_panel.modules.executor import Executor
-from nwg_panel.modules.clock import Clock
-from nwg_panel.modules.controls import Controls
-from nwg_panel.modules.playerctl import Playerctl
-from nwg_panel.modules.cpu_avg import CpuAvg
-from nwg_panel.modules.scratchpad import Scratchpad
-from nwg_panel.modules.dwl_tags import DwlTags
-from nwg_panel.modules.notifications import Notifications
-from nwg_panel.modules.sway_mode import SwayMode
-from nwg_panel.modules.hyprland_submap import HyprlandSubmap
-from nwg_panel.modules.keyboard_layout import KeyboardLayout
-from nwg_panel.modules.random_wallpaper import RandomWallpaper
-
-try:
-    from nwg_panel.modules.openweather import OpenWeather
-except Exception as e:
-    eprint("Couldn't load OpenWeather module: ".format(e))
-from nwg_panel.modules.brightness_slider import BrightnessSlider
-
-from nwg_panel.modules.menu_start import MenuStart
-
 dir_name = os.path.dirname(__file__)
 
-from nwg_panel import common
-
-tray_available = False
-try:
-    from nwg_panel.modules import sni_system_tray
-
-    tray_available = True
-except:
-    eprint("Couldn't load system tray, is 'python-dasbus' installed?")
+from nwg_panel import common, instance, instrumentation
+from nwg_panel.scheduler import get_scheduler
+# panel modules are imported on first use
+from nwg_panel.registry import module_class, record_instance, print_profile
 
 sway = os.getenv('SWAYSOCK') is not None
 if sway:
     try:
         import i3ipc
-        from i3ipc import Connection, Event
+        from i3ipc import Connection
     except ModuleNotFoundError:
         eprint("'python-i3ipc' package required on sway, terminating")
         sys.exit(1)
 
     common.i3 = Connection()
-    from nwg_panel.modules.sway_taskbar import SwayTaskbar
-    from nwg_panel.modules.sway_workspaces import SwayWorkspaces
+    from nwg_panel.compositor_state import CompositorState
 
-his = os.getenv('HYPRLAND_INSTANCE_SIGNATURE')
-if his:
-    from nwg_panel.modules.hyprland_taskbar import HyprlandTaskbar
-    from nwg_panel.modules.hyprland_workspaces import HyprlandWorkspaces
+    common.compositor_state = CompositorState(common.i3)
 
+his = os.getenv('HYPRLAND_INSTANCE_SIGNATURE')
 niri_sock = os.getenv('NIRI_SOCKET')
-if niri_sock:
-    from nwg_panel.modules.niri_taskbar import NiriTaskbar
 
 common_settings = {}
-restart_cmd = ""
 sig_dwl = 0
 voc = {}
 
 panel_windows_hide_show_sigs = {}
 
+config_file = ""
+style_file = ""
+css_provider = None
+style_monitor = None
+css_reload_id = None
+# panels currently shown, to compare with the config on reload: {signature: window}
+running_panels = {}
+reload_id = None
+hypr_watcher_started = False
+dwl_started = False
+niri_coalescer = None
+
+# Hyprland data fetched once, and shared by all panels at startup
+h_startup_data = None
+
 
 def load_vocabulary():
     global voc
@@ -127,25 +109,75 @@ def load_vocabulary():
 
 
 def signal_handler(sig, frame):
-    global sig_dwl
+    # Python runs signal handlers on the main thread between bytecodes, possibly while it holds a lock (e.g. the
+    # scheduler's), so handle the signal on the main loop instead.
+    GLib.idle_add(on_signal, sig)
+
+
+def on_signal(sig):
     desc = {2: "SIGINT", 15: "SIGTERM", 10: "SIGUSR1"}
     if sig == 2 or sig == 15:
         print("Terminated with {}".format(desc[sig]))
-        if tray_available:
-            sni_system_tray.deinit_tray()
-        Gtk.main_quit()
+        quit_panel()
     elif sig == sig_dwl:
         refresh_dwl()
-    else:
-        return
+    elif sig == signal.SIGUSR2:
+        print_debug_info()
+    elif sig == signal.SIGHUP:
+        print("Reloading config & style on SIGHUP")
+        reload_all()
+
+    # GLib.SOURCE_REMOVE
+    return False
+
+
+def quit_panel():
+    if common.tray_list:
+        from nwg_panel.modules import sni_system_tray
+        sni_system_tray.deinit_tray()
+    Gtk.main_quit()
+
+
+def reload_all():
+    GLib.idle_add(reload_css)
+    GLib.idle_add(reload_panels)
+
+
+def warn_if_kded_running():
+    # Warn if KDE's background daemon is running
+    for proc in psutil.process_iter(['name']):
+        if proc.info['name'] in ('kded5', 'kded6'):
+            eprint(f"Warning: '{proc.info['name']}' is running and may block the system tray.")
+            eprint("> See https://github.com/Alexays/Waybar/issues/3468 for details.")
+            break
+
+
+def print_debug_info():
+    print("Scheduler: {}".format(get_scheduler().dump()))
+    print("Pixbuf cache: {}".format(", ".join("{}: {}".format(k, v) for k, v in pixbuf_cache.stats().items())))
+    if instrumentation.enabled:
+        path = os.path.join(temp_dir(), "nwg-panel-stats-{}.json".format(os.getpid()))
+        try:
+            print("Module stats saved to {}".format(instrumentation.dump(path)))
+        except Exception as e:
+            eprint("Couldn't save module stats: {}".format(e))
 
 
 def rt_sig_handler(sig, frame):
+    # see `signal_handler`
+    GLib.idle_add(on_rt_signal, sig)
+
+
+def on_rt_signal(sig):
     print("{} RT signal received".format(sig))
+    refreshed = []
     for executor in common.executors_list:
-        if executor.use_sigrt and executor.sigrt == sig:
+        # mirrored executors share a job or a continuous script, run it once
+        job = executor.continuous or executor.job
+        if executor.use_sigrt and executor.sigrt == sig and job not in refreshed:
             eprint("Refreshing {} on signal {}".format(executor.name, sig))
-            executor.refresh()
+            executor.run_now()
+            refreshed.append(job)
 
     for win in panel_windows_hide_show_sigs:
         if sig == panel_windows_hide_show_sigs[win]:
@@ -154,21 +186,40 @@ def rt_sig_handler(sig, frame):
             else:
                 win.show()
 
+    # GLib.SOURCE_REMOVE
+    return False
+
+
+def schedule_reload(*args):
+    # a burst of output events results in a single reload
+    global reload_id
+    if reload_id:
+        GLib.source_remove(reload_id)
+    reload_id = GLib.timeout_add(common_settings["restart-delay"], reload_panels, priority=GLib.PRIORITY_HIGH)
+    return False
+
+
+def on_hypr_state_fetched(data, changes):
+    monitors, workspaces, clients, activewindow, activeworkspace = data
+    for item in common.h_taskbars_list:
+        item.refresh(monitors, workspaces, clients, activewindow)
 
-def restart():
-    subprocess.Popen(restart_cmd, shell=True)
+    for item in common.h_workspaces_list:
+        item.refresh(monitors, workspaces, clients, activewindow, activeworkspace)
 
 
 def hypr_watcher():
     import socket
+    from nwg_panel.compositor_state import EventCoalescer
 
-    # /tmp/hypr moved to $XDG_RUNTIME_DIR/hypr in #5788
-    xdg_runtime_dir = os.getenv("XDG_RUNTIME_DIR")
-    hypr_dir = f"{xdg_runtime_dir}/hypr" if xdg_runtime_dir and os.path.isdir(
-        f"{xdg_runtime_dir}/hypr") else "/tmp/hypr"
+    # Bursts of events result in a single state fetch, and a single refresh per widget
+    coalescer = EventCoalescer(h_modules_get_all, on_hypr_state_fetched, debounce=common_settings["event-debounce"])
+    coalescer.start()
+
+    from nwg_panel.ipc import hypr_socket_path
 
     client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    client.connect(f"{hypr_dir}/{his}/.socket2.sock")
+    client.connect(hypr_socket_path(".socket2.sock"))
 
     while True:
         datagram = client.recv(2048)
@@ -182,8 +233,8 @@ def hypr_watcher():
 
         for event_name in event_names:
             if common_settings["restart-on-display"] and (event_name in ["monitoradded", "monitorremoved"]):
-                print("Received event '{}'; restart in {} ms.".format(event_name, common_settings["restart-delay"]))
-                GLib.timeout_add(common_settings["restart-delay"], restart, priority=GLib.PRIORITY_HIGH)
+                print("Received event '{}'; reload in {} ms.".format(event_name, common_settings["restart-delay"]))
+                GLib.idle_add(schedule_reload)
 
             if event_name in ["activespecial",
                               "activewindow",
@@ -200,21 +251,28 @@ def hypr_watcher():
                               "workspace"]:
 
                 # print(f">>> refreshing on {event_name}")
-                monitors, workspaces, clients, activewindow, activeworkspace = h_modules_get_all()
-                for item in common.h_taskbars_list:
-                    GLib.timeout_add(0, item.refresh, monitors, workspaces, clients, activewindow)
-
-                for item in common.h_workspaces_list:
-                    GLib.timeout_add(0, item.refresh, monitors, workspaces, clients, activewindow, activeworkspace)
-                break
+                coalescer.queue(event_name)
 
             elif event_name == "submap":
                 for item in common.h_submaps_list:
                     GLib.timeout_add(0, item.refresh)
 
 
+def on_niri_state_fetched(data, changes):
+    outputs, workspaces, windows, focused_window = data
+    for item in common.niri_taskbars_list:
+        item.refresh(outputs, workspaces, windows, focused_window)
+
+
 def niri_watcher():
     import socket
+    from nwg_panel.compositor_state import EventCoalescer
+
+    # Bursts of events result in a single state fetch, and a single refresh per widget
+    global niri_coalescer
+    coalescer = EventCoalescer(niri_get_all, on_niri_state_fetched, debounce=common_settings["event-debounce"])
+    coalescer.start()
+    niri_coalescer = coalescer
 
     client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
     client.connect(niri_sock)
@@ -233,30 +291,24 @@ def niri_watcher():
                 continue
             try:
                 message = json.loads(line)
-                # event_name = next(iter(message))
-                # event_data = message[event_name]
+                event_name = next(iter(message))
                 # print(f"[{event_name}]")
-
-                outputs, workspaces, windows, focused_window = niri_get_all()
-                # print(f"{outputs}\n{workspaces}\n{windows}\n{focused_window}")
-                for item in common.niri_taskbars_list:
-                    GLib.timeout_add(0, item.refresh, outputs, workspaces, windows, focused_window)
+                coalescer.queue(event_name)
 
             except json.JSONDecodeError as e:
                 print("Failed to decode JSON:", e)
 
-def on_i3ipc_event(i3conn, event):
+
+def on_sway_state_changed(snapshot):
     if common_settings["restart-on-display"]:
-        num = num_active_outputs(i3conn.get_outputs())
-        if num > common.outputs_num:
-            print("Number of outputs increased ({}); restart in {} ms.".format(
-                num, common_settings["restart-delay"]))
-            GLib.timeout_add(common_settings["restart-delay"],
-                             restart,
-                             priority=GLib.PRIORITY_HIGH)
+        num = num_active_outputs(common.i3.get_outputs())
+        if num != common.outputs_num:
+            print("Number of outputs changed ({}); reload in {} ms.".format(num, common_settings["restart-delay"]))
+            schedule_reload()
         common.outputs_num = num
 
-    GLib.idle_add(hide_controls_popup, priority=GLib.PRIORITY_HIGH)
+    # we're on the main loop already
+    hide_controls_popup()
 
 
 def hide_controls_popup():
@@ -269,32 +321,111 @@ def refresh_dwl(*args):
     if len(common.dwl_instances) > 0:
         dwl_data = load_json(common.dwl_data_file)
         if dwl_data:
+            common.dwl_data = dwl_data
             for item in common.dwl_instances:
                 item.refresh(dwl_data)
 
 
+def dwl_connect():
+    """
+    Connect to the nwg-dwl-interface socket, to receive changes on the main loop. Until connected,
+    the data file is re-read on `sig_dwl`.
+    """
+    import socket
+    from nwg_panel.dwl_interface import get_socket_path
+
+    path = get_socket_path()
+    if not path or not os.path.exists(path):
+        # GLib.SOURCE_CONTINUE: try again later
+        return True
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return True
+
+    client.setblocking(False)
+    GLib.io_add_watch(client.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+                      on_dwl_data, client, [b""])
+    print("Connected to nwg-dwl-interface")
+
+    return False
+
+
+def on_dwl_data(fd, condition, client, buffer):
+    chunk = b""
+    if condition & GLib.IO_IN:
+        try:
+            chunk = client.recv(8192)
+        except BlockingIOError:
+            return True
+        except OSError:
+            pass
+
+    if not chunk:
+        eprint("nwg-dwl-interface disconnected")
+        client.close()
+        GLib.timeout_add_seconds(3, dwl_connect)
+        # GLib.SOURCE_REMOVE
+        return False
+
+    *lines, buffer[0] = (buffer[0] + chunk).split(b"\n")
+    changed_outputs = set()
+    for line in lines:
+        try:
+            changes = json.loads(line)
+        except ValueError as e:
+            eprint("dwl data: {}".format(e))
+            continue
+        for output, values in changes.items():
+            common.dwl_data.setdefault(output, {}).update(values)
+            changed_outputs.add(output)
+
+    for item in common.dwl_instances:
+        if item.output in changed_outputs:
+            item.refresh(common.dwl_data)
+
+    return True
+
+
+def get_h_startup_data():
+    global h_startup_data
+    if h_startup_data is None:
+        h_startup_data = h_modules_get_all()
+    return h_startup_data
+
+
+def log_time(label, start, indent=1):
+    if common.debug:
+        print("{}{}: {:.1f} ms".format("  " * indent, label, (time.perf_counter() - start) * 1000))
+
+
 def instantiate_content(panel, container, content_list, icons_path=""):
     check_key(panel, "position", "top")
     check_key(panel, "items-padding", 0)
 
+    # list initial data for Hyprland modules
+    if his and ("hyprland-workspaces" in content_list or "hyprland-taskbar" in content_list):
+        monitors, workspaces, clients, activewindow, activeworkspace = get_h_startup_data()
+    else:
+        monitors, workspaces, clients, activewindow, activeworkspace = {}, {}, {}, {}, {}
+
     for item in content_list:
-        # list initial data for Hyprland modules
-        if his:
-            if "hyprland-workspaces" in content_list or "hyprland-taskbar" in content_list:
-                monitors, workspaces, clients, activewindow, activeworkspace = h_modules_get_all()
-            else:
-                monitors, workspaces, clients, activewindow, activeworkspace = {}, {}, {}, {}, {}
+        start = time.perf_counter()
 
         if item == "sway-taskbar":
             if "sway-taskbar" in panel:
                 if sway:
                     check_key(panel["sway-taskbar"], "all-outputs", False)
                     if panel["sway-taskbar"]["all-outputs"] or "output" not in panel:
-                        taskbar = SwayTaskbar(panel["sway-taskbar"], common.i3, panel["position"],
-                                              icons_path=icons_path)
+                        taskbar = module_class("SwayTaskbar")(panel["sway-taskbar"], common.i3, panel["position"],
+                                                              icons_path=icons_path)
                     else:
-                        taskbar = SwayTaskbar(panel["sway-taskbar"], common.i3, panel["position"],
-                                              display_name="{}".format(panel["output"]), icons_path=icons_path)
+                        taskbar = module_class("SwayTaskbar")(panel["sway-taskbar"], common.i3, panel["position"],
+                                                              display_name="{}".format(panel["output"]),
+                                                              icons_path=icons_path)
 
                     container.pack_start(taskbar, False, False, panel["items-padding"])
                 else:
@@ -305,8 +436,9 @@ def instantiate_content(panel, container, content_list, icons_path=""):
         if item == "sway-workspaces":
             if sway:
                 if "sway-workspaces" in panel:
-                    workspaces = SwayWorkspaces(panel["sway-workspaces"], common.i3, icons_path=icons_path)
-                    container.pack_start(workspaces, False, False, panel["items-padding"])
+                    sway_workspaces = module_class("SwayWorkspaces")(panel["sway-workspaces"], common.i3,
+                                                                     icons_path=icons_path)
+                    container.pack_start(sway_workspaces, False, False, panel["items-padding"])
                 else:
                     print("'sway-workspaces' not defined in this panel instance")
             else:
@@ -317,8 +449,8 @@ def instantiate_content(panel, container, content_list, icons_path=""):
                 # Added in v0.1.3, so may be undefined in user's config.
                 if item not in panel:
                     panel["scratchpad"] = {}
-                scratchpad = Scratchpad(common.i3, common.i3.get_tree(), panel[item], panel["output"],
-                                        icons_path=icons_path)
+                scratchpad = module_class("Scratchpad")(common.i3, common.compositor_state.get_snapshot().tree,
+                                                        panel[item], panel["output"], icons_path=icons_path)
                 container.pack_start(scratchpad, False, False, panel["items-padding"])
             else:
                 eprint("'scratchpad' ignored")
@@ -327,7 +459,7 @@ def instantiate_content(panel, container, content_list, icons_path=""):
             if sway:
                 if item not in panel:
                     panel["sway-mode"] = {}
-                sway_mode = SwayMode(common.i3, panel[item], icons_path=icons_path)
+                sway_mode = module_class("SwayMode")(common.i3, panel[item], icons_path=icons_path)
                 container.pack_start(sway_mode, False, False, panel["items-padding"])
             else:
                 eprint("'sway-mode' ignored")
@@ -337,12 +469,14 @@ def instantiate_content(panel, container, content_list, icons_path=""):
                 if his:
                     check_key(panel["hyprland-taskbar"], "all-outputs", False)
                     if panel["hyprland-taskbar"]["all-outputs"] or "output" not in panel:
-                        taskbar = HyprlandTaskbar(panel["hyprland-taskbar"], panel["position"], monitors, workspaces,
-                                                  clients, activewindow, icons_path=icons_path)
+                        taskbar = module_class("HyprlandTaskbar")(panel["hyprland-taskbar"], panel["position"],
+                                                                  monitors, workspaces, clients, activewindow,
+                                                                  icons_path=icons_path)
                     else:
-                        taskbar = HyprlandTaskbar(panel["hyprland-taskbar"], panel["position"], monitors, workspaces,
-                                                  clients, activewindow, display_name="{}".format(panel["output"]),
-                                                  icons_path=icons_path)
+                        taskbar = module_class("HyprlandTaskbar")(panel["hyprland-taskbar"], panel["position"],
+                                                                  monitors, workspaces, clients, activewindow,
+                                                                  display_name="{}".format(panel["output"]),
+                                                                  icons_path=icons_path)
 
                     common.h_taskbars_list.append(taskbar)
                     container.pack_start(taskbar, False, False, panel["items-padding"])
@@ -351,18 +485,21 @@ def instantiate_content(panel, container, content_list, icons_path=""):
 
         if item == "niri-taskbar":
             if niri_sock:
-                outputs, workspaces, windows, focused_window = {}, {}, {}, {}
+                # real data will arrive with the first EventStream reply
+                outputs, n_workspaces, windows, focused_window = {}, {}, {}, {}
                 if "niri-taskbar" in panel:
                     if niri_sock:
                         check_key(panel, "niri-taskbar", {})
                         check_key(panel["niri-taskbar"], "all-outputs", False)
                         if panel["niri-taskbar"]["all-outputs"] or "output" not in panel:
-                            taskbar = NiriTaskbar(panel["niri-taskbar"], panel["position"], outputs, workspaces,
-                                                      windows, focused_window, icons_path=icons_path)
+                            taskbar = module_class("NiriTaskbar")(panel["niri-taskbar"], panel["position"], outputs,
+                                                                  n_workspaces, windows, focused_window,
+                                                                  icons_path=icons_path)
                         else:
-                            taskbar = NiriTaskbar(panel["niri-taskbar"], panel["position"], outputs, workspaces,
-                                                      windows, focused_window, display_name="{}".format(panel["output"]),
-                                                      icons_path=icons_path)
+                            taskbar = module_class("NiriTaskbar")(panel["niri-taskbar"], panel["position"], outputs,
+                                                                  n_workspaces, windows, focused_window,
+                                                                  display_name="{}".format(panel["output"]),
+                                                                  icons_path=icons_path)
 
                         common.niri_taskbars_list.append(taskbar)
                         container.pack_start(taskbar, False, False, panel["items-padding"])
@@ -372,10 +509,11 @@ def instantiate_content(panel, container, content_list, icons_path=""):
         if item == "hyprland-workspaces":
             if his:
                 if "hyprland-workspaces" in panel:
-                    workspaces = HyprlandWorkspaces(panel["hyprland-workspaces"], panel["output"], monitors, workspaces, clients,
-                                                    activewindow, activeworkspace, icons_path=icons_path)
-                    container.pack_start(workspaces, False, False, panel["items-padding"])
-                    common.h_workspaces_list.append(workspaces)
+                    h_workspaces = module_class("HyprlandWorkspaces")(panel["hyprland-workspaces"], panel["output"],
+                                                                      monitors, workspaces, clients, activewindow,
+                                                                      activeworkspace, icons_path=icons_path)
+                    container.pack_start(h_workspaces, False, False, panel["items-padding"])
+                    common.h_workspaces_list.append(h_workspaces)
                 else:
                     print("'hyprland-workspaces' not defined in this panel instance")
             else:
@@ -384,9 +522,9 @@ def instantiate_content(panel, container, content_list, icons_path=""):
         if item == "hyprland-submap":
             if his:
                 if item in panel:
-                    h_submap = HyprlandSubmap(panel[item], icons_path=icons_path)
+                    h_submap = module_class("HyprlandSubmap")(panel[item], icons_path=icons_path)
                 else:
-                    h_submap = HyprlandSubmap({}, icons_path=icons_path)
+                    h_submap = module_class("HyprlandSubmap")({}, icons_path=icons_path)
                 container.pack_start(h_submap, False, False, panel["items-padding"])
                 common.h_submaps_list.append(h_submap)
             else:
@@ -396,7 +534,7 @@ def instantiate_content(panel, container, content_list, icons_path=""):
             if his or sway or niri_sock:
                 if "keyboard-layout" not in panel:
                     panel["keyboard-layout"] = {}
-                kb_layout = KeyboardLayout(panel["keyboard-layout"], icons_path)
+                kb_layout = module_class("KeyboardLayout")(panel["keyboard-layout"], icons_path)
                 container.pack_start(kb_layout, False, False, panel["items-padding"])
             else:
                 eprint("KeyboardLayout module does not yet support your compositor")
@@ -404,19 +542,19 @@ def instantiate_content(panel, container, content_list, icons_path=""):
         if item == "pinned":
             if "pinned" not in panel:
                 panel["pinned"] = {}
-            pinned = Pinned(panel["pinned"], icons_path)
+            pinned = module_class("Pinned")(panel["pinned"], icons_path)
             container.pack_start(pinned, False, False, panel["items-padding"])
 
         if "button-" in item:
             if item in panel:
-                button = CustomButton(panel[item], icons_path)
+                button = module_class("CustomButton")(panel[item], icons_path)
                 container.pack_start(button, False, False, panel["items-padding"])
             else:
                 print("'{}' not defined in this panel instance".format(item))
 
         if "executor-" in item:
             if item in panel:
-                executor = Executor(panel[item], icons_path, item)
+                executor = module_class("Executor")(panel[item], icons_path, item)
                 container.pack_start(executor, False, False, panel["items-padding"])
                 common.executors_list.append(executor)
             else:
@@ -424,40 +562,40 @@ def instantiate_content(panel, container, content_list, icons_path=""):
 
         if item == "clock":
             if item in panel:
-                clock = Clock(panel[item], icons_path=icons_path)
+                clock = module_class("Clock")(panel[item], icons_path=icons_path)
                 container.pack_start(clock, False, False, panel["items-padding"])
             else:
-                clock = Clock({})
+                clock = module_class("Clock")({})
                 container.pack_start(clock, False, False, 0)
 
         if item == "playerctl":
             if item in panel:
-                playerctl = Playerctl(panel[item], voc, icons_path)
+                playerctl = module_class("Playerctl")(panel[item], voc, icons_path)
                 container.pack_start(playerctl, False, False, panel["items-padding"])
             else:
                 print("'{}' not defined in this panel instance".format(item))
 
         if item == "openweather":
             if "python-requests" in common.commands and common.commands["python-requests"]:
-                if item in panel:
-                    openweather = OpenWeather(panel[item], voc, icons_path=icons_path)
+                if item in panel and module_class("OpenWeather"):
+                    openweather = module_class("OpenWeather")(panel[item], voc, icons_path=icons_path)
                     container.pack_start(openweather, False, False, panel["items-padding"])
             else:
                 eprint("OpenWeather module needs the 'python-requests' package")
 
         if item == "brightness-slider":
             if item in panel:
-                brightness_slider = BrightnessSlider(panel[item], icons_path)
+                brightness_slider = module_class("BrightnessSlider")(panel[item], icons_path)
                 container.pack_start(brightness_slider, False, False, panel["items-padding"])
 
         if item == "cpu-avg":
-            cpu_avg = CpuAvg()
+            cpu_avg = module_class("CpuAvg")()
             container.pack_start(cpu_avg, False, False, panel["items-padding"])
 
         if item == "random-wallpaper":
             if item not in panel:
                 panel[item] = {}
-            cpu_avg = RandomWallpaper(panel[item], voc, icons_path)
+            cpu_avg = module_class("RandomWallpaper")(panel[item], voc, icons_path)
             container.pack_start(cpu_avg, False, False, panel["items-padding"])
 
         if item == "dwl-tags":
@@ -465,23 +603,479 @@ def instantiate_content(panel, container, content_list, icons_path=""):
                 if "dwl-tags" not in panel:
                     panel["dwl-tags"] = {}
 
-                dwl_tags = DwlTags(panel["output"], panel["dwl-tags"])
+                dwl_tags = module_class("DwlTags")(panel["output"], panel["dwl-tags"])
                 common.dwl_instances.append(dwl_tags)
                 container.pack_start(dwl_tags, False, False, panel["items-padding"])
                 dwl_data = load_json(common.dwl_data_file)
                 if dwl_data:
+                    common.dwl_data = dwl_data
                     dwl_tags.refresh(dwl_data)
             else:
                 eprint("{} data file not found".format(common.dwl_data_file))
 
-        if item == "tray" and tray_available:
+        if item == "tray" and module_class("Tray"):
             tray_settings = {}
             if "tray" in panel:
                 tray_settings = panel["tray"]
-            tray = sni_system_tray.Tray(tray_settings, panel["position"], icons_path)
+            tray = module_class("Tray")(tray_settings, panel["position"], icons_path)
             common.tray_list.append(tray)
             container.pack_start(tray, False, False, panel["items-padding"])
 
+        log_time(item, start, indent=2)
+        record_instance(item, start)
+
+
+def load_css():
+    try:
+        css_provider.load_from_path(style_file)
+    except Exception as e:
+        eprint(e)
+
+    # Controls background window (invisible): add style missing from the css file
+    css = css_provider.to_string().encode('utf-8')
+    css += b""" window#bcg-window { background-color: rgba(0, 0, 0, 0.2); } """
+    css_provider.load_from_data(css)
+
+
+def on_style_changed(monitor, file, other_file, event_type):
+    global css_reload_id
+    if event_type in [Gio.FileMonitorEvent.CHANGES_DONE_HINT, Gio.FileMonitorEvent.CREATED]:
+        # editors may save in several steps
+        if css_reload_id:
+            GLib.source_remove(css_reload_id)
+        css_reload_id = GLib.timeout_add(100, reload_css)
+
+
+def reload_css():
+    global css_reload_id
+    css_reload_id = None
+    print("Reloading {}".format(style_file))
+    load_css()
+    return False
+
+
+def prepare_panels(panels):
+    """
+    Clone panels defined for "All" outputs, skip those whose `run-if-output-*` conditions are not met.
+    """
+    # Mirror bars to all outputs #48 (if panel["output"] == "All")
+    to_remove = []
+    to_append = []
+    for panel in panels:
+        check_key(panel, "output", "")
+        check_key(panel, "monitor", "")
+        check_key(panel, "run-if-output-exist", [])
+        check_key(panel, "run-if-output-absent", [])
+        if panel["monitor"]:
+            try:
+                panel["output"] = common.mon_desc2output_name[panel["monitor"]]
+            except KeyError as err:
+                eprint(f"Monitor description unknown: {err}")
+
+        clones = []
+        if panel["output"] == "All" and len(common.outputs) >= 1:
+            to_remove.append(panel)
+            for key in common.outputs.keys():
+                clone = panel.copy()
+                clone["output"] = key
+                clones.append(clone)
+
+            to_append = to_append + clones
+        else:
+            for output in panel["run-if-output-exist"]:
+                if output not in common.outputs:
+                    to_remove.append(panel)
+            for output in panel["run-if-output-absent"]:
+                if output in common.outputs:
+                    to_remove.append(panel)
+
+    for item in to_remove:
+        if item in panels:
+            panels.remove(item)
+
+    return panels + to_append
+
+
+def panel_signature(panel, num):
+    """
+    :return: string identifying the panel config as loaded from file, and its output geometry; panels are only
+    rebuilt on reload if it changes
+    """
+    output = common.outputs.get(panel["output"], {})
+    geometry = [output.get(key) for key in ["x", "y", "width", "height"]]
+    return "{}#{} {}".format(json.dumps(panel, sort_keys=True), num, geometry)
+
+
+def create_panel(panel):
+    """
+    Build and show a panel window.
+    :return: the window, or None if the panel's output is not available
+    """
+    panel_start = time.perf_counter()
+    monitor = None
+    try:
+        monitor = common.outputs[panel["output"]]["monitor"]
+    except KeyError:
+        pass
+
+    if panel["output"] and not monitor:
+        eprint("Couldn't assign a Gdk.Monitor to output '{}'".format(panel["output"]))
+        return None
+
+    check_key(panel, "icons", "")
+    icons_path = ""
+    if panel["icons"] == "light":
+        icons_path = os.path.join(common.config_dir, "icons_light")
+    elif panel["icons"] == "dark":
+        icons_path = os.path.join(common.config_dir, "icons_dark")
+
+    # This is to allow width "auto" value. Actually all non-numeric values will be removed.
+    if "width" in panel and not isinstance(panel["width"], int):
+        panel.pop("width")
+        panel["width-as-percentage"] = False
+
+    if panel["output"] in common.outputs or not panel["output"]:
+        check_key(panel, "spacing", 6)
+        check_key(panel, "css-name", "")
+        check_key(panel, "padding-horizontal", 0)
+        check_key(panel, "padding-vertical", 0)
+        check_key(panel, "sigrt", 0)  # SIGRTMIN > hide_show_sig_num <= SIGRTMAX, (0 = disabled)
+        check_key(panel, "use-sigrt", False)
+        check_key(panel, "start-hidden", False)
+
+        check_key(panel, "width-as-percentage", False)
+
+        window = Gtk.Window()
+        global panel_windows_hide_show_sigs
+        if panel["use-sigrt"]:
+            panel_windows_hide_show_sigs[window] = panel["sigrt"]
+        else:
+            panel_windows_hide_show_sigs[window] = 0
+
+        if panel["css-name"]:
+            window.set_property("name", panel["css-name"])
+
+        if "output" not in panel or not panel["output"]:
+            display = Gdk.Display.get_default()
+            monitor = display.get_monitor(0)
+            for key in common.outputs:
+                if common.outputs[key]["monitor"] == monitor:
+                    panel["output"] = key
+
+        # Width undefined or "auto"
+        if "output" in panel and panel["output"] and "width" not in panel:
+            panel["width"] = common.outputs[panel["output"]]["width"]
+
+        # Width defined as percentage
+        if "width" in panel and panel["width"] > 0 and panel["width-as-percentage"]:
+            if panel["width"] > 100:
+                panel["width"] = 100
+            panel["width"] = int(common.outputs[panel["output"]]["width"] * panel["width"] / 100)
+
+        check_key(panel, "width", 0)
+        w = panel["width"]
+
+        check_key(panel["controls-settings"], "window-width", 0)
+        controls_width = panel["controls-settings"]["window-width"] if panel["controls-settings"][
+                                                                           "window-width"] > 0 else int(w / 5)
+        check_key(panel, "height", 0)
+        h = panel["height"]
+
+        check_key(panel, "controls", "off")
+        if panel["controls"]:
+            check_key(panel, "controls-settings", {})
+
+        if "controls-settings" in panel:
+            controls_settings = panel["controls-settings"]
+            check_key(controls_settings, "show-values", False)
+            check_key(controls_settings, "window-margin", 0)
+
+        check_key(panel, "menu-start", "off")
+        if panel["menu-start"]:
+            check_key(panel, "menu-start-settings", {})
+            defaults = {
+                "cmd-lock": "swaylock -f -c 000000",
+                "cmd-logout": "swaymsg exit",
+                "cmd-restart": "systemctl reboot",
+                "cmd-shutdown": "systemctl -i poweroff",
+                "autohide": True,
+                "file-manager": "thunar",
+                "height": 0,
+                "icon-size-large": 32,
+                "icon-size-small": 16,
+                "icon-size-button": 16,
+                "margin-bottom": 0,
+                "margin-left": 0,
+                "margin-right": 0,
+                "margin-top": 0,
+                "padding": 2,
+                "terminal": "foot",
+                "width": 0
+            }
+            for key in defaults:
+                check_key(panel["menu-start-settings"], key, defaults[key])
+
+        if panel["menu-start"] != "off":
+            panel["menu-start-settings"]["horizontal-align"] = panel["menu-start"]
+
+        Gtk.Widget.set_size_request(window, w, h)
+
+        o = Gtk.Orientation.HORIZONTAL if panel["position"] == "top" or panel[
+            "position"] == "bottom" else Gtk.Orientation.VERTICAL
+
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        hbox = Gtk.Box(orientation=o, spacing=0)
+        vbox.pack_start(hbox, True, True, panel["padding-vertical"])
+
+        check_key(panel, "modules-left", [])
+        check_key(panel, "modules-center", [])
+        check_key(panel, "modules-right", [])
+        check_key(panel, "homogeneous", False)
+
+        inner_box = Gtk.Box(orientation=o, spacing=0)
+
+        hbox.pack_start(inner_box, True, True, 0)
+        hbox.set_property("margin-start", panel["padding-horizontal"])
+        hbox.set_property("margin-end", panel["padding-horizontal"])
+        hbox.set_property("margin-top", panel["padding-vertical"])
+        hbox.set_property("margin-bottom", panel["padding-vertical"])
+
+        left_box = Gtk.Box(orientation=o, spacing=panel["spacing"])
+        left_box.set_property("name", "left-box")
+        inner_box.pack_start(left_box, False, True, 0)
+        if panel["controls"] and panel["controls"] == "left":
+            start = time.perf_counter()
+            monitor = None
+            try:
+                monitor = common.outputs[panel["output"]]["monitor"]
+            except KeyError:
+                pass
+
+            cc = module_class("Controls")(panel["controls-settings"], panel["position"], panel["controls"],
+                          controls_width, monitor=monitor, icons_path=icons_path)
+            common.controls_list.append(cc)
+            left_box.pack_start(cc, False, False, 0)
+            log_time("controls", start, indent=2)
+            record_instance("controls", start)
+
+            if common.commands["swaync"] or common.commands["nwg-notifications"]:
+                if "notifications" not in panel:
+                    panel["notifications"] = {}
+                notifications = module_class("Notifications")(panel["notifications"], icons_path, panel["position"])
+                left_box.pack_start(notifications, False, False, 0)
+
+        if panel["menu-start"] == "left":
+            ms = module_class("MenuStart")(panel, icons_path=icons_path)
+            left_box.pack_start(ms, False, False, 0)
+
+        instantiate_content(panel, left_box, panel["modules-left"], icons_path=icons_path)
+        print("left box created")
+
+        center_box = Gtk.Box(orientation=o, spacing=panel["spacing"])
+        center_box.set_property("name", "center-box")
+
+        if panel["modules-center"] and panel["homogeneous"]:
+            inner_box.set_center_widget(center_box)
+        else:
+            inner_box.pack_start(center_box, True, False, 0)
+
+        check_key(panel, "modules-center", [])
+        instantiate_content(panel, center_box, panel["modules-center"], icons_path=icons_path)
+        print("center box created")
+
+        right_box = Gtk.Box(orientation=o, spacing=panel["spacing"])
+        right_box.set_property("name", "right-box")
+        # Damn on the guy who invented `pack_start(child, expand, fill, padding)`!
+        helper_box = Gtk.Box(orientation=o, spacing=0)
+        helper_box.pack_end(right_box, False, False, 0)
+        inner_box.pack_end(helper_box, False, True, 0)
+        check_key(panel, "modules-right", [])
+        instantiate_content(panel, right_box, panel["modules-right"], icons_path=icons_path)
+        print("right box created")
+
+        if panel["menu-start"] == "right":
+            ms = module_class("MenuStart")(panel["menu-start-settings"], icons_path=icons_path)
+            right_box.pack_end(ms, False, False, 0)
+
+        if panel["controls"] and panel["controls"] == "right":
+            start = time.perf_counter()
+            monitor = None
+            try:
+                monitor = common.outputs[panel["output"]]["monitor"]
+            except KeyError:
+                pass
+
+            cc = module_class("Controls")(panel["controls-settings"], panel["position"], panel["controls"],
+                          controls_width, monitor=monitor, icons_path=icons_path)
+            common.controls_list.append(cc)
+            right_box.pack_end(cc, False, False, 0)
+            log_time("controls", start, indent=2)
+            record_instance("controls", start)
+
+            if common.commands["swaync"] or common.commands["nwg-notifications"]:
+                if "notifications" not in panel:
+                    panel["notifications"] = {}
+
+                notifications = module_class("Notifications")(panel["notifications"], icons_path, panel["position"])
+                right_box.pack_end(notifications, False, False, 0)
+
+        window.add(vbox)
+
+        GtkLayerShell.init_for_window(window)
+        GtkLayerShell.set_namespace(window, "nwg-panel")
+
+        monitor = None
+        try:
+            monitor = common.outputs[panel["output"]]["monitor"]
+        except KeyError:
+            pass
+
+        check_key(panel, "layer", "top")
+        o = panel["output"] if "output" in panel else "undefined"
+        m = panel["monitor"] if "monitor" in panel else "undefined"
+        print("Panel '{}': output: {}, monitor: {}, position: {}, layer: {}, width: {}, height: {}".format(
+            panel["name"], o, m,
+            panel["position"],
+            panel["layer"],
+            panel["width"],
+            panel["height"]))
+
+        if monitor:
+            GtkLayerShell.set_monitor(window, monitor)
+
+        check_key(panel, "exclusive-zone", True)
+        if panel["exclusive-zone"]:
+            GtkLayerShell.auto_exclusive_zone_enable(window)
+
+        layers = {"background": GtkLayerShell.Layer.BACKGROUND,
+                  "bottom": GtkLayerShell.Layer.BOTTOM,
+                  "top": GtkLayerShell.Layer.TOP,
+                  "overlay": GtkLayerShell.Layer.OVERLAY}
+
+        GtkLayerShell.set_layer(window, layers[panel["layer"]])
+
+        """if panel["layer"] == "top":
+            GtkLayerShell.set_layer(window, GtkLayerShell.Layer.TOP)
+        else:
+            GtkLayerShell.set_layer(window, GtkLayerShell.Layer.BOTTOM)"""
+
+        check_key(panel, "margin-top", 0)
+        GtkLayerShell.set_margin(window, GtkLayerShell.Edge.TOP, panel["margin-top"])
+
+        check_key(panel, "margin-bottom", 0)
+        GtkLayerShell.set_margin(window, GtkLayerShell.Edge.BOTTOM, panel["margin-bottom"])
+
+        if panel["position"] == "top":
+            GtkLayerShell.set_anchor(window, GtkLayerShell.Edge.TOP, 1)
+        elif panel["position"] == "bottom":
+            GtkLayerShell.set_anchor(window, GtkLayerShell.Edge.BOTTOM, 1)
+        elif panel["position"] == "left":
+            GtkLayerShell.set_anchor(window, GtkLayerShell.Edge.LEFT, 1)
+        elif panel["position"] == "right":
+            GtkLayerShell.set_anchor(window, GtkLayerShell.Edge.RIGHT, 1)
+
+        if panel["use-sigrt"] and panel["start-hidden"]:
+            window.hide()
+        else:
+            window.show_all()
+
+        log_time("Panel '{}' on '{}'".format(panel["name"], panel["output"]), panel_start)
+
+        return window
+
+    return None
+
+
+def destroy_panel(window):
+    # forget the window's modules first, so that they don't get refreshed while being destroyed
+    for name in ["h_taskbars_list", "h_workspaces_list", "h_submaps_list", "niri_taskbars_list", "controls_list",
+                 "executors_list", "tray_list", "dwl_instances"]:
+        widgets = getattr(common, name)
+        # the tray host keeps a reference to the list, update in place
+        widgets[:] = [w for w in widgets if w.get_toplevel() != window]
+    panel_windows_hide_show_sigs.pop(window, None)
+    window.destroy()
+
+
+def apply_panels(panels):
+    """
+    Show `panels`: keep running ones whose config & output did not change, destroy the rest, create new ones.
+    """
+    wanted = {}
+    for panel in panels:
+        # the same panel defined twice gets two signatures
+        num = 0
+        while panel_signature(panel, num) in wanted:
+            num += 1
+        wanted[panel_signature(panel, num)] = panel
+
+    for signature in list(running_panels.keys()):
+        if signature not in wanted:
+            destroy_panel(running_panels.pop(signature))
+
+    for signature, panel in wanted.items():
+        if signature not in running_panels:
+            # create_panel modifies the config, the signature was taken before
+            window = create_panel(panel)
+            if window:
+                running_panels[signature] = window
+
+
+def start_watchers():
+    """
+    Start compositor & tray watchers needed by the modules created so far; called again after each reload.
+    """
+    global hypr_watcher_started, dwl_started
+    if his and not hypr_watcher_started:
+        if len(common.h_taskbars_list) > 0 or len(common.h_workspaces_list) > 0:
+            print("his: '{}', starting hypr_watcher".format(his))
+            # read from Hyprland socket2 on another thread
+            thread = threading.Thread(target=hypr_watcher, daemon=True)
+            thread.daemon = True
+            thread.start()
+            hypr_watcher_started = True
+
+    if len(common.dwl_instances) > 0 and not dwl_started:
+        dwl_started = True
+        if dwl_connect():
+            GLib.timeout_add_seconds(3, dwl_connect)
+
+    if len(common.tray_list) > 0:
+        from nwg_panel.modules import sni_system_tray
+        sni_system_tray.init_tray(common.tray_list)
+
+
+def reload_panels(attempt=0):
+    """
+    Apply changes to the config file and outputs in place, instead of restarting the process: only panels whose
+    config or output changed are rebuilt.
+    """
+    global reload_id, h_startup_data
+    reload_id = None
+
+    common.outputs, common.mon_desc2output_name = list_outputs(sway=sway, silent=True)
+    if not all(output["monitor"] for output in common.outputs.values()) and attempt < 5:
+        # a new output may not have been assigned a Gdk.Monitor yet
+        reload_id = GLib.timeout_add(common_settings["restart-delay"], reload_panels, attempt + 1)
+        return False
+    common.outputs_num = num_active_outputs(common.i3.get_outputs()) if sway else len(common.outputs)
+
+    panels = load_json(config_file)
+    if not panels:
+        eprint("Couldn't load {}, panels not reloaded".format(config_file))
+        return False
+
+    start = time.perf_counter()
+    # Hyprland modules created from now on need fresh data
+    h_startup_data = None
+    apply_panels(prepare_panels(panels))
+    start_watchers()
+    if niri_coalescer and len(common.niri_taskbars_list) > 0:
+        niri_coalescer.queue("reload")
+    log_time("Reload", start, indent=0)
+
+    return False
+
 
 def main():
     parser = argparse.ArgumentParser()
@@ -507,6 +1101,17 @@ def main():
                         action="store_true",
                         help="restore default config files")
 
+    parser.add_argument("-d",
+                        "--debug",
+                        action="store_true",
+                        help="print debug information, e.g. startup times; send SIGUSR2 to print scheduler thread and "
+                             "job counts, and save per-module stats as JSON")
+
+    parser.add_argument("-p",
+                        "--profile-startup",
+                        action="store_true",
+                        help="print module import and instantiation times on startup")
+
     parser.add_argument("-v",
                         "--version",
                         action="version",
@@ -514,63 +1119,29 @@ def main():
                         help="display version information")
 
     args = parser.parse_args()
+    common.debug = args.debug
+    startup = time.perf_counter()
+    # interpreter startup and the imports above
+    before_main = (time.time() - psutil.Process().create_time()) * 1000
 
-    # Kill running instances, if any
-    own_pid = os.getpid()
-    running_instances = []
-
-    for proc in psutil.process_iter(['pid', 'name']):
-        name = proc.info['name']
-        if name and "nwg-panel" in name and "-con" not in name:
-            pid = proc.info['pid']
-            if pid != own_pid:
-                running_instances.append(pid)
-                print(f"Running instance found, PID {pid}, sending SIGINT")
-                try:
-                    os.kill(pid, signal.SIGINT)
-                except ProcessLookupError:
-                    continue  # Process already dead
-
-    # Wait for clean shutdown (max 3 seconds)
-    max_wait = 3.0
-    interval = 0.2
-    elapsed = 0.0
-
-    while elapsed < max_wait:
-        alive = [p for p in running_instances if psutil.pid_exists(p)]
-        if not alive:
-            break
-        time.sleep(interval)
-        elapsed += interval
+    # Ask the running instance, if any, to quit, and wait until it's gone
+    instance_socket = instance.take_over()
 
-    # SIGKILL if still alive
-    for pid in running_instances:
-        if psutil.pid_exists(pid):
-            print(f"PID {pid} still alive after {elapsed:.1f}s, sending SIGKILL")
-            try:
-                os.kill(pid, signal.SIGKILL)
-            except ProcessLookupError:
-                pass
-
-    # Fallback: kill by PID file (should never happen)
+    # Fallback: kill by PID file (instances older than the instance socket)
     pid_file = os.path.join(temp_dir(), "nwg-panel.pid")
     if os.path.isfile(pid_file):
         try:
             pid = int(load_text_file(pid_file))
-            if psutil.pid_exists(pid):
+            if pid != os.getpid() and psutil.pid_exists(pid):
                 print(f"Unnamed instance found via PID file, killing PID {pid}")
                 os.kill(pid, signal.SIGKILL)
         except:
             pass
 
-    # Warn if KDE's background daemon is running
-    for proc in psutil.process_iter(['name']):
-        if proc.info['name'] in ('kded5', 'kded6'):
-            eprint(f"Warning: '{proc.info['name']}' is running and may block the system tray.")
-            eprint("> See https://github.com/Alexays/Waybar/issues/3468 for details.")
-            break
+    # scanning all processes takes a while, don't wait for it
+    threading.Thread(target=warn_if_kded_running, daemon=True).start()
 
-    save_string(str(own_pid), pid_file)
+    save_string(str(os.getpid()), pid_file)
 
     common.config_dir = get_config_dir()
 
@@ -583,11 +1154,21 @@ def main():
             "restart-on-display": True,
             "restart-delay": 500,
             "processes-backgroud-only": True,
-            "processes-own-only": True
+            "processes-own-only": True,
+            "event-debounce": 20
         }
         save_json(common_settings, cs_file)
     else:
         common_settings = load_json(cs_file)
+    check_key(common_settings, "restart-on-display", True)
+    check_key(common_settings, "restart-delay", 500)
+    # time to wait for more compositor events before refreshing taskbars & workspaces, in milliseconds
+    check_key(common_settings, "event-debounce", 20)
+    # per-module timings & counters, saved to a JSON file on SIGUSR2; always on with --debug
+    check_key(common_settings, "instrumentation", False)
+
+    if common.debug or common_settings["instrumentation"]:
+        instrumentation.enable()
 
     print("Common settings", common_settings)
 
@@ -620,11 +1201,9 @@ def main():
     check_commands()
     print("Dependencies check:", common.commands)
 
-    global restart_cmd
-    restart_cmd = "nwg-panel -c {} -s {}".format(args.config, args.style)
-
     save_string("-c {} -s {}".format(args.config, args.style), os.path.join(local_dir(), "args"))
 
+    global config_file
     config_file = os.path.join(common.config_dir, args.config)
 
     copy_files(os.path.join(dir_name, "icons_light"), os.path.join(common.config_dir, "icons_light"))
@@ -642,320 +1221,20 @@ def main():
         print(key, common.outputs[key])
     print(f"Descriptions: {common.mon_desc2output_name}")
 
-    panels = load_json(config_file)
-
+    global css_provider, style_file, style_monitor
+    style_file = os.path.join(common.config_dir, args.style)
     screen = Gdk.Screen.get_default()
-    provider = Gtk.CssProvider()
+    css_provider = Gtk.CssProvider()
     style_context = Gtk.StyleContext()
-    style_context.add_provider_for_screen(screen, provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
-    try:
-        provider.load_from_path(os.path.join(common.config_dir, args.style))
-    except Exception as e:
-        eprint(e)
+    style_context.add_provider_for_screen(screen, css_provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+    load_css()
+    # apply changes to the style sheet in place
+    style_monitor = Gio.File.new_for_path(style_file).monitor_file(Gio.FileMonitorFlags.NONE, None)
+    style_monitor.connect("changed", on_style_changed)
 
-    # Controls background window (invisible): add style missing from the css file
-    css = provider.to_string().encode('utf-8')
-    css += b""" window#bcg-window { background-color: rgba(0, 0, 0, 0.2); } """
-    provider.load_from_data(css)
-
-    # Mirror bars to all outputs #48 (if panel["output"] == "All")
-    to_remove = []
-    to_append = []
-    for panel in panels:
-        check_key(panel, "output", "")
-        check_key(panel, "monitor", "")
-        check_key(panel, "run-if-output-exist", [])
-        check_key(panel, "run-if-output-absent", [])
-        if panel["monitor"]:
-            try:
-                panel["output"] = common.mon_desc2output_name[panel["monitor"]]
-            except KeyError as err:
-                eprint(f"Monitor description unknown: {err}")
-
-        clones = []
-        if panel["output"] == "All" and len(common.outputs) >= 1:
-            to_remove.append(panel)
-            for key in common.outputs.keys():
-                clone = panel.copy()
-                clone["output"] = key
-                clones.append(clone)
-
-            to_append = to_append + clones
-        else:
-            for output in panel["run-if-output-exist"]:
-                if output not in common.outputs:
-                    to_remove.append(panel)
-            for output in panel["run-if-output-absent"]:
-                if output in common.outputs:
-                    to_remove.append(panel)
-
-    for item in to_remove:
-        if item in panels:
-            panels.remove(item)
-
-    panels = panels + to_append
-
-    for panel in panels:
-        monitor = None
-        try:
-            monitor = common.outputs[panel["output"]]["monitor"]
-        except KeyError:
-            pass
-
-        if panel["output"] and not monitor:
-            eprint("Couldn't assign a Gdk.Monitor to output '{}'".format(panel["output"]))
-            continue
-
-        check_key(panel, "icons", "")
-        icons_path = ""
-        if panel["icons"] == "light":
-            icons_path = os.path.join(common.config_dir, "icons_light")
-        elif panel["icons"] == "dark":
-            icons_path = os.path.join(common.config_dir, "icons_dark")
-
-        # This is to allow width "auto" value. Actually all non-numeric values will be removed.
-        if "width" in panel and not isinstance(panel["width"], int):
-            panel.pop("width")
-            panel["width-as-percentage"] = False
-
-        if panel["output"] in common.outputs or not panel["output"]:
-            check_key(panel, "spacing", 6)
-            check_key(panel, "css-name", "")
-            check_key(panel, "padding-horizontal", 0)
-            check_key(panel, "padding-vertical", 0)
-            check_key(panel, "sigrt", 0)  # SIGRTMIN > hide_show_sig_num <= SIGRTMAX, (0 = disabled)
-            check_key(panel, "use-sigrt", False)
-            check_key(panel, "start-hidden", False)
-
-            check_key(panel, "width-as-percentage", False)
-
-            window = Gtk.Window()
-            global panel_windows_hide_show_sigs
-            if panel["use-sigrt"]:
-                panel_windows_hide_show_sigs[window] = panel["sigrt"]
-            else:
-                panel_windows_hide_show_sigs[window] = 0
-
-            if panel["css-name"]:
-                window.set_property("name", panel["css-name"])
-
-            if "output" not in panel or not panel["output"]:
-                display = Gdk.Display.get_default()
-                monitor = display.get_monitor(0)
-                for key in common.outputs:
-                    if common.outputs[key]["monitor"] == monitor:
-                        panel["output"] = key
-
-            # Width undefined or "auto"
-            if "output" in panel and panel["output"] and "width" not in panel:
-                panel["width"] = common.outputs[panel["output"]]["width"]
-
-            # Width defined as percentage
-            if "width" in panel and panel["width"] > 0 and panel["width-as-percentage"]:
-                if panel["width"] > 100:
-                    panel["width"] = 100
-                panel["width"] = int(common.outputs[panel["output"]]["width"] * panel["width"] / 100)
-
-            check_key(panel, "width", 0)
-            w = panel["width"]
-
-            check_key(panel["controls-settings"], "window-width", 0)
-            controls_width = panel["controls-settings"]["window-width"] if panel["controls-settings"][
-                                                                               "window-width"] > 0 else int(w / 5)
-            check_key(panel, "height", 0)
-            h = panel["height"]
-
-            check_key(panel, "controls", "off")
-            if panel["controls"]:
-                check_key(panel, "controls-settings", {})
-
-            if "controls-settings" in panel:
-                controls_settings = panel["controls-settings"]
-                check_key(controls_settings, "show-values", False)
-                check_key(controls_settings, "window-margin", 0)
-
-            check_key(panel, "menu-start", "off")
-            if panel["menu-start"]:
-                check_key(panel, "menu-start-settings", {})
-                defaults = {
-                    "cmd-lock": "swaylock -f -c 000000",
-                    "cmd-logout": "swaymsg exit",
-                    "cmd-restart": "systemctl reboot",
-                    "cmd-shutdown": "systemctl -i poweroff",
-                    "autohide": True,
-                    "file-manager": "thunar",
-                    "height": 0,
-                    "icon-size-large": 32,
-                    "icon-size-small": 16,
-                    "icon-size-button": 16,
-                    "margin-bottom": 0,
-                    "margin-left": 0,
-                    "margin-right": 0,
-                    "margin-top": 0,
-                    "padding": 2,
-                    "terminal": "foot",
-                    "width": 0
-                }
-                for key in defaults:
-                    check_key(panel["menu-start-settings"], key, defaults[key])
-
-            if panel["menu-start"] != "off":
-                panel["menu-start-settings"]["horizontal-align"] = panel["menu-start"]
-
-            Gtk.Widget.set_size_request(window, w, h)
-
-            o = Gtk.Orientation.HORIZONTAL if panel["position"] == "top" or panel[
-                "position"] == "bottom" else Gtk.Orientation.VERTICAL
-
-            vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
-            hbox = Gtk.Box(orientation=o, spacing=0)
-            vbox.pack_start(hbox, True, True, panel["padding-vertical"])
-
-            check_key(panel, "modules-left", [])
-            check_key(panel, "modules-center", [])
-            check_key(panel, "modules-right", [])
-            check_key(panel, "homogeneous", False)
-
-            inner_box = Gtk.Box(orientation=o, spacing=0)
-
-            hbox.pack_start(inner_box, True, True, 0)
-            hbox.set_property("margin-start", panel["padding-horizontal"])
-            hbox.set_property("margin-end", panel["padding-horizontal"])
-            hbox.set_property("margin-top", panel["padding-vertical"])
-            hbox.set_property("margin-bottom", panel["padding-vertical"])
-
-            left_box = Gtk.Box(orientation=o, spacing=panel["spacing"])
-            left_box.set_property("name", "left-box")
-            inner_box.pack_start(left_box, False, True, 0)
-            if panel["controls"] and panel["controls"] == "left":
-                monitor = None
-                try:
-                    monitor = common.outputs[panel["output"]]["monitor"]
-                except KeyError:
-                    pass
-
-                cc = Controls(panel["controls-settings"], panel["position"], panel["controls"],
-                              controls_width, monitor=monitor, icons_path=icons_path)
-                common.controls_list.append(cc)
-                left_box.pack_start(cc, False, False, 0)
-
-                if common.commands["swaync"] or common.commands["nwg-notifications"]:
-                    if "notifications" not in panel:
-                        panel["notifications"] = {}
-                    notifications = Notifications(panel["notifications"], icons_path, panel["position"])
-                    left_box.pack_start(notifications, False, False, 0)
-
-            if panel["menu-start"] == "left":
-                ms = MenuStart(panel, icons_path=icons_path)
-                left_box.pack_start(ms, False, False, 0)
-
-            instantiate_content(panel, left_box, panel["modules-left"], icons_path=icons_path)
-            print("left box created")
-
-            center_box = Gtk.Box(orientation=o, spacing=panel["spacing"])
-            center_box.set_property("name", "center-box")
-
-            if panel["modules-center"] and panel["homogeneous"]:
-                inner_box.set_center_widget(center_box)
-            else:
-                inner_box.pack_start(center_box, True, False, 0)
-
-            check_key(panel, "modules-center", [])
-            instantiate_content(panel, center_box, panel["modules-center"], icons_path=icons_path)
-            print("center box created")
-
-            right_box = Gtk.Box(orientation=o, spacing=panel["spacing"])
-            right_box.set_property("name", "right-box")
-            # Damn on the guy who invented `pack_start(child, expand, fill, padding)`!
-            helper_box = Gtk.Box(orientation=o, spacing=0)
-            helper_box.pack_end(right_box, False, False, 0)
-            inner_box.pack_end(helper_box, False, True, 0)
-            check_key(panel, "modules-right", [])
-            instantiate_content(panel, right_box, panel["modules-right"], icons_path=icons_path)
-            print("right box created")
-
-            if panel["menu-start"] == "right":
-                ms = MenuStart(panel["menu-start-settings"], icons_path=icons_path)
-                right_box.pack_end(ms, False, False, 0)
-
-            if panel["controls"] and panel["controls"] == "right":
-                monitor = None
-                try:
-                    monitor = common.outputs[panel["output"]]["monitor"]
-                except KeyError:
-                    pass
-
-                cc = Controls(panel["controls-settings"], panel["position"], panel["controls"],
-                              controls_width, monitor=monitor, icons_path=icons_path)
-                common.controls_list.append(cc)
-                right_box.pack_end(cc, False, False, 0)
-
-                if common.commands["swaync"] or common.commands["nwg-notifications"]:
-                    if "notifications" not in panel:
-                        panel["notifications"] = {}
-
-                    notifications = Notifications(panel["notifications"], icons_path, panel["position"])
-                    right_box.pack_end(notifications, False, False, 0)
-
-            window.add(vbox)
-
-            GtkLayerShell.init_for_window(window)
-            GtkLayerShell.set_namespace(window, "nwg-panel")
-
-            monitor = None
-            try:
-                monitor = common.outputs[panel["output"]]["monitor"]
-            except KeyError:
-                pass
-
-            check_key(panel, "layer", "top")
-            o = panel["output"] if "output" in panel else "undefined"
-            m = panel["monitor"] if "monitor" in panel else "undefined"
-            print("Panel '{}': output: {}, monitor: {}, position: {}, layer: {}, width: {}, height: {}".format(
-                panel["name"], o, m,
-                panel["position"],
-                panel["layer"],
-                panel["width"],
-                panel["height"]))
-
-            if monitor:
-                GtkLayerShell.set_monitor(window, monitor)
-
-            check_key(panel, "exclusive-zone", True)
-            if panel["exclusive-zone"]:
-                GtkLayerShell.auto_exclusive_zone_enable(window)
-
-            layers = {"background": GtkLayerShell.Layer.BACKGROUND,
-                      "bottom": GtkLayerShell.Layer.BOTTOM,
-                      "top": GtkLayerShell.Layer.TOP,
-                      "overlay": GtkLayerShell.Layer.OVERLAY}
-
-            GtkLayerShell.set_layer(window, layers[panel["layer"]])
-
-            """if panel["layer"] == "top":
-                GtkLayerShell.set_layer(window, GtkLayerShell.Layer.TOP)
-            else:
-                GtkLayerShell.set_layer(window, GtkLayerShell.Layer.BOTTOM)"""
-
-            check_key(panel, "margin-top", 0)
-            GtkLayerShell.set_margin(window, GtkLayerShell.Edge.TOP, panel["margin-top"])
-
-            check_key(panel, "margin-bottom", 0)
-            GtkLayerShell.set_margin(window, GtkLayerShell.Edge.BOTTOM, panel["margin-bottom"])
-
-            if panel["position"] == "top":
-                GtkLayerShell.set_anchor(window, GtkLayerShell.Edge.TOP, 1)
-            elif panel["position"] == "bottom":
-                GtkLayerShell.set_anchor(window, GtkLayerShell.Edge.BOTTOM, 1)
-            elif panel["position"] == "left":
-                GtkLayerShell.set_anchor(window, GtkLayerShell.Edge.LEFT, 1)
-            elif panel["position"] == "right":
-                GtkLayerShell.set_anchor(window, GtkLayerShell.Edge.RIGHT, 1)
-
-            if panel["use-sigrt"] and panel["start-hidden"]:
-                window.hide()
-            else:
-                window.show_all()
+    if common.debug:
+        print("Startup times:")
+    apply_panels(prepare_panels(load_json(config_file)))
 
     if sway:
         common.outputs_num = num_active_outputs(common.i3.get_outputs())
@@ -965,8 +1244,10 @@ def main():
 
     if sway:
         # Notice: Don't use Event.OUTPUT, it's not supported on old sway releases.
-        common.i3.on(Event.WORKSPACE, on_i3ipc_event)
-        common.i3.on(Event.WINDOW, on_i3ipc_event)
+        # WINDOW and WORKSPACE events are subscribed to once, by CompositorState, which fetches the tree
+        # once per event burst, and hands the snapshot over to sway modules.
+        common.compositor_state.connect(on_sway_state_changed)
+        common.compositor_state.start(debounce=common_settings["event-debounce"])
 
         # We monitor i3ipc events in a separate thread, and callbacks will also
         # be executed there. Hence, UI operations MUST be scheduled by
@@ -975,21 +1256,19 @@ def main():
         thread = threading.Thread(target=common.i3.main, daemon=True)
         thread.start()
 
-    if his:
-        if len(common.h_taskbars_list) > 0 or len(common.h_workspaces_list) > 0:
-            print("his: '{}', starting hypr_watcher".format(his))
-            # read from Hyprland socket2 on another thread
-            thread = threading.Thread(target=hypr_watcher, daemon=True)
-            thread.daemon = True
-            thread.start()
-
     if niri_sock:
         thread = threading.Thread(target=niri_watcher, daemon=True)
         thread.daemon = True
         thread.start()
 
-    if tray_available and len(common.tray_list) > 0:
-        sni_system_tray.init_tray(common.tray_list)
+    start_watchers()
+
+    if instance_socket:
+        instance.listen(instance_socket, {"quit": quit_panel, "reload": reload_all})
+
+    log_time("Total", startup, indent=0)
+    if args.profile_startup:
+        print_profile((time.perf_counter() - startup) * 1000, before_main)
 
     Gtk.main()
 
@@ -7,7 +7,9 @@ gi.require_version('Gdk', '3.0')
 gi.require_version('GtkLayerShell', '0.1')
 from gi.repository import Gtk, Gdk, GLib, GtkLayerShell
 
-from nwg_panel.tools import check_key, get_brightness, set_brightness, update_image, create_background_task, eprint
+from nwg_panel.tools import check_key, get_brightness, set_brightness, update_image
+from nwg_panel.backlight import get_backlight
+from nwg_panel.scheduler import share
 
 
 class BrightnessSlider(Gtk.EventBox):
@@ -64,6 +66,7 @@ class BrightnessSlider(Gtk.EventBox):
         self.connect('button-release-event', self.on_button_release)
         self.connect('enter-notify-event', self.on_enter_notify_event)
         self.connect('leave-notify-event', self.on_leave_notify_event)
+        self.connect('destroy', lambda widget: self.popup_window.destroy())
         if self.settings["step-size"] > 0:
             self.add_events(Gdk.EventMask.SCROLL_MASK) 
             self.connect('scroll-event', self.on_scroll)
@@ -83,16 +86,20 @@ class BrightnessSlider(Gtk.EventBox):
             self.box.pack_start(self.bri_image, False, False, 2)
 
     def refresh(self):
-        thread = create_background_task(self.refresh_output, self.settings["interval"])
-        thread.start()
-
-    def refresh_output(self):
-        try:
-            self.bri_value = get_brightness(device=self.settings["backlight-device"],
-                                            controller=self.settings["backlight-controller"])
-            GLib.idle_add(self.update_brightness)
-        except Exception as e:
-            eprint(e)
+        device = self.settings["backlight-device"]
+        controller = self.settings["backlight-controller"]
+        backlight = get_backlight(device, controller)
+        if backlight and backlight.notifies:
+            backlight.connect(self.on_brightness, owner=self)
+        else:
+            # same key as in Controls, so that both modules share the job
+            interval = self.settings["interval"]
+            self.job = share(("brightness", device, controller, interval), get_brightness, interval,
+                             self.on_brightness, kwargs={"device": device, "controller": controller}, owner=self)
+
+    def on_brightness(self, value):
+        self.bri_value = value
+        self.update_brightness()
 
     def update_brightness(self, get=True):
         icon_name = bri_icon_name(self.bri_value)
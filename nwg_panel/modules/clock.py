@@ -1,20 +1,31 @@
 #!/usr/bin/env python3
 import os.path
 
-from gi.repository import GLib
-
 import subprocess
 from datetime import datetime
 
 from nwg_panel.tools import (check_key, eprint, local_dir, load_json, save_json, update_image, update_gtk_entry,
-                             create_background_task, cmd_through_compositor)
+                             cmd_through_compositor)
+from nwg_panel.scheduler import schedule
 
 import gi
 
 gi.require_version('Gtk', '3.0')
 gi.require_version('Gdk', '3.0')
 
-from gi.repository import Gtk, Gdk, GtkLayerShell
+from gi.repository import Gtk, Gdk, GLib, GtkLayerShell
+
+
+def get_time(time_format, tooltip_format):
+    now = datetime.now()
+    try:
+        time = now.strftime(time_format)
+        tooltip = now.strftime(tooltip_format) if tooltip_format else ""
+    except Exception as e:
+        print(e)
+        time, tooltip = None, ""
+
+    return time, tooltip, now.strftime("%Y#%m#%d").split("#")
 
 
 class Clock(Gtk.EventBox):
@@ -84,23 +95,13 @@ class Clock(Gtk.EventBox):
         self.build_box()
         self.refresh()
 
-    def update_widget(self, output, tooltip=""):
-        self.label.set_text(output)
-        if self.settings["tooltip-date-format"] and tooltip:
-            self.set_tooltip_text(tooltip)
-
-        return False
+    def update_widget(self, output):
+        time, tooltip, ymd = output
+        if time is not None:
+            self.label.set_text(time)
+            if self.settings["tooltip-date-format"] and tooltip:
+                self.set_tooltip_text(tooltip)
 
-    def get_output(self):
-        now = datetime.now()
-        try:
-            time = now.strftime(self.settings["format"])
-            tooltip = now.strftime(self.settings["tooltip-text"]) if self.settings["tooltip-date-format"] else ""
-            GLib.idle_add(self.update_widget, time, tooltip)
-        except Exception as e:
-            print(e)
-
-        ymd = now.strftime("%Y#%m#%d").split("#")
         y = ymd[0]
         try:
             month = int(ymd[1]) - 1
@@ -116,12 +117,22 @@ class Clock(Gtk.EventBox):
         else:
             self.reminder_img.set_visible(False)
 
-    def refresh(self):
-        thread = create_background_task(self.get_output, self.settings["interval"])
-        thread.start()
+        return False
 
-        thread = create_background_task(self.reload_calendar, self.settings["calendar-interval"])
-        thread.start()
+    def refresh(self):
+        # Formatting the time is cheap, so it's done on the main loop: the clock can't be held up by busy workers.
+        self.tick()
+        if self.settings["interval"] > 0:
+            source_id = GLib.timeout_add(int(self.settings["interval"] * 1000), self.tick)
+            self.connect("destroy", lambda widget: GLib.source_remove(source_id))
+        self.calendar_job = schedule(self.reload_calendar, self.settings["calendar-interval"], owner=self)
+
+    def tick(self):
+        tooltip_format = self.settings["tooltip-text"] if self.settings["tooltip-date-format"] else ""
+        self.update_widget(get_time(self.settings["format"], tooltip_format))
+
+        # GLib.SOURCE_CONTINUE
+        return True
 
     def build_box(self):
         if self.settings["calendar-on"]:
@@ -11,11 +11,14 @@ gi.require_version('Gdk', '3.0')
 gi.require_version('GtkLayerShell', '0.1')
 from gi.repository import Gtk, Gdk, GLib, GtkLayerShell
 
-from nwg_panel.tools import (check_key, get_brightness, set_brightness, get_volume, get_balance, set_volume, get_battery,
-                             update_image, eprint, list_sinks, toggle_mute, create_background_task, list_sink_inputs,
-                             is_command, cmd_through_compositor)
+from nwg_panel.tools import (check_key, get_brightness, set_brightness, get_volume, get_balance, set_volume,
+                             update_image, list_sinks, toggle_mute, list_sink_inputs, is_command,
+                             cmd_through_compositor, audio_available, set_sink_input_volume, set_default_sink)
+from nwg_panel.audio import get_audio
+from nwg_panel.backlight import get_backlight
+from nwg_panel.battery import battery_monitor
+from nwg_panel.scheduler import share
 
-from nwg_panel.common import commands
 
 bat_critical_last_check = 0
 
@@ -88,6 +91,8 @@ class Controls(Gtk.EventBox):
         self.connect('button-release-event', self.on_button_release, settings)
         self.connect('enter-notify-event', self.on_enter_notify_event, settings)
         self.connect('leave-notify-event', self.on_leave_notify_event)
+        # the popup is a separate toplevel, which would outlive the panel on reload
+        self.connect('destroy', self.on_destroy)
 
         self.build_box()
         self.refresh()
@@ -118,38 +123,43 @@ class Controls(Gtk.EventBox):
 
         box.pack_start(self.pan_image, False, False, 4)
 
-    def refresh_output(self):
-        if "brightness" in self.settings["components"]:
-            try:
-                self.bri_value = get_brightness(
-                    device=self.settings["backlight-device"],
-                    controller=self.settings["backlight-controller"])
-                GLib.idle_add(self.update_brightness)
-            except Exception as e:
-                eprint(e)
-
-        if "volume" in self.settings["components"] and (commands["pamixer"] or commands["pactl"]):
-            try:
-                GLib.idle_add(self.update_volume)
-            except Exception as e:
-                print(e)
-
-    def refresh_bat_output(self):
-        if "battery" in self.settings["components"]:
-            try:
-                self.bat_value, self.bat_time, self.bat_charging = get_battery()
-                GLib.idle_add(self.update_battery, self.bat_value, self.bat_charging)
-            except Exception as e:
-                print(e)
-
     def refresh(self):
-        thread = create_background_task(self.refresh_output, self.settings["interval"])
-        thread.start()
+        # Controls on mirrored panels share the brightness and volume jobs
+        interval = self.settings["interval"]
+        if "brightness" in self.settings["components"]:
+            device = self.settings["backlight-device"]
+            controller = self.settings["backlight-controller"]
+            backlight = get_backlight(device, controller)
+            if backlight and backlight.notifies:
+                backlight.connect(self.on_brightness, owner=self)
+            else:
+                self.bri_job = share(("brightness", device, controller, interval), get_brightness, interval,
+                                     self.on_brightness, kwargs={"device": device, "controller": controller},
+                                     owner=self)
+
+        if "volume" in self.settings["components"] and audio_available():
+            audio = get_audio()
+            if audio:
+                # no polling, the native backend pushes changes
+                audio.connect(self.on_audio_state, owner=self)
+            else:
+                self.vol_job = share(("volume", interval), get_volume, interval, self.update_volume, owner=self)
 
-    # No point in checking battery data more often that every 5 seconds
     def refresh_bat(self):
-        thread = create_background_task(self.refresh_bat_output, 5)
-        thread.start()
+        # called on changes only; keeps working while hidden, for low battery notifications
+        battery_monitor().connect(self.on_battery, owner=self)
+
+    def on_brightness(self, value):
+        self.bri_value = value
+        self.update_brightness()
+
+    def on_audio_state(self, state):
+        self.update_volume(state["volume"])
+        self.popup_window.balance = state["balance"]
+
+    def on_battery(self, output):
+        self.bat_value, self.bat_time, self.bat_charging = output
+        self.update_battery(self.bat_value, self.bat_charging)
 
     def update_brightness(self, get=True):
         icon_name = bri_icon_name(self.bri_value)
@@ -164,8 +174,7 @@ class Controls(Gtk.EventBox):
         if get:
             self.popup_window.refresh()
 
-    def update_volume(self):
-        volume = get_volume()
+    def update_volume(self, volume):
         if (self.vol_value, self.vol_muted != volume):
             icon_name = vol_icon_name(*volume)
 
@@ -211,6 +220,11 @@ class Controls(Gtk.EventBox):
                 self.popup_window.bcg_window.hide()
         return False
 
+    def on_destroy(self, widget):
+        if self.popup_window.bcg_window:
+            self.popup_window.bcg_window.destroy()
+        self.popup_window.destroy()
+
     def on_enter_notify_event(self, widget, event, settings):
         if self.settings["hover-opens"]:
             if not self.popup_window.get_visible():
@@ -276,7 +290,7 @@ class PopupWindow(Gtk.Window):
 
         check_key(settings, "output-switcher", False)
         self.sinks = []
-        if (commands["pamixer"] or commands["pactl"]) and settings["output-switcher"]:
+        if audio_available() and settings["output-switcher"]:
             self.sinks = list_sinks()
 
         eb = Gtk.EventBox()
@@ -370,7 +384,7 @@ class PopupWindow(Gtk.Window):
             inner_hbox.pack_start(self.bri_scale, True, True, 5)
             add_sep = True
 
-        if "volume" in settings["components"] and (commands["pamixer"] or commands["pactl"]):
+        if "volume" in settings["components"] and audio_available():
             inner_hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
             v_box.pack_start(inner_hbox, False, False, 6)
 
@@ -394,7 +408,7 @@ class PopupWindow(Gtk.Window):
             self.vol_scale_handler = self.vol_scale.connect("value-changed", self.set_vol)
 
             inner_hbox.pack_start(self.vol_scale, True, True, 5)
-            if (commands["pamixer"] or commands["pactl"]) and settings["output-switcher"]:
+            if audio_available() and settings["output-switcher"]:
                 pactl_eb = Gtk.EventBox()
                 image = Gtk.Image()
                 pactl_eb.add(image)
@@ -409,7 +423,7 @@ class PopupWindow(Gtk.Window):
 
             add_sep = True
 
-        if "per-app-volume" in settings["components"] and commands["pactl"]:
+        if "per-app-volume" in settings["components"] and audio_available(per_app=True):
             self.per_app_vol_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
             v_box.pack_start(self.per_app_vol_box, False, False, 10)
         else:
@@ -595,7 +609,7 @@ class PopupWindow(Gtk.Window):
 
     def on_window_show(self, *args):
         self.src_tag = 0
-        if "per-app-volume" in self.settings["components"] and commands["pactl"]:
+        if "per-app-volume" in self.settings["components"] and audio_available(per_app=True):
             self.create_per_app_sliders()
         self.get_balance()
         self.refresh()
@@ -632,7 +646,7 @@ class PopupWindow(Gtk.Window):
             self.menu_box.show_all()
 
     def refresh_sinks(self, *args):
-        if commands["pamixer"] or commands["pactl"]:
+        if audio_available():
             self.sinks = list_sinks()
 
     def toggle_mute(self, e, slider):
@@ -677,7 +691,7 @@ class PopupWindow(Gtk.Window):
 
                 self.bat_label.set_text("{}% {}".format(self.parent.bat_value, self.parent.bat_time))
 
-            if "volume" in self.settings["components"] and (commands["pamixer"] or commands["pactl"]):
+            if "volume" in self.settings["components"] and audio_available():
                 self.vol_scale.set_value(self.parent.vol_value)
                 if self.parent.vol_icon_name != self.vol_icon_name:
                     update_image(self.vol_image, self.parent.vol_icon_name, self.icon_size, self.icons_path)
@@ -685,7 +699,7 @@ class PopupWindow(Gtk.Window):
                 self.vol_scale.set_draw_value(
                     False if self.parent.vol_value > 100 else True)  # Don't display val out of scale
 
-            if "per-app-volume" in self.settings["components"] and commands["pactl"]:
+            if "per-app-volume" in self.settings["components"] and audio_available(per_app=True):
                 # list input numbers we already have a slider for
                 already_have_slider = []
                 for s in self.per_app_sliders:
@@ -743,7 +757,7 @@ class PopupWindow(Gtk.Window):
                     self.bri_icon_name = self.parent.bri_icon_name
 
         else:
-            if "volume" in self.settings["components"] and (commands["pamixer"] or commands["pactl"]):
+            if "volume" in self.settings["components"] and audio_available():
                 with self.vol_scale.handler_block(self.vol_scale_handler):
                     self.vol_scale.set_value(self.parent.vol_value)
 
@@ -833,9 +847,7 @@ class PerAppSlider(Gtk.Box):
         vbox.pack_start(self.scale, True, True, 0)
 
     def set_volume(self, scale):
-        percent = scale.get_value()
-        target = int(65536 * percent / 100)
-        subprocess.Popen('exec pactl set-sink-input-volume {} {}'.format(self.input_num, target), shell=True)
+        set_sink_input_volume(self.input_num, scale.get_value())
 
 
 class SinkBox(Gtk.Box):
@@ -847,7 +859,7 @@ class SinkBox(Gtk.Box):
     def refresh(self):
         for item in self.get_children():
             item.destroy()
-        if commands["pamixer"] or commands["pactl"]:
+        if audio_available():
             self.sinks = list_sinks()
             for sink in self.sinks:
                 eb = Gtk.EventBox()
@@ -883,11 +895,7 @@ class SinkBox(Gtk.Box):
         widget.unset_state_flags(Gtk.StateFlags.SELECTED)
 
     def switch_sink(self, w, e, sink):
-        if commands["pactl"]:
-            eprint("Sink: '{}'".format(sink))
-            subprocess.Popen('exec pactl set-default-sink "{}"'.format(sink), shell=True)
-        else:
-            eprint("Couldn't switch sinks, 'pactl' (libpulse) not found")
+        set_default_sink(sink)
         self.hide()
 
 
@@ -1,12 +1,10 @@
 #!/usr/bin/env python3
 
-from gi.repository import GLib
-
 import psutil
 
 import gi
 
-from nwg_panel.tools import create_background_task
+from nwg_panel.scheduler import share
 
 gi.require_version('Gtk', '3.0')
 gi.require_version('Gdk', '3.0')
@@ -14,10 +12,27 @@ gi.require_version('Gdk', '3.0')
 from gi.repository import Gtk, Gdk
 
 
-class CpuAvg(Gtk.EventBox):
+class CpuAverage:
     def __init__(self):
         self.avg = 0
         self.cnt = 0
+
+    def get_output(self):
+        try:
+            val = psutil.cpu_percent(interval=1)
+            self.avg = self.avg + val
+            self.cnt += 1
+            return "{:.2f}%".format(round(self.avg / self.cnt, 2)), str(self.cnt)
+        except Exception as e:
+            print(e)
+
+
+# shared by all CpuAvg instances
+cpu_average = CpuAverage()
+
+
+class CpuAvg(Gtk.EventBox):
+    def __init__(self):
         Gtk.EventBox.__init__(self)
         self.box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
         self.add(self.box)
@@ -27,25 +42,16 @@ class CpuAvg(Gtk.EventBox):
         self.build_box()
         self.refresh()
 
-    def update_widget(self, val, cnt):
+    def update_widget(self, output):
+        val, cnt = output
         self.label.set_text(val)
         self.label.set_tooltip_text("{} checks".format(cnt))
 
         return False
 
-    def get_output(self):
-        try:
-            val = psutil.cpu_percent(interval=1)
-            self.avg = self.avg + val
-            self.cnt += 1
-            val = "{:.2f}%".format(round(self.avg / self.cnt, 2))
-            GLib.idle_add(self.update_widget, val, str(self.cnt))
-        except Exception as e:
-            print(e)
-
     def refresh(self):
-        thread = create_background_task(self.get_output, 2)
-        thread.start()
+        # cpu_percent blocks for a second
+        self.job = share(("cpu-avg",), cpu_average.get_output, 2, self.update_widget, owner=self, blocking=True)
 
     def build_box(self):
         self.box.pack_start(self.label, False, False, 4)
@@ -3,11 +3,14 @@
 import os
 import subprocess
 import signal
+import threading
+import time
 
 import gi
 from gi.repository import GLib
 
-from nwg_panel.tools import check_key, update_image, create_background_task, cmd_through_compositor
+from nwg_panel.tools import check_key, update_image, cmd_through_compositor
+from nwg_panel.scheduler import share
 
 gi.require_version('Gtk', '3.0')
 gi.require_version('Gdk', '3.0')
@@ -15,9 +18,142 @@ gi.require_version('Gdk', '3.0')
 from gi.repository import Gtk, Gdk
 
 
+def run_script(script, timeout=None):
+    try:
+        return subprocess.check_output(script.split(), timeout=timeout).decode("utf-8").splitlines()
+    except Exception as e:
+        print(e)
+
+
+class ContinuousScript:
+    """
+    A script kept running, which prints one update per line. If it prints a NUL byte, records are NUL-separated
+    instead, and may contain two lines (icon path & label), as in the one-shot mode. Output is read on the
+    main loop, and only the last complete record of each read is passed to the consumers' `update_widget`.
+    Restarted with exponential backoff when it exits.
+    """
+    # scripts shared by executors on mirrored panels
+    running = {}
+
+    MAX_BACKOFF = 60
+
+    def __init__(self, script):
+        self.script = script
+        self.consumers = []
+        self.proc = None
+        self.watch_id = None
+        self.restart_id = None
+        self.buffer = b""
+        self.separator = b"\n"
+        self.started = 0
+        self.backoff = 1
+
+    @classmethod
+    def get(cls, script, consumer):
+        if script not in cls.running:
+            cls.running[script] = ContinuousScript(script)
+        job = cls.running[script]
+        job.consumers.append(consumer)
+        consumer.connect("destroy", job.on_consumer_destroyed)
+        if not job.proc and not job.restart_id:
+            job.start()
+        return job
+
+    def start(self):
+        self.restart_id = None
+        self.buffer = b""
+        self.separator = b"\n"
+        # set before Popen, so that failing to start counts as a short run in `schedule_restart`
+        self.started = time.monotonic()
+        try:
+            self.proc = subprocess.Popen(self.script.split(), stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+        except Exception as e:
+            print("Couldn't start '{}': {}".format(self.script, e))
+            self.schedule_restart()
+            return False
+        fd = self.proc.stdout.fileno()
+        os.set_blocking(fd, False)
+        self.watch_id = GLib.io_add_watch(fd, GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+                                          self.on_output)
+        return False
+
+    def on_output(self, fd, condition):
+        data = b""
+        if condition & GLib.IO_IN:
+            try:
+                data = os.read(fd, 65536)
+            except BlockingIOError:
+                return True
+            except OSError:
+                data = b""
+        if not data:
+            # EOF: the script closed stdout, most likely on exit
+            self.watch_id = None
+            self.stop()
+            self.schedule_restart()
+            return False
+
+        self.buffer += data
+        if self.separator == b"\n" and b"\0" in self.buffer:
+            self.separator = b"\0"
+        *records, self.buffer = self.buffer.split(self.separator)
+        records = [r for r in records if r.strip()]
+        if records:
+            output = records[-1].decode("utf-8", errors="replace").splitlines()
+            for consumer in self.consumers:
+                consumer.update_widget(output)
+        return True
+
+    def stop(self):
+        if self.watch_id:
+            GLib.source_remove(self.watch_id)
+            self.watch_id = None
+        if self.proc:
+            if self.proc.poll() is None:
+                self.proc.terminate()
+            self.proc.stdout.close()
+            # reap the process off the main loop, it may take a while to exit
+            proc = self.proc
+            threading.Thread(target=proc.wait, daemon=True).start()
+            self.proc = None
+
+    def schedule_restart(self):
+        if not self.consumers:
+            return
+        # a script which ran for a while is restarted promptly, one that keeps failing ever more slowly
+        if time.monotonic() - self.started > self.MAX_BACKOFF:
+            self.backoff = 1
+        else:
+            self.backoff = min(self.backoff * 2, self.MAX_BACKOFF)
+        print("'{}' exited, restarting in {}s".format(self.script, self.backoff))
+        self.restart_id = GLib.timeout_add_seconds(self.backoff, self.start)
+
+    def restart(self):
+        """
+        Restart the script at once (e.g. on a real-time signal).
+        """
+        if self.restart_id:
+            GLib.source_remove(self.restart_id)
+        self.stop()
+        self.backoff = 1
+        self.start()
+
+    def on_consumer_destroyed(self, consumer):
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+        if not self.consumers:
+            if self.restart_id:
+                GLib.source_remove(self.restart_id)
+                self.restart_id = None
+            self.stop()
+            ContinuousScript.running.pop(self.script, None)
+
+
 class Executor(Gtk.EventBox):
     def __init__(self, settings, icons_path, executor_name):
         self.name = executor_name
+        self.job = None
+        self.continuous = None
         self.settings = settings
         self.icons_path = icons_path
         Gtk.EventBox.__init__(self)
@@ -29,6 +165,8 @@ class Executor(Gtk.EventBox):
 
         check_key(settings, "script", "")
         check_key(settings, "interval", 0)
+        check_key(settings, "timeout", 30)
+        check_key(settings, "continuous", False)
         check_key(settings, "root-css-name", "root-executor")
         check_key(settings, "css-name", "")
         check_key(settings, "icon-placement", "left")
@@ -123,17 +261,28 @@ class Executor(Gtk.EventBox):
 
         return False
 
-    def get_output(self):
-        if "script" in self.settings and self.settings["script"]:
-            try:
-                output = subprocess.check_output(self.settings["script"].split()).decode("utf-8").splitlines()
-                GLib.idle_add(self.update_widget, output)
-            except Exception as e:
-                print(e)
+    def run_now(self):
+        """
+        Refresh on demand (e.g. on a real-time signal), without adding another job.
+        """
+        if self.continuous:
+            self.continuous.restart()
+        elif self.job:
+            self.job.run_now()
 
     def refresh(self):
-        thread = create_background_task(self.get_output, self.settings["interval"])
-        thread.start()
+        if "script" in self.settings and self.settings["script"]:
+            script = self.settings["script"]
+            if self.settings["continuous"]:
+                self.continuous = ContinuousScript.get(script, self)
+                return
+            # Executors running the same script with the same interval & timeout (e.g. on mirrored panels) share a job.
+            # Ticks landing while the previous run is still in flight (e.g. until `timeout`) are dropped by the
+            # scheduler, so a slow script doesn't run back-to-back.
+            interval = self.settings["interval"]
+            timeout = self.settings["timeout"] if self.settings["timeout"] > 0 else None
+            self.job = share(("executor", script, interval, timeout), run_script, interval, self.update_widget,
+                             args=(script, timeout), owner=self, blocking=True)
 
     def build_box(self):
         if self.settings["icon-placement"] == "left":
@@ -2,9 +2,9 @@
 
 import json
 
-from gi.repository import Gtk, Gdk
+from gi.repository import Gtk, Gdk, GLib
 
-from nwg_panel.tools import hyprctl, update_image, update_image_fallback_desktop, eprint
+from nwg_panel.tools import hyprctl, update_image, update_image_fallback_desktop, eprint, reconcile_box
 
 
 class HyprlandTaskbar(Gtk.Box):
@@ -56,6 +56,8 @@ class HyprlandTaskbar(Gtk.Box):
         if self.settings["angle"] != 0.0:
             self.set_orientation(Gtk.Orientation.VERTICAL)
 
+        self.ws_boxes = {}  # {workspace id: WorkspaceBox}
+        self.client_boxes = {}  # {client address: ClientBox}
         self.refresh(monitors, workspaces, clients, activewindow)
 
     def parse_monitors(self, monitors):
@@ -80,42 +82,62 @@ class HyprlandTaskbar(Gtk.Box):
         # self.parse_clients(clients)
         self.clients = clients
         self.activewindow = activewindow
-        for item in self.get_children():
-            item.destroy()
         self.build_box()
 
     def build_box(self):
+        """
+        Reconciles existing WorkspaceBox / ClientBox widgets with the current data. Boxes are keyed by the workspace
+        id and client address, so that only those which appeared, disappeared or changed get created, destroyed
+        or patched in place.
+        """
+        ws_boxes = {}
+        client_boxes = {}
         for ws_num in self.ws_nums:
-            ws_box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-            if self.settings["angle"] != 0.0:
-                ws_box.set_orientation(Gtk.Orientation.VERTICAL)
-            self.pack_start(ws_box, False, False, 0)
-            if self.workspaces[ws_num]["monitor"] == self.display_name or self.settings["all-outputs"]:
-                eb = Gtk.EventBox()
-
-                if not self.settings["all-workspaces"] and ws_num not in self.active_workspaces:
-                    continue
-                if self.settings["show-ws-names"]:
-                    ws_box.pack_start(eb, False, False, 6)
-                    lbl = Gtk.Label()
-                    if ws_num in self.active_workspaces:
-                        lbl.set_markup("<u>{}</u>:".format(self.workspaces[ws_num]["name"]))
+            ws_box = self.ws_boxes[ws_num] if ws_num in self.ws_boxes else WorkspaceBox(self.settings)
+            ws_boxes[ws_num] = ws_box
+
+            if (self.workspaces[ws_num]["monitor"] != self.display_name and not self.settings["all-outputs"]) or (
+                    not self.settings["all-workspaces"] and ws_num not in self.active_workspaces):
+                reconcile_box(ws_box.cl_box, [])
+                ws_box.hide()
+                continue
+
+            ws_box.update_label(self.workspaces[ws_num]["name"], ws_num in self.active_workspaces)
+
+            widgets = []
+            for client in self.clients:
+                # if client["title"] prevents from creation of ghost client boxes
+                if client["title"] and client["workspace"]["id"] == ws_num:
+                    client_box = self.client_boxes[client["address"]] if client["address"] in self.client_boxes \
+                        else None
+                    if client_box and client_box.signature == ClientBox.get_signature(client):
+                        client_box.update(client)
                     else:
-                        lbl.set_text("{}:".format(self.workspaces[ws_num]["name"]))
-                    eb.add(lbl)
-                cl_box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                ws_box.pack_start(cl_box, False, False, 0)
-                for client in self.clients:
-                    # if client["title"] prevents from creation of ghost client boxes
-                    if client["title"] and client["workspace"]["id"] == ws_num:
-                        client_box = ClientBox(self.settings, client, self.position, self.icons_path, self.ws_strings)
-                        if self.activewindow and client["address"] == self.activewindow["address"]:
-                            client_box.box.set_property("name", "task-box-focused")
-                        else:
-                            client_box.box.set_property("name", "task-box")
-                        cl_box.pack_start(client_box, False, False, self.settings["client-padding"])
-
-        self.show_all()
+                        if client_box:
+                            client_box.destroy()
+                        client_box = ClientBox(self.settings, client, self.position, self.icons_path,
+                                               self.ws_strings)
+                    if self.activewindow and client["address"] == self.activewindow["address"]:
+                        client_box.set_css_name("task-box-focused")
+                    else:
+                        client_box.set_css_name("task-box")
+                    client_boxes[client["address"]] = client_box
+                    widgets.append(client_box)
+
+            reconcile_box(ws_box.cl_box, widgets, padding=self.settings["client-padding"])
+            ws_box.cl_box.show_all()
+            ws_box.show()
+
+        reconcile_box(self, [ws_boxes[ws_num] for ws_num in self.ws_nums])
+
+        for key in self.client_boxes:
+            if key not in client_boxes:
+                self.client_boxes[key].destroy()
+        for key in self.ws_boxes:
+            if key not in ws_boxes:
+                self.ws_boxes[key].destroy()
+        self.client_boxes = client_boxes
+        self.ws_boxes = ws_boxes
 
     def on_ws_click(self, widget, event, ws_num):
         res = hyprctl("dispatch workspace name:{}".format(ws_num))
@@ -123,6 +145,34 @@ class HyprlandTaskbar(Gtk.Box):
             hyprctl(f'dispatch hl.dsp.focus({{ workspace = "{ws_num}"}})')
 
 
+class WorkspaceBox(Gtk.Box):
+    def __init__(self, settings):
+        Gtk.Box.__init__(self, orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
+        if settings["angle"] != 0.0:
+            self.set_orientation(Gtk.Orientation.VERTICAL)
+        # visibility is controlled by HyprlandTaskbar.build_box
+        self.set_no_show_all(True)
+        self.markup = None
+        self.lbl = None
+        if settings["show-ws-names"]:
+            eb = Gtk.EventBox()
+            self.pack_start(eb, False, False, 6)
+            self.lbl = Gtk.Label()
+            eb.add(self.lbl)
+            eb.show_all()
+        self.cl_box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
+        self.pack_start(self.cl_box, False, False, 0)
+        self.cl_box.show()
+
+    def update_label(self, name, active):
+        if self.lbl:
+            name = GLib.markup_escape_text(name)
+            markup = "<u>{}</u>:".format(name) if active else "{}:".format(name)
+            if markup != self.markup:
+                self.lbl.set_markup(markup)
+                self.markup = markup
+
+
 def on_enter_notify_event(widget, event):
     widget.set_state_flags(Gtk.StateFlags.DROP_ACTIVE, clear=False)
     widget.set_state_flags(Gtk.StateFlags.SELECTED, clear=False)
@@ -137,6 +187,10 @@ class ClientBox(Gtk.EventBox):
     def __init__(self, settings, client, position, icons_path, ws_strings):
         self.position = position
         self.settings = settings
+        self.client = client
+        self.signature = ClientBox.get_signature(client)
+        self.lbl = None
+        self.image = None
         self.address = client["address"]
         self.floating = client["floating"]
         self.icons_path = icons_path
@@ -152,30 +206,27 @@ class ClientBox(Gtk.EventBox):
         if client["workspace"]["name"] == "special":
             self.connect('button-release-event', self.on_special)
         else:
-            self.connect('button-release-event', self.on_click, client, self.box)
+            self.connect('button-release-event', self.on_click, self.box)
 
-        image = None
         if settings["show-app-icon"]:
             name = client["class"]
-            image = Gtk.Image()
-            image.set_property("name", "task-box-icon")
-            update_image_fallback_desktop(image, name, settings["image-size"], icons_path)
-            self.box.pack_start(image, False, False, 4)
+            self.image = Gtk.Image()
+            self.image.set_property("name", "task-box-icon")
+            update_image_fallback_desktop(self.image, name, settings["image-size"], icons_path)
+            self.box.pack_start(self.image, False, False, 4)
 
-        name = client["title"][:settings["name-max-len"]]
-        if settings["mark-xwayland"] and client["xwayland"]:
-            name = "X|" + name
+        name = self.client_name(client)
 
         if settings["show-app-name"]:
             if "special" not in client["workspace"]["name"] or settings["show-app-name-special"]:
-                lbl = Gtk.Label()
-                lbl.set_angle(self.settings["angle"])
+                self.lbl = Gtk.Label()
+                self.lbl.set_angle(self.settings["angle"])
 
-                lbl.set_text(name)
-                self.box.pack_start(lbl, False, False, 6)
+                self.lbl.set_text(name)
+                self.box.pack_start(self.lbl, False, False, 6)
             else:
-                if name and image:
-                    image.set_tooltip_text(name)
+                if name and self.image:
+                    self.image.set_tooltip_text(name)
 
         if settings["show-layout"]:
             if client["pinned"]:
@@ -188,7 +239,35 @@ class ClientBox(Gtk.EventBox):
                 update_image(img, "focus-windows", self.settings["image-size"], self.icons_path)
                 self.box.pack_start(img, False, False, 0)
 
-    def on_click(self, widget, event, client, popup_at_widget):
+    @staticmethod
+    def get_signature(client):
+        # Properties that can't be patched in place: if any of them changes, the box needs to be rebuilt
+        return client["class"], client["xwayland"], client["workspace"]["name"], client["pinned"], client["floating"]
+
+    def client_name(self, client):
+        name = client["title"][:self.settings["name-max-len"]]
+        if self.settings["mark-xwayland"] and client["xwayland"]:
+            name = "X|" + name
+        return name
+
+    def set_css_name(self, name):
+        if self.box.get_property("name") != name:
+            self.box.set_property("name", name)
+
+    def update(self, client):
+        """
+        Patch the existing box with the new client data (title)
+        """
+        self.client = client
+        name = self.client_name(client)
+        if self.lbl:
+            if self.lbl.get_text() != name:
+                self.lbl.set_text(name)
+        elif self.image and name and self.image.get_tooltip_text() != name:
+            self.image.set_tooltip_text(name)
+
+    def on_click(self, widget, event, popup_at_widget):
+        client = self.client
         if event.button == 1:
             res = hyprctl(f"dispatch focuswindow address:{self.address}")
             # handle new Lua dispatcher on Hyprland >= v0.55.0
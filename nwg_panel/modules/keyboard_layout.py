@@ -4,8 +4,8 @@ import os
 
 import gi
 
-from nwg_panel.tools import check_key, update_image, create_background_task, eprint, hyprctl, niri_keyboard_layouts, \
-    niri_ipc
+from nwg_panel.tools import check_key, update_image, eprint, hyprctl, niri_keyboard_layouts, niri_ipc
+from nwg_panel.scheduler import schedule
 
 gi.require_version('Gtk', '3.0')
 gi.require_version('Gdk', '3.0')
@@ -175,8 +175,7 @@ class KeyboardLayout(Gtk.EventBox):
             self.label.set_text(txt)
 
     def refresh(self, *args):
-        thread = create_background_task(self.update_label, self.settings["interval"])
-        thread.start()
+        self.job = schedule(self.update_label, self.settings["interval"], owner=self)
 
     def build_box(self):
         if self.settings["show-icon"] and self.settings["icon-placement"] == "left":
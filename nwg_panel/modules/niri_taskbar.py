@@ -2,9 +2,9 @@
 
 import json
 
-from gi.repository import Gtk, Gdk
+from gi.repository import Gtk, Gdk, GLib
 
-from nwg_panel.tools import niri_ipc, update_image, update_image_fallback_desktop
+from nwg_panel.tools import niri_ipc, update_image, update_image_fallback_desktop, reconcile_box
 
 
 class NiriTaskbar(Gtk.Box):
@@ -42,6 +42,8 @@ class NiriTaskbar(Gtk.Box):
         if self.settings["angle"] != 0.0:
             self.set_orientation(Gtk.Orientation.VERTICAL)
 
+        self.ws_boxes = {}  # {workspace id: WorkspaceBox}
+        self.client_boxes = {}  # {window id: ClientBox}
         self.refresh(outputs, workspaces, windows, focused_window)
 
     def parse_outputs(self, outputs):
@@ -63,44 +65,86 @@ class NiriTaskbar(Gtk.Box):
         self.parse_workspaces(workspaces)
         self.windows = windows
         self.focused_window = focused_window
-        for item in self.get_children():
-            item.destroy()
         self.build_box()
 
     def build_box(self):
+        """
+        Reconciles existing WorkspaceBox / ClientBox widgets with the current data. Boxes are keyed by the workspace
+        and window id, so that only those which appeared, disappeared or changed get created, destroyed or patched
+        in place.
+        """
+        ws_boxes = {}
+        client_boxes = {}
         for ws_num in self.ws_nums:
-            ws_box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-            if self.settings["angle"] != 0.0:
-                ws_box.set_orientation(Gtk.Orientation.VERTICAL)
-            self.pack_start(ws_box, False, False, 0)
-            if self.workspaces[ws_num]["output"] == self.display_name or self.settings["all-outputs"]:
-                eb = Gtk.EventBox()
-
-                ws_box.pack_start(eb, False, False, 6)
-                lbl = Gtk.Label()
-                if ws_num in self.active_workspaces:
-                    if self.workspaces[ws_num]["name"]:
-                        lbl.set_markup("<u>{}</u>:".format(self.workspaces[ws_num]["name"]))
+            ws_box = self.ws_boxes[ws_num] if ws_num in self.ws_boxes else WorkspaceBox(self.settings)
+            ws_boxes[ws_num] = ws_box
+
+            if self.workspaces[ws_num]["output"] != self.display_name and not self.settings["all-outputs"]:
+                reconcile_box(ws_box.win_box, [])
+                ws_box.hide()
+                continue
+
+            name = self.workspaces[ws_num]["name"]
+            if not name:
+                name = str(self.workspaces[ws_num][self.settings["workspace-label"]])
+            ws_box.update_label(name, ws_num in self.active_workspaces)
+
+            widgets = []
+            for window in self.windows:
+                if window["workspace_id"] == ws_num:
+                    client_box = self.client_boxes[window["id"]] if window["id"] in self.client_boxes else None
+                    if client_box and client_box.signature == ClientBox.get_signature(window):
+                        client_box.update(window)
                     else:
-                        lbl.set_markup("<u>{}</u>:".format(self.workspaces[ws_num][self.settings["workspace-label"]]))
-                else:
-                    if self.workspaces[ws_num]["name"]:
-                        lbl.set_markup("{}:".format(self.workspaces[ws_num]["name"]))
-                    else:
-                        lbl.set_text("{}:".format(self.workspaces[ws_num][self.settings["workspace-label"]]))
-                eb.add(lbl)
-                win_box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                ws_box.pack_start(win_box, False, False, 0)
-                for window in self.windows:
-                    if window["workspace_id"] == ws_num:
+                        if client_box:
+                            client_box.destroy()
                         client_box = ClientBox(self.settings, window, self.position, self.icons_path)
-                        if self.focused_window and window["id"] == self.focused_window["id"]:
-                            client_box.box.set_property("name", "task-box-focused")
-                        else:
-                            client_box.box.set_property("name", "task-box")
-                        win_box.pack_start(client_box, False, False, self.settings["client-padding"])
+                    if self.focused_window and window["id"] == self.focused_window["id"]:
+                        client_box.set_css_name("task-box-focused")
+                    else:
+                        client_box.set_css_name("task-box")
+                    client_boxes[window["id"]] = client_box
+                    widgets.append(client_box)
+
+            reconcile_box(ws_box.win_box, widgets, padding=self.settings["client-padding"])
+            ws_box.win_box.show_all()
+            ws_box.show()
+
+        reconcile_box(self, [ws_boxes[ws_num] for ws_num in self.ws_nums])
 
-        self.show_all()
+        for key in self.client_boxes:
+            if key not in client_boxes:
+                self.client_boxes[key].destroy()
+        for key in self.ws_boxes:
+            if key not in ws_boxes:
+                self.ws_boxes[key].destroy()
+        self.client_boxes = client_boxes
+        self.ws_boxes = ws_boxes
+
+
+class WorkspaceBox(Gtk.Box):
+    def __init__(self, settings):
+        Gtk.Box.__init__(self, orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
+        if settings["angle"] != 0.0:
+            self.set_orientation(Gtk.Orientation.VERTICAL)
+        # visibility is controlled by NiriTaskbar.build_box
+        self.set_no_show_all(True)
+        self.markup = None
+        eb = Gtk.EventBox()
+        self.pack_start(eb, False, False, 6)
+        self.lbl = Gtk.Label()
+        eb.add(self.lbl)
+        eb.show_all()
+        self.win_box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
+        self.pack_start(self.win_box, False, False, 0)
+        self.win_box.show()
+
+    def update_label(self, name, active):
+        name = GLib.markup_escape_text(name)
+        markup = "<u>{}</u>:".format(name) if active else "{}:".format(name)
+        if markup != self.markup:
+            self.lbl.set_markup(markup)
+            self.markup = markup
 
 
 def on_enter_notify_event(widget, event):
@@ -117,6 +161,10 @@ class ClientBox(Gtk.EventBox):
     def __init__(self, settings, window, position, icons_path):
         self.position = position
         self.settings = settings
+        self.window = window
+        self.signature = ClientBox.get_signature(window)
+        self.lbl = None
+        self.image = None
         self.id = window["id"]
         self.pid = window["pid"]
         self.icons_path = icons_path
@@ -128,27 +176,26 @@ class ClientBox(Gtk.EventBox):
 
         self.connect('enter-notify-event', on_enter_notify_event)
         self.connect('leave-notify-event', on_leave_notify_event)
-        self.connect('button-release-event', self.on_click, window, self.box)
+        self.connect('button-release-event', self.on_click, self.box)
 
-        image = None
         if settings["show-app-icon"]:
             name = window["app_id"]
-            image = Gtk.Image()
-            image.set_property("name", "task-box-icon")
-            update_image_fallback_desktop(image, name, settings["image-size"], icons_path)
-            self.box.pack_start(image, False, False, 4)
+            self.image = Gtk.Image()
+            self.image.set_property("name", "task-box-icon")
+            update_image_fallback_desktop(self.image, name, settings["image-size"], icons_path)
+            self.box.pack_start(self.image, False, False, 4)
 
-        name = window["title"][:settings["name-max-len"]]
+        name = self.window_name(window)
 
         if settings["show-app-name"]:
-            lbl = Gtk.Label()
-            lbl.set_angle(self.settings["angle"])
+            self.lbl = Gtk.Label()
+            self.lbl.set_angle(self.settings["angle"])
 
-            lbl.set_text(name)
-            self.box.pack_start(lbl, False, False, 6)
+            self.lbl.set_text(name)
+            self.box.pack_start(self.lbl, False, False, 6)
 
-            if name and image:
-                image.set_tooltip_text(name)
+            if name and self.image:
+                self.image.set_tooltip_text(name)
 
         if settings["show-layout"]:
             if window["is_floating"]:
@@ -156,7 +203,32 @@ class ClientBox(Gtk.EventBox):
                 update_image(img, "focus-windows", self.settings["image-size"], self.icons_path)
                 self.box.pack_start(img, False, False, 0)
 
-    def on_click(self, widget, event, client, popup_at_widget):
+    @staticmethod
+    def get_signature(window):
+        # Properties that can't be patched in place: if any of them changes, the box needs to be rebuilt
+        return window["app_id"], window["pid"], window["is_floating"]
+
+    def window_name(self, window):
+        return window["title"][:self.settings["name-max-len"]] if window["title"] else ""
+
+    def set_css_name(self, name):
+        if self.box.get_property("name") != name:
+            self.box.set_property("name", name)
+
+    def update(self, window):
+        """
+        Patch the existing box with the new window data (title)
+        """
+        self.window = window
+        name = self.window_name(window)
+        if self.lbl:
+            if self.lbl.get_text() != name:
+                self.lbl.set_text(name)
+            if name and self.image and self.image.get_tooltip_text() != name:
+                self.image.set_tooltip_text(name)
+
+    def on_click(self, widget, event, popup_at_widget):
+        client = self.window
         if event.button == 1:
             command = {"Action": {"FocusWindow": {"id": client["id"]}}}
             niri_ipc(json.dumps(command), is_json=True)
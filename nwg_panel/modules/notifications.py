@@ -1,12 +1,11 @@
 #!/usr/bin/env python3
 
-from gi.repository import GLib
-
 import subprocess
 
 from nwg_panel import common
 
-from nwg_panel.tools import check_key, update_image, create_background_task, cmd_through_compositor
+from nwg_panel.tools import check_key, update_image, cmd_through_compositor
+from nwg_panel.scheduler import share
 
 import gi
 
@@ -15,6 +14,18 @@ gi.require_version('Gdk', '3.0')
 
 from gi.repository import Gtk, Gdk
 
+COUNT_TIMEOUT = 5  # seconds, in case the notification daemon hangs
+
+
+def get_count():
+    try:
+        if common.commands["swaync"]:
+            return subprocess.check_output("swaync-client -c".split(), timeout=COUNT_TIMEOUT).decode("utf-8")
+        elif common.commands["nwg-notifications"]:
+            return subprocess.check_output("nwg-notifications --count".split(), timeout=COUNT_TIMEOUT).decode("utf-8")
+    except Exception as e:
+        print(e)
+
 
 class Notifications(Gtk.EventBox):
     def __init__(self, settings, icons_path, panel_position):
@@ -94,19 +105,10 @@ class Notifications(Gtk.EventBox):
 
         return False
 
-    def get_output(self):
-        try:
-            if common.commands["swaync"]:
-                output = subprocess.check_output("swaync-client -c".split()).decode("utf-8")
-            elif common.commands["nwg-notifications"]:
-                output = subprocess.check_output("nwg-notifications --count".split()).decode("utf-8")
-            GLib.idle_add(self.update_widget, output)
-        except Exception as e:
-            print(e)
-
     def refresh(self):
-        thread = create_background_task(self.get_output, self.settings["interval"])
-        thread.start()
+        interval = self.settings["interval"]
+        self.job = share(("notifications", interval), get_count, interval, self.update_widget, owner=self,
+                         blocking=True)
 
     def build_box(self):
         if self.settings["icon-placement"] == "left":
@@ -1,22 +1,15 @@
 #!/usr/bin/env python3
 
-import json
 import os
-import stat
 import subprocess
-import sys
 from datetime import datetime
 
 import gi
 
-try:
-    import requests
-except ModuleNotFoundError:
-    print("You need to install python-requests package", file=sys.stderr)
-    sys.exit(1)
-
-from nwg_panel.tools import (check_key, eprint, load_json, save_json, temp_dir, file_age, hms, update_image,
-                             get_config_dir, create_background_task, cmd_through_compositor)
+from nwg_panel.tools import (check_key, eprint, load_json, update_image, create_pixbuf, get_config_dir,
+                             cmd_through_compositor)
+from nwg_panel.scheduler import schedule, share
+from nwg_panel.weather import fetch_weather
 
 config_dir = get_config_dir()
 dir_name = os.path.dirname(__file__)
@@ -137,6 +130,7 @@ class OpenWeather(Gtk.EventBox):
         self.weather = None
         self.forecast = None
         self.alerts_json = None
+        self.updated = None
 
         self.connect('button-release-event', self.on_button_release)
         self.add_events(Gdk.EventMask.SCROLL_MASK)
@@ -145,7 +139,13 @@ class OpenWeather(Gtk.EventBox):
         self.connect('enter-notify-event', on_enter_notify_event)
         self.connect('leave-notify-event', on_leave_notify_event)
 
-        self.popup = Gtk.Window()
+        # The popup is built on first data update, then updated in place and just shown / hidden on click.
+        self.popup = None
+        self.popup_time = None
+        self.forecast_rows = []
+        self.prerender_job = None
+        self.prerender_args = None
+        self.connect('destroy', self.on_destroy)
 
         if settings["angle"] != 0.0:
             self.box.set_orientation(Gtk.Orientation.VERTICAL)
@@ -155,13 +155,6 @@ class OpenWeather(Gtk.EventBox):
 
         data_home = os.getenv('XDG_DATA_HOME') if os.getenv('XDG_DATA_HOME') else os.path.join(os.getenv("HOME"),
                                                                                                ".local/share")
-        tmp_dir = temp_dir()
-        self.weather_file = "{}-{}".format(os.path.join(tmp_dir, "nwg-openweather-weather"), settings["module-id"])
-        self.forecast_file = "{}-{}".format(os.path.join(tmp_dir, "nwg-openweather-forecast"), settings["module-id"])
-        self.alerts_file = "{}-{}".format(os.path.join(tmp_dir, "nwg-weatherbit-alerts"), settings["module-id"])
-        # eprint("Weather file: {}".format(self.weather_file))
-        # eprint("Forecast file: {}".format(self.forecast_file))
-        # eprint("Alerts file: {}".format(self.alerts_file))
 
         # Try to obtain geolocation if unset
         if not settings["lat"] or not settings["long"]:
@@ -179,18 +172,6 @@ class OpenWeather(Gtk.EventBox):
                 settings["lat"] = 51.5008
                 settings["long"] = -0.1246
 
-        self.weather_request = "https://api.openweathermap.org/data/2.5/weather?lat={}&lon={}&units={}&lang={}&appid={}".format(
-            settings["lat"], settings["long"], settings["units"], settings["lang"], settings["appid"])
-
-        self.forecast_request = "https://api.openweathermap.org/data/2.5/forecast?lat={}&lon={}&units={}&lang={}&appid={}".format(
-            settings["lat"], settings["long"], settings["units"], settings["lang"], settings["appid"])
-
-        self.alerts_request = "https://api.weatherbit.io/v2.0/alerts?lat={}&lon={}&key={}".format(settings["lat"],
-                                                                                                  settings["long"],
-                                                                                                  settings[
-                                                                                                      "weatherbit-api-key"]) if \
-            settings["weatherbit-api-key"] else ""
-
         self.build_box()
 
         self.refresh()
@@ -205,23 +186,39 @@ class OpenWeather(Gtk.EventBox):
             self.box.pack_start(self.alert_image, False, False, 0)
             self.box.pack_start(self.image, False, False, 2)
 
-    def get_data(self):
-        self.get_weather()
-        self.get_forecast()
-        if self.settings["weatherbit-api-key"]:
-            self.get_alerts()
-        GLib.idle_add(self.update_widget)
-
     def refresh(self):
         if self.settings["interval"] > 0:
             # We can't use `self.settings["interval"]` here, as the timer resets on restart. Let's check once 10 minutes.
-            # This will do nothing if files exist and self.weather & self.forecast are not None.
+            # This will do nothing if the cached data is not older than `self.settings["interval"]`.
             interval = 600
         else:
             interval = 0
 
-        thread = create_background_task(self.get_data, interval)
-        thread.start()
+        # Widgets showing the same location share the job, and get the data it fetched last on subscription.
+        args = (self.settings["lat"], self.settings["long"], self.settings["units"], self.settings["lang"],
+                self.settings["appid"], self.settings["weatherbit-api-key"], self.settings["interval"] - 1)
+        self.job = share(("openweather",) + args, fetch_weather, interval, self.on_data, args=args, owner=self,
+                         blocking=True)
+
+    def on_data(self, data):
+        self.weather = data["weather"]
+        self.forecast = data["forecast"]
+        self.alerts_json = data["alerts"]
+        self.updated = data["time"]
+        self.update_widget()
+
+        if self.data_ok() and self.updated != self.popup_time:
+            # Load popup icons on a worker thread, then update the popup, so that clicks only need to show it.
+            # A single job per widget: each one adds handlers to its owner.
+            self.prerender_args = (self.popup_icon_files(), self.get_scale_factor())
+            if not self.prerender_job:
+                self.prerender_job = schedule(self.prerender_icons, 0, owner=self)
+            else:
+                self.prerender_job.run_now()
+
+    def on_destroy(self, widget):
+        if self.popup:
+            self.popup.destroy()
 
     def on_button_release(self, widget, event):
         if event.button == 1:
@@ -245,51 +242,6 @@ class OpenWeather(Gtk.EventBox):
         print(f"Executing: {cmd}")
         subprocess.Popen('{}'.format(cmd), shell=True)
 
-    def get_weather(self):
-        if not os.path.isfile(self.weather_file) or int(file_age(self.weather_file) > self.settings["interval"] - 1):
-            print(hms(), "Requesting weather data")
-            try:
-                r = requests.get(self.weather_request)
-                self.weather = json.loads(r.text)
-                if self.weather["cod"] in ["200", 200]:
-                    save_json(self.weather, self.weather_file)
-            except Exception as e:
-                self.weather = None
-                eprint(e)
-        elif not self.weather:
-            print(hms(), "Loading weather data from file")
-            self.weather = load_json(self.weather_file)
-
-    def get_forecast(self):
-        if not os.path.isfile(self.forecast_file) or int(file_age(self.forecast_file) > self.settings["interval"] - 1):
-            print(hms(), "Requesting forecast data")
-            try:
-                r = requests.get(self.forecast_request)
-                self.forecast = json.loads(r.text)
-                if self.forecast["cod"] in ["200", 200]:
-                    save_json(self.forecast, self.forecast_file)
-            except Exception as e:
-                self.forecast = None
-                eprint(e)
-        elif not self.forecast:
-            print(hms(), "Loading forecast data from file")
-            self.forecast = load_json(self.forecast_file)
-
-    def get_alerts(self):
-        if not os.path.isfile(self.alerts_file) or int(file_age(self.alerts_file) > self.settings["interval"] - 1):
-            print(hms(), "Requesting alerts data")
-            try:
-                r = requests.get(self.alerts_request)
-                self.alerts_json = json.loads(r.text)
-                if "alerts" in self.alerts_json:
-                    save_json(self.alerts_json, self.alerts_file)
-            except Exception as e:
-                self.alerts_json = None
-                eprint(e)
-        elif not self.alerts_json and os.path.isfile(self.alerts_file):
-            print(hms(), "Loading alerts data from file")
-            self.alerts_json = load_json(self.alerts_file)
-
     def update_widget(self):
         if self.weather and self.weather["cod"] and self.weather["cod"] in [200, "200"]:
             if "icon" in self.weather["weather"][0]:
@@ -328,36 +280,59 @@ class OpenWeather(Gtk.EventBox):
 
             self.label.set_text(lbl_content)
 
-            mtime = datetime.fromtimestamp(os.stat(self.weather_file)[stat.ST_MTIME])
-            self.set_tooltip_text("Update: {}".format(mtime.strftime("%d %b %H:%M:%S")))
+            if self.updated:
+                mtime = datetime.fromtimestamp(self.updated)
+                self.set_tooltip_text("Update: {}".format(mtime.strftime("%d %b %H:%M:%S")))
 
         self.show_all()
 
     def svg2img(self, file_name, weather=False):
         icon_path = os.path.join(self.popup_icons, file_name) if not weather else os.path.join(self.weather_icons,
                                                                                                file_name)
+        img = Gtk.Image()
+        self.set_popup_icon(img, icon_path)
+        return img
+
+    def set_popup_icon(self, img, icon_path):
         try:
-            img = Gtk.Image()
             update_image(img, icon_path, self.settings["popup-icon-size"], fallback=False)
         except Exception as e:
             eprint(e)
-            img = Gtk.Image.new_from_icon_name("image-missing", Gtk.IconSize.MENU)
+            img.set_from_icon_name("image-missing", Gtk.IconSize.MENU)
             img.set_tooltip_text(str(e))
 
-        return img
-
-    def display_popup(self):
-        if not self.weather or not self.weather["cod"] in ["200", 200] or not self.forecast["cod"] in ["200", 200]:
-            print("No data available")
-            return
-
-        if self.popup.is_visible():
-            self.popup.close()
-            self.popup.destroy()
-            return
-
-        self.popup.destroy()
+    def data_ok(self):
+        return self.weather and self.weather["cod"] in ["200", 200] and self.forecast and self.forecast["cod"] in [
+            "200", 200]
+
+    def popup_icon_files(self):
+        """
+        :return: [(path, size)] of icons the popup will display for the current data
+        """
+        files = [(os.path.join(self.popup_icons, name), self.settings["popup-icon-size"]) for name in
+                 ["sunrise.svg", "sunset.svg", "pan-end-symbolic.svg", "humidity.svg", "wind.svg", "pressure.svg",
+                  "cloud.svg", "eye.svg", "umbrella.svg", "measure.svg"]]
+        if "icon" in self.weather["weather"][0]:
+            files.append((os.path.join(self.weather_icons, "ow-{}.svg".format(self.weather["weather"][0]["icon"])),
+                          self.settings["popup-header-icon-size"]))
+        for data in self.forecast["list"]:
+            if "weather" in data and data["weather"] and "icon" in data["weather"][0]:
+                path = os.path.join(self.weather_icons, "ow-{}.svg".format(data["weather"][0]["icon"]))
+                if (path, self.settings["popup-icon-size"]) not in files:
+                    files.append((path, self.settings["popup-icon-size"]))
+        return files
+
+    def prerender_icons(self):
+        # Runs on a worker thread: the popup update then only takes pixbufs from the cache.
+        files, scale = self.prerender_args
+        for path, size in files:
+            try:
+                create_pixbuf(path, size * scale, fallback=False)
+            except Exception as e:
+                eprint(e)
+        GLib.idle_add(self.update_popup)
 
+    def create_popup(self):
         self.popup = Gtk.Window.new(Gtk.WindowType.TOPLEVEL)
         self.popup.set_property("name", self.settings["popup-css-name"])
 
@@ -391,63 +366,240 @@ class OpenWeather(Gtk.EventBox):
         self.popup.add(vbox)
 
         # CURRENT WEATHER
-        # row 0: Big icon
+        # row 0: Big icon & temperature
+        self.popup_header = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 6)
+        self.popup_header_img = Gtk.Image()
+        self.popup_header_img.set_property("halign", Gtk.Align.END)
+        self.popup_header.pack_start(self.popup_header_img, True, True, 0)
+        self.popup_temp_lbl = Gtk.Label()
+        self.popup_temp_lbl.set_property("halign", Gtk.Align.START)
+        self.popup_header.pack_start(self.popup_temp_lbl, True, True, 0)
+        vbox.pack_start(self.popup_header, False, False, 0)
+
+        # row 1: Location
+        hbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
+        hbox.set_tooltip_text("{}, {}".format(self.settings["lat"], self.settings["long"]))
+        self.popup_loc_lbl = Gtk.Label()
+        hbox.pack_start(self.popup_loc_lbl, True, True, 0)
+        vbox.pack_start(hbox, False, False, 0)
+
+        # row 2: Sunrise/sunset
+        self.popup_sun_box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
+        vbox.pack_start(self.popup_sun_box, False, False, 6)
         hbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 6)
+        self.popup_sun_box.pack_start(hbox, True, False, 0)
+        hbox.pack_start(self.svg2img("sunrise.svg"), False, False, 0)
+        self.popup_sunrise_lbl = Gtk.Label()
+        hbox.pack_start(self.popup_sunrise_lbl, False, False, 0)
+        hbox.pack_start(self.svg2img("sunset.svg"), False, False, 0)
+        self.popup_sunset_lbl = Gtk.Label()
+        hbox.pack_start(self.popup_sunset_lbl, False, False, 0)
+
+        # row 3: Weather details
+        self.popup_details_lbl = Gtk.Label()
+        self.popup_details_lbl.set_property("justify", Gtk.Justification.CENTER)
+        vbox.pack_start(self.popup_details_lbl, False, False, 0)
+
+        # Alerts: 1st title & count, descriptions toggled on click
+        self.popup_alerts_eb = Gtk.EventBox()
+        hbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
+        self.popup_alerts_eb.add(hbox)
+        self.popup_alerts_eb.connect("button-release-event", self.on_warning_clicked)
+        self.popup_alerts_eb.connect("enter_notify_event", self.on_window_enter)
+        self.popup_alerts_eb.connect("leave_notify_event", self.on_window_enter)
+        box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
+        self.popup_alerts_lbl = Gtk.Label()
+        self.popup_alerts_lbl.set_line_wrap(True)
+        self.popup_alerts_lbl.set_justify(Gtk.Justification.CENTER)
+        box.pack_start(self.popup_alerts_lbl, False, False, 0)
+        box.pack_start(self.svg2img("pan-end-symbolic.svg"), False, False, 0)
+        hbox.pack_start(box, True, False, 0)
+        vbox.pack_start(self.popup_alerts_eb, False, False, 6)
+
+        self.alerts_scrolled_window = Gtk.ScrolledWindow.new(None, None)
+        self.alerts_scrolled_window.connect("enter_notify_event", self.on_window_enter)
+        self.alerts_scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        self.alerts_scrolled_window.set_propagate_natural_height(True)
+        warnings_box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
+        warnings_box.set_property("margin", 10)
+        self.alerts_scrolled_window.add(warnings_box)
+        self.popup_warnings_lbl = Gtk.Label()
+        self.popup_warnings_lbl.set_line_wrap(True)
+        warnings_box.pack_start(self.popup_warnings_lbl, False, False, 0)
+        vbox.pack_start(self.alerts_scrolled_window, False, False, 10)
+
+        # 5-DAY FORECAST
+        lbl = Gtk.Label()
+        lbl.set_markup('<span font_size="{}"><big>{}</big></span>'.format(self.settings["popup-text-size"],
+                                                                         self.lang["5-day-forecast"]))
+        vbox.pack_start(lbl, False, False, 6)
+
+        scrolled_window = Gtk.ScrolledWindow.new(None, None)
+        scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled_window.connect("enter-notify-event", self.on_window_enter)
+
+        self.popup_grid = Gtk.Grid.new()
+        self.popup_grid.set_column_spacing(3)
+        self.popup_grid.set_row_spacing(3)
+
+        scrolled_window.add_with_viewport(self.popup_grid)
+        vbox.pack_start(scrolled_window, True, True, 0)
+
+        self.popup_footer = Gtk.Box.new(Gtk.Orientation.VERTICAL, 0)
+        self.popup_footer.pack_start(Gtk.Separator.new(Gtk.Orientation.HORIZONTAL), False, False, 0)
+        self.popup_footer_lbl = Gtk.Label()
+        self.popup_footer_lbl.set_property("margin-top", 3)
+        self.popup_footer.pack_start(self.popup_footer_lbl, False, False, 0)
+        vbox.pack_start(self.popup_footer, False, False, 0)
+
+        vbox.show_all()
+
+    def forecast_cell(self, row, column, icon=None):
+        """
+        Attach a label, with an icon in front if given, to the forecast grid.
+        :return: (widget attached, label)
+        """
+        lbl = Gtk.Label()
+        if icon:
+            box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
+            box.pack_start(self.svg2img(icon), False, False, 0)
+            box.pack_start(lbl, False, False, 0)
+            cell = box
+        else:
+            cell = lbl
+        self.popup_grid.attach(cell, column, row, 1, 1)
+        cell.show_all()
+        return cell, lbl
+
+    def add_forecast_row(self, i):
+        row = {"date": self.forecast_cell(i, 1), "time": self.forecast_cell(i, 2)}
+        row["date"][1].set_property("margin-left", 10)
+
+        img = Gtk.Image()
+        img.set_property("margin-start", 6)
+        img.set_property("margin-end", 2)
+        self.popup_grid.attach(img, 3, i, 1, 1)
+        img.show()
+        row["icon"] = img
+        row["icon-path"] = None
+
+        row["temp"] = self.forecast_cell(i, 4)
+        for key, column, icon in [("humidity", 5, "humidity.svg"), ("wind", 6, "wind.svg"),
+                                  ("pressure", 7, "pressure.svg"), ("cloudiness", 8, "cloud.svg"),
+                                  ("visibility", 9, "eye.svg"), ("pop", 10, "umbrella.svg")]:
+            if self.settings["show-{}".format(key)]:
+                row[key] = self.forecast_cell(i, column, icon)
+        if self.settings["show-volume"]:
+            row["volume"] = self.forecast_cell(i, 11, "measure.svg")
+            # snow volume goes next to rain volume, if any
+            snow_lbl = Gtk.Label()
+            row["volume"][0].pack_start(snow_lbl, False, False, 0)
+            row["snow"] = (snow_lbl, snow_lbl)
+
+        return row
+
+    def forecast_values(self, data):
+        """
+        :return: {cell: text}, empty text to hide the cell
+        """
+        values = {"date": datetime.fromtimestamp(data["dt"]).strftime("%a, %d %b"),
+                  "time": "<tt>{}</tt>".format(datetime.fromtimestamp(data["dt"]).strftime("<b>%H:%M</b>")),
+                  "temp": "", "humidity": "", "wind": "", "pressure": "", "cloudiness": "", "visibility": "",
+                  "pop": "", "volume": "", "snow": ""}
+
+        if "temp" in data["main"] and data["main"]["temp"]:
+            feels_like = ""
+            if "feels_like" in data["main"] and data["main"]["feels_like"]:
+                feels_like = " ({}°)".format(int(round(data["main"]["feels_like"], 0)))
+            values["temp"] = "{}°{}".format(str(int(round(data["main"]["temp"], 0))), feels_like)
+
+        if "humidity" in data["main"] and data["main"]["humidity"]:
+            values["humidity"] = "{}%".format(data["main"]["humidity"])
+
+        if "wind" in data and data["wind"]:
+            wind_speed = "{} m/s".format(data["wind"]["speed"]) if "speed" in data["wind"] and data["wind"][
+                "speed"] else ""
+            wind_gust = " ({})".format(data["wind"]["gust"]) if "gust" in data["wind"] and data["wind"][
+                "gust"] else ""
+            wind_dir = " {}".format(direction(data["wind"]["deg"])) if "deg" in data["wind"] and data["wind"][
+                "deg"] else ""
+            values["wind"] = "{}{}{}".format(wind_speed, wind_gust, wind_dir)
+
+        if "pressure" in data["main"] and data["main"]["pressure"]:
+            values["pressure"] = "{} hPa".format(data["main"]["pressure"])
+
+        if "clouds" in data and "all" in data["clouds"]:
+            values["cloudiness"] = "{}%".format(data["clouds"]["all"])
+
+        if "visibility" in data:
+            values["visibility"] = "{} km".format(int(data["visibility"] / 1000))
+
+        if "pop" in data and data["pop"]:
+            values["pop"] = "{}%".format(int(round(data["pop"] * 100, 0)))
+
+        # rain goes to the label of the "volume" cell
+        if "rain" in data and "3h" in data["rain"]:
+            values["volume"] = "{} mm".format(round(data["rain"]["3h"], 2))
+        if "snow" in data and "3h" in data["snow"]:
+            values["snow"] = "{} mm".format(round(data["snow"]["3h"], 2))
+
+        return values
+
+    def update_forecast_row(self, row, data):
+        values = self.forecast_values(data)
+        for key, text in values.items():
+            if key in row:
+                cell, lbl = row[key]
+                lbl.set_markup('<span font_size="{}">{}</span>'.format(self.settings["popup-text-size"], text))
+                cell.set_visible(bool(text))
+        if "volume" in row:
+            row["volume"][0].set_visible(bool(values["volume"] or values["snow"]))
+            row["volume"][1].set_visible(bool(values["volume"]))
+
+        weather = data["weather"][0] if "weather" in data and data["weather"] else {}
+        if "icon" in weather:
+            icon_path = os.path.join(self.weather_icons, "ow-{}.svg".format(weather["icon"]))
+            if row["icon-path"] != icon_path:
+                self.set_popup_icon(row["icon"], icon_path)
+                row["icon-path"] = icon_path
+            row["icon"].set_tooltip_text(weather["description"] if "description" in weather else None)
+        row["icon"].set_visible("icon" in weather)
+
+    def update_popup(self):
+        if not self.data_ok():
+            return
+        if not self.popup:
+            self.create_popup()
+
+        # CURRENT WEATHER
         if "icon" in self.weather["weather"][0]:
             icon_path = os.path.join(self.weather_icons, "ow-{}.svg".format(self.weather["weather"][0]["icon"]))
-            img = Gtk.Image()
-            update_image(img, icon_path, self.settings["popup-header-icon-size"])
-            img.set_property("halign", Gtk.Align.END)
-            hbox.pack_start(img, True, True, 0)
+            update_image(self.popup_header_img, icon_path, self.settings["popup-header-icon-size"])
+        self.popup_header_img.set_visible("icon" in self.weather["weather"][0])
 
-        if "description" in self.weather["weather"][0]:
-            hbox.set_tooltip_text(self.weather["weather"][0]["description"])
+        self.popup_header.set_tooltip_text(
+            self.weather["weather"][0]["description"] if "description" in self.weather["weather"][0] else None)
 
-        # row 0: Temperature big label
         if "temp" in self.weather["main"]:
-            lbl = Gtk.Label()
             temp = self.weather["main"]["temp"]
-            lbl.set_markup(
+            self.popup_temp_lbl.set_markup(
                 '<span size="xx-large">{}{}</span>'.format(str(round(temp, 1)), degrees[self.settings["units"]]))
-            lbl.set_property("halign", Gtk.Align.START)
-            hbox.pack_start(lbl, True, True, 0)
-
-        vbox.pack_start(hbox, False, False, 0)
+        self.popup_temp_lbl.set_visible("temp" in self.weather["main"])
 
-        # row 1: Location
-        hbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
         loc_label = self.weather["name"] if "name" in self.weather and not self.settings["loc-name"] else \
             self.settings["loc-name"]
         country = ", {}".format(self.weather["sys"]["country"]) if "country" in self.weather["sys"] and \
                                                                    self.weather["sys"][
                                                                        "country"] else ""
-        hbox.set_tooltip_text("{}, {}".format(self.settings["lat"], self.settings["long"]))
-        lbl = Gtk.Label()
-        lbl.set_markup('<span size="x-large">{}{}</span>'.format(loc_label, country))
-        hbox.pack_start(lbl, True, True, 0)
-        vbox.pack_start(hbox, False, False, 0)
+        self.popup_loc_lbl.set_markup('<span size="x-large">{}{}</span>'.format(loc_label, country))
 
-        # row 2: Sunrise/sunset
         if self.weather["sys"]["sunrise"] and self.weather["sys"]["sunset"]:
-            wbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-            vbox.pack_start(wbox, False, False, 6)
-            hbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 6)
-            wbox.pack_start(hbox, True, False, 0)
-            img = self.svg2img("sunrise.svg")
-            hbox.pack_start(img, False, False, 0)
             dt = datetime.fromtimestamp(self.weather["sys"]["sunrise"])
-            lbl = Gtk.Label.new(dt.strftime("%H:%M"))
-            hbox.pack_start(lbl, False, False, 0)
-            img = self.svg2img("sunset.svg")
-            hbox.pack_start(img, False, False, 0)
+            self.popup_sunrise_lbl.set_text(dt.strftime("%H:%M"))
             dt = datetime.fromtimestamp(self.weather["sys"]["sunset"])
-            lbl = Gtk.Label.new(dt.strftime("%H:%M"))
-            hbox.pack_start(lbl, False, False, 0)
+            self.popup_sunset_lbl.set_text(dt.strftime("%H:%M"))
+        self.popup_sun_box.set_visible(bool(self.weather["sys"]["sunrise"] and self.weather["sys"]["sunset"]))
 
-        # row 3: Weather details
-        hbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-        lbl = Gtk.Label()
-        lbl.set_property("justify", Gtk.Justification.CENTER)
         feels_like = "{}: {}°".format(self.lang["feels-like"], self.weather["main"]["feels_like"]) if "feels_like" in \
                                                                                                       self.weather[
                                                                                                           "main"] else ""
@@ -470,250 +622,86 @@ class OpenWeather(Gtk.EventBox):
                                                                        self.weather["clouds"] else ""
         visibility = "   {}: {} km".format(self.lang["visibility"], int(
             self.weather["visibility"] / 1000)) if "visibility" in self.weather else ""
-        lbl.set_markup(
+        self.popup_details_lbl.set_markup(
             '<span font_size="{}">{}{}{}{}{}\n{}{}{}</span>'.format(self.settings["popup-text-size"], feels_like,
                                                                     humidity,
                                                                     wind_speed, wind_dir, wind_gust, pressure, clouds,
                                                                     visibility))
-        hbox.pack_start(lbl, True, True, 0)
-        vbox.pack_start(hbox, False, False, 0)
 
         # Alerts, if any
-        if self.alerts_json and "alerts" in self.alerts_json and self.alerts_json["alerts"]:
-            if "title" in self.alerts_json["alerts"][0]:
-                eb = Gtk.EventBox()
-                hbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                eb.add(hbox)
-                eb.connect("button-release-event", self.on_warning_clicked)
-                eb.connect("enter_notify_event", self.on_window_enter)
-                eb.connect("leave_notify_event", self.on_window_enter)
-                box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                lbl = Gtk.Label()
-                lbl.set_line_wrap(True)
-                lbl.set_justify(Gtk.Justification.CENTER)
-                # We will set markup later, as we don't yet know the number of unique alert
-                box.pack_start(lbl, False, False, 0)
-                img = self.svg2img("pan-end-symbolic.svg")
-                box.pack_start(img, False, False, 0)
-                hbox.pack_start(box, True, False, 0)
-                vbox.pack_start(eb, False, False, 6)
-
-                self.alerts_scrolled_window = Gtk.ScrolledWindow.new(None, None)
-                self.alerts_scrolled_window.connect("enter_notify_event", self.on_window_enter)
-                self.alerts_scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
-                self.alerts_scrolled_window.set_propagate_natural_height(True)
-                warnings_box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                warnings_box.set_property("margin", 10)
-                self.alerts_scrolled_window.add(warnings_box)
-                w_label = Gtk.Label()
-                w_label.set_line_wrap(True)
-                warnings_box.pack_start(w_label, False, False, 0)
-                vbox.pack_start(self.alerts_scrolled_window, False, False, 10)
-
-                descriptions = []
-                for alert in self.alerts_json["alerts"]:
-                    try:
-                        if alert["description"]:
-                            effective = alert["effective_local"] if "effective_local" in alert else ""
-                            expires = alert["expires_local"] if "expires_local" in alert else ""
-
-                            if "T" in effective:
-                                effective = effective.replace("T", " ")
-                            if "T" in expires:
-                                expires = expires.replace("T", " ")
-                            # regions = ""
-                            # if "regions" in alert and alert["regions"]:
-                            #     regions = "[ "
-                            #     for r in alert["regions"]:
-                            #         regions += "{} ".format(r)
-                            #     regions += "]"
-                            description = "<b>{}: {} - {}</b>\n\n{}\n".format(alert["title"], effective, expires,
-                                                                              alert["description"].splitlines()[0])
-                            # Omit repeating alerts
-                            if description not in descriptions:
-                                descriptions.append(description)
-                    except Exception as e:
-                        eprint(e)
-
-                # Use just the 1st alerts "title", add unlabeled alerts count
-                if len(descriptions) > 1:
-                    lbl.set_markup(
-                        '<span bgcolor="#cc0000"> {} (+{}) </span>'.format(self.alerts_json["alerts"][0]["title"],
-                                                                           len(descriptions) - 1))
-                else:
-                    lbl.set_markup('<span bgcolor="#cc0000"> {} </span>'.format(self.alerts_json["alerts"][0]["title"]))
-
-                w_label.set_markup("\n\n".join(descriptions))
+        descriptions = []
+        if self.alerts_json and "alerts" in self.alerts_json and self.alerts_json["alerts"] and "title" in \
+                self.alerts_json["alerts"][0]:
+            for alert in self.alerts_json["alerts"]:
+                try:
+                    if alert["description"]:
+                        effective = alert["effective_local"] if "effective_local" in alert else ""
+                        expires = alert["expires_local"] if "expires_local" in alert else ""
+
+                        if "T" in effective:
+                            effective = effective.replace("T", " ")
+                        if "T" in expires:
+                            expires = expires.replace("T", " ")
+                        description = "<b>{}: {} - {}</b>\n\n{}\n".format(alert["title"], effective, expires,
+                                                                          alert["description"].splitlines()[0])
+                        # Omit repeating alerts
+                        if description not in descriptions:
+                            descriptions.append(description)
+                except Exception as e:
+                    eprint(e)
+
+            # Use just the 1st alerts "title", add unlabeled alerts count
+            if len(descriptions) > 1:
+                self.popup_alerts_lbl.set_markup(
+                    '<span bgcolor="#cc0000"> {} (+{}) </span>'.format(self.alerts_json["alerts"][0]["title"],
+                                                                       len(descriptions) - 1))
+            else:
+                self.popup_alerts_lbl.set_markup(
+                    '<span bgcolor="#cc0000"> {} </span>'.format(self.alerts_json["alerts"][0]["title"]))
 
-        # 5-DAY FORECAST
-        if self.forecast["cod"] in [200, "200"]:
-            lbl = Gtk.Label()
-            lbl.set_markup(
-                '<span font_size="{}"><big>{}</big></span>'.format(self.settings["popup-text-size"],
-                                                                   self.lang["5-day-forecast"]))
-            vbox.pack_start(lbl, False, False, 6)
-
-            scrolled_window = Gtk.ScrolledWindow.new(None, None)
-            scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
-            scrolled_window.connect("enter-notify-event", self.on_window_enter)
-
-            grid = Gtk.Grid.new()
-            grid.set_column_spacing(3)
-            grid.set_row_spacing(3)
-
-            scrolled_window.add_with_viewport(grid)
-            vbox.pack_start(scrolled_window, True, True, 0)
-
-            for i in range(len(self.forecast["list"])):
-                data = self.forecast["list"][i]
-
-                # Date
-                dt = datetime.fromtimestamp(data["dt"]).strftime("%a, %d %b")
-                box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                lbl = Gtk.Label()
-                lbl.set_property("margin-left", 10)
-                lbl.set_markup('<span font_size="{}">{}</span>'.format(self.settings["popup-text-size"], dt))
-                box.pack_start(lbl, False, False, 0)
-                grid.attach(box, 1, i, 1, 1)
-
-                # Time
-                dt = datetime.fromtimestamp(data["dt"]).strftime("<b>%H:%M</b>")
-                box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                lbl = Gtk.Label()
-                lbl.set_markup(
-                    '<span font_size="{}"><tt>{}</tt></span>'.format(self.settings["popup-text-size"], dt))
-                box.pack_start(lbl, False, False, 0)
-                grid.attach(box, 2, i, 1, 1)
-
-                # Icon
-                if "weather" in data and data["weather"][0]:
-                    if "icon" in data["weather"][0]:
-                        img = self.svg2img("ow-{}.svg".format(data["weather"][0]["icon"]), weather=True)
-                        img.set_property("margin-start", 6)
-                        img.set_property("margin-end", 2)
-                        grid.attach(img, 3, i, 1, 1)
-                    if "description" in data["weather"][0]:
-                        img.set_tooltip_text(data["weather"][0]["description"])
-
-                # Temperature
-                if "temp" in data["main"] and data["main"]["temp"]:
-                    lbl = Gtk.Label()
-                    feels_like = ""
-                    if "feels_like" in data["main"] and data["main"]["feels_like"]:
-                        feels_like = " ({}°)".format(int(round(data["main"]["feels_like"], 0)))
-                    lbl.set_markup('<span font_size="{}">{}°{}</span>'.format(self.settings["popup-text-size"],
-                                                                              str(int(round(data["main"]["temp"], 0))),
-                                                                              feels_like))
-                    grid.attach(lbl, 4, i, 1, 1)
-
-                # Humidity
-                if self.settings["show-humidity"] and "humidity" in data["main"] and data["main"]["humidity"]:
-                    box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                    img = self.svg2img("humidity.svg")
-                    box.pack_start(img, False, False, 0)
-                    lbl = Gtk.Label()
-                    lbl.set_markup('<span font_size="{}">{}%</span>'.format(self.settings["popup-text-size"],
-                                                                            data["main"]["humidity"]))
-                    box.pack_start(lbl, False, False, 0)
-                    grid.attach(box, 5, i, 1, 1)
-
-                # Wind
-                if self.settings["show-wind"] and "wind" in data and data["wind"]:
-                    box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                    img = self.svg2img("wind.svg")
-                    box.pack_start(img, False, False, 0)
-                    wind_speed = "{} m/s".format(data["wind"]["speed"]) if "speed" in data["wind"] and data["wind"][
-                        "speed"] else ""
-                    wind_gust = " ({})".format(data["wind"]["gust"]) if "gust" in data["wind"] and data["wind"][
-                        "gust"] else ""
-                    wind_dir = " {}".format(direction(data["wind"]["deg"])) if "deg" in data["wind"] and data["wind"][
-                        "deg"] else ""
-                    lbl = Gtk.Label()
-                    lbl.set_markup(
-                        '<span font_size="{}">{}{}{}</span>'.format(self.settings["popup-text-size"], wind_speed,
-                                                                    wind_gust, wind_dir))
-                    box.pack_start(lbl, False, False, 0)
-                    grid.attach(box, 6, i, 1, 1)
-
-                # Pressure
-                if self.settings["show-pressure"] and "pressure" in data["main"] and data["main"]["pressure"]:
-                    box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                    img = self.svg2img("pressure.svg")
-                    box.pack_start(img, False, False, 0)
-                    lbl = Gtk.Label()
-                    lbl.set_markup('<span font_size="{}">{} hPa</span>'.format(self.settings["popup-text-size"],
-                                                                               data["main"]["pressure"]))
-                    box.pack_start(lbl, False, False, 0)
-                    grid.attach(box, 7, i, 1, 1)
-
-                # Cloudiness
-                if self.settings["show-cloudiness"] and "clouds" in data:
-                    if "all" in data["clouds"]:
-                        box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                        img = self.svg2img("cloud.svg")
-                        box.pack_start(img, False, False, 0)
-                        lbl = Gtk.Label()
-                        lbl.set_markup('<span font_size="{}">{}%</span>'.format(self.settings["popup-text-size"],
-                                                                                data["clouds"]["all"]))
-                        box.pack_start(lbl, False, False, 0)
-                        grid.attach(box, 8, i, 1, 1)
-
-                # Visibility
-                if self.settings["show-visibility"] and "visibility" in data:
-                    box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                    img = self.svg2img("eye.svg")
-                    box.pack_start(img, False, False, 0)
-                    lbl = Gtk.Label()
-                    lbl.set_markup('<span font_size="{}">{} km</span>'.format(self.settings["popup-text-size"],
-                                                                              int(data["visibility"] / 1000)))
-                    box.pack_start(lbl, False, False, 0)
-                    grid.attach(box, 9, i, 1, 1)
-
-                # Probability of precipitation
-                if self.settings["show-pop"] and "pop" in data and data["pop"]:
-                    box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                    img = self.svg2img("umbrella.svg")
-                    box.pack_start(img, False, False, 0)
-                    lbl = Gtk.Label()
-                    lbl.set_markup('<span font_size="{}">{}%</span>'.format(self.settings["popup-text-size"],
-                                                                            int(round(data["pop"] * 100, 0))))
-                    box.pack_start(lbl, False, False, 0)
-                    grid.attach(box, 10, i, 1, 1)
-
-                # Precipitation volume
-                if self.settings["show-volume"]:
-                    box = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 0)
-                    img = self.svg2img("measure.svg")
-                    box.pack_start(img, False, False, 0)
-                    if "rain" in data and "3h" in data["rain"]:
-                        lbl = Gtk.Label()
-                        lbl.set_markup('<span font_size="{}">{} mm</span>'.format(self.settings["popup-text-size"],
-                                                                                  round(data["rain"]["3h"], 2)))
-                        box.pack_start(lbl, False, False, 0)
-                        grid.attach(box, 11, i, 1, 1)
-
-                    if "snow" in data and "3h" in data["snow"]:
-                        lbl = Gtk.Label()
-                        lbl.set_markup('<span font_size="{}">{} mm</span>'.format(self.settings["popup-text-size"],
-                                                                                  round(data["snow"]["3h"], 2)))
-                        box.pack_start(lbl, False, False, 0)
-                        grid.attach(box, 12, i, 1, 1)
-
-            if os.path.isfile(self.forecast_file):
-                sep = Gtk.Separator.new(Gtk.Orientation.HORIZONTAL)
-                vbox.pack_start(sep, False, False, 0)
-                mtime = datetime.fromtimestamp(os.stat(self.forecast_file)[stat.ST_MTIME])
-                lbl = Gtk.Label()
-                lbl.set_markup(
-                    '<span font_size="{}">openweathermap.org, {}</span>'.format(self.settings["popup-text-size"],
-                                                                                mtime.strftime("%d %B %H:%M:%S")))
-                lbl.set_property("margin-top", 3)
-            vbox.pack_start(lbl, False, False, 0)
-
-        self.popup.show_all()
-        if self.alerts_scrolled_window:
+            self.popup_warnings_lbl.set_markup("\n\n".join(descriptions))
+            self.popup_alerts_eb.show()
+        else:
+            self.popup_alerts_eb.hide()
             self.alerts_scrolled_window.hide()
 
+        # 5-DAY FORECAST: rows are updated in place, added or hidden as needed
+        for i, data in enumerate(self.forecast["list"]):
+            if i == len(self.forecast_rows):
+                self.forecast_rows.append(self.add_forecast_row(i))
+            self.update_forecast_row(self.forecast_rows[i], data)
+        for row in self.forecast_rows[len(self.forecast["list"]):]:
+            for key, cell in row.items():
+                if key == "icon":
+                    cell.hide()
+                elif key != "icon-path":
+                    cell[0].hide()
+
+        if self.updated:
+            mtime = datetime.fromtimestamp(self.updated)
+            self.popup_footer_lbl.set_markup(
+                '<span font_size="{}">openweathermap.org, {}</span>'.format(self.settings["popup-text-size"],
+                                                                            mtime.strftime("%d %B %H:%M:%S")))
+        self.popup_footer.set_visible(bool(self.updated))
+
+        self.popup_time = self.updated
+
+    def display_popup(self):
+        if not self.data_ok():
+            print("No data available")
+            return
+
+        if self.popup and self.popup.is_visible():
+            self.popup.hide()
+            return
+
+        if self.popup_time != self.updated:
+            # the background update hasn't finished yet
+            self.update_popup()
+
+        self.alerts_scrolled_window.hide()
+        self.popup.show()
+
     def on_warning_clicked(self, label, event):
         if self.alerts_scrolled_window:
             if not self.alerts_scrolled_window.is_visible():
@@ -728,8 +716,7 @@ class OpenWeather(Gtk.EventBox):
         return True
 
     def close_and_clear_tag(self):
-        self.popup.close()
-        self.popup.destroy()
+        self.popup.hide()
         self.src_tag = 0
 
     def on_window_enter(self, *args):
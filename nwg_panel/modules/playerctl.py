@@ -1,18 +1,140 @@
 #!/usr/bin/env python3
+from collections import OrderedDict
 from enum import Enum
+import hashlib
 import os.path
-import threading
+import time
 from urllib.parse import unquote, urlparse
 
 import gi
 
 gi.require_version('Playerctl', '2.0')
 
-from gi.repository import GLib, Gtk, Gdk
+from gi.repository import GLib, Gtk, Gdk, GdkPixbuf
 from gi.repository import Playerctl as Ctl
 import requests
 
-from nwg_panel.tools import check_key, eprint, local_dir, update_image
+from nwg_panel.tools import check_key, eprint, local_dir, get_cache_dir, update_image
+from nwg_panel.scheduler import schedule
+
+
+class CoverCache:
+    """
+    Album art, downloaded and scaled on worker threads. Remote covers are stored on disk under the URL hash,
+    scaled pixbufs of recent covers are kept in memory.
+    """
+    MAX_PIXBUFS = 32
+    MAX_DISK_SIZE = 50 * 1024 * 1024  # bytes
+    MAX_AGE = 30 * 24 * 3600  # seconds
+
+    def __init__(self):
+        cache_dir = get_cache_dir()
+        if cache_dir:
+            self.dir = os.path.join(cache_dir, "nwg-panel", "covers")
+        else:
+            self.dir = os.path.join(local_dir(), "covers")
+        self.pixbufs = OrderedDict()  # {(url, mtime, size): GdkPixbuf}
+        self.pending = {}  # {(url, mtime, size): [callback]}
+
+    def get(self, url, size, callback):
+        """
+        Call `callback(url, pixbuf)` on the main loop; pixbuf is None if the cover couldn't be loaded.
+        """
+        parsed = urlparse(url)
+        path = unquote(parsed.path)
+        remote = parsed.scheme.startswith("http")
+        mtime = 0
+        if not remote:
+            # local covers may get overwritten under the same name
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                callback(url, None)
+                return
+
+        key = (url, mtime, size)
+        if key in self.pixbufs:
+            self.pixbufs.move_to_end(key)
+            callback(url, self.pixbufs[key])
+            return
+
+        if key in self.pending:
+            self.pending[key].append(callback)
+            return
+        self.pending[key] = [callback]
+        schedule(self.load, 0, args=(key, url if remote else None, path), blocking=True)
+
+    def load(self, key, remote_url, path):
+        pixbuf = None
+        try:
+            if remote_url:
+                path = self.download(remote_url)
+            size = key[2]
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(path, size, size)
+        except Exception as e:
+            eprint("Couldn't load cover '{}': {}".format(key[0], e))
+
+        GLib.idle_add(self.on_loaded, key, pixbuf)
+
+    def download(self, url):
+        path = os.path.join(self.dir, hashlib.sha1(url.encode("utf-8")).hexdigest())
+        if os.path.isfile(path):
+            # bump the file for eviction
+            os.utime(path)
+            return path
+
+        r = requests.get(url, allow_redirects=True, timeout=10)
+        r.raise_for_status()
+        os.makedirs(self.dir, exist_ok=True)
+        tmp_path = "{}.part".format(path)
+        with open(tmp_path, "wb") as f:
+            f.write(r.content)
+        os.replace(tmp_path, path)
+
+        self.evict()
+        return path
+
+    def evict(self):
+        files = []
+        total = 0
+        now = time.time()
+        for name in os.listdir(self.dir):
+            path = os.path.join(self.dir, name)
+            try:
+                st = os.stat(path)
+                if now - st.st_mtime > self.MAX_AGE:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        # oldest first
+        for mtime, size, path in sorted(files):
+            if total <= self.MAX_DISK_SIZE:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def on_loaded(self, key, pixbuf):
+        if pixbuf:
+            self.pixbufs[key] = pixbuf
+            while len(self.pixbufs) > self.MAX_PIXBUFS:
+                self.pixbufs.popitem(last=False)
+
+        for callback in self.pending.pop(key, []):
+            callback(key[0], pixbuf)
+
+        # GLib.SOURCE_REMOVE
+        return False
+
+
+# shared by all Playerctl instances
+cover_cache = CoverCache()
 
 
 class Playerctl(Gtk.EventBox):
@@ -156,34 +278,24 @@ class Playerctl(Gtk.EventBox):
 
         self.on_playback_status(player, player.props.playback_status)
 
-    def update_remote_cover(self, url):
-        try:
-            r = requests.get(url, allow_redirects=True)
-            cover_path = os.path.join(local_dir(), "cover.jpg")
-            with open(cover_path, 'wb') as f:
-                f.write(r.content)
-            cover_path = "file://" + cover_path
-        except Exception as e:
-            eprint("Couldn't update remote cover: {}".format(e))
-            cover_path = ""
-        GLib.idle_add(self.update_cover_image, cover_path)
-
     def update_cover_image(self, url):
-        url = urlparse(url)
-        path = unquote(url.path)
+        parsed = urlparse(url)
+        if parsed.scheme.startswith("http") or (parsed.scheme == "file" and parsed.path):
+            size = self.settings["cover-size"] * self.cover_img.get_scale_factor()
+            cover_cache.get(url, size, self.on_cover_loaded)
+        else:
+            update_image(self.cover_img, "music", self.settings["cover-size"], self.icons_path)
 
-        if url.scheme.startswith("http"):
-            threading.Thread(target=self.update_remote_cover(url.geturl()), daemon=True).start()
+    def on_cover_loaded(self, url, pixbuf):
+        # the track may have changed in the meantime
+        if url != self.old_cover_url:
             return
 
-        if url.scheme == "file" and path:
-            try:
-                update_image(self.cover_img, path, self.settings["cover-size"], fallback=False)
-            except Exception as e:
-                eprint("Error creating pixbuf: {}".format(e))
-                path = ""
-
-        if not path:
+        if pixbuf:
+            surface = Gdk.cairo_surface_create_from_pixbuf(pixbuf, self.cover_img.get_scale_factor(),
+                                                           self.cover_img.get_window())
+            self.cover_img.set_from_surface(surface)
+        else:
             update_image(self.cover_img, "music", self.settings["cover-size"], self.icons_path)
 
     def on_scroll(self, widget, event):
@@ -2,7 +2,6 @@
 import os.path
 
 from gi.repository import Gtk, GLib
-from i3ipc import Event
 
 from nwg_panel.tools import check_key, get_icon_name, update_image, temp_dir, save_json
 import nwg_panel.common
@@ -32,11 +31,12 @@ class Scratchpad(Gtk.Box):
         if settings["angle"] != 0.0:
             self.set_orientation(Gtk.Orientation.VERTICAL)
 
-        self.check_scratchpad(i3.get_tree())
+        self.check_scratchpad(tree)
         self.subscribe()
 
     def subscribe(self):
-        self.i3.on(Event.WINDOW, self.on_i3ipc_event)
+        nwg_panel.common.compositor_state.connect(self.on_state_changed, event_types=("window",))
+        self.connect("destroy", lambda widget: nwg_panel.common.compositor_state.disconnect(self.on_state_changed))
 
     def check_scratchpad(self, tree):
         content = []
@@ -128,5 +128,6 @@ class Scratchpad(Gtk.Box):
             cmd = "[pid={}] scratchpad show".format(pid)
             self.i3.command(cmd)
 
-    def on_i3ipc_event(self, i3conn, event):
-        self.check_scratchpad(i3conn.get_tree())
+    def on_state_changed(self, snapshot):
+        self.tree = snapshot.tree
+        self.check_scratchpad(snapshot.tree)
@@ -8,6 +8,16 @@ watcher_process = None
 
 
 def init_tray(trays: typing.List[Tray]):
+    """
+    Start the host & watcher on first call. Later calls (on panel reload) show already loaded items on new trays.
+    The host keeps a reference to `trays`, so it must be updated in place.
+    """
+    global watcher_process
+    if watcher_process:
+        for tray in trays:
+            host.add_tray(tray)
+        return
+
     # Run host in GLib main loop
     host.init(0, trays)
 
@@ -15,7 +25,6 @@ def init_tray(trays: typing.List[Tray]):
     # players will freeze on start, because status notifier registration and
     # playerctl pulling metadata happen at the same time. Run watcher in a
     # separate process workarounds this issue.
-    global watcher_process
     ctx = mp.get_context('spawn')
     watcher_process = ctx.Process(target=watcher.init, daemon=True)
     watcher_process.start()
@@ -105,10 +105,25 @@ class StatusNotifierHostInterface(object):
         for tray in self.trays:
             tray.add_item(item)
 
+    def add_tray(self, tray):
+        # trays created after the items were loaded, e.g. on panels added on reload
+        for item in self._statusNotifierItems:
+            if item.item_proxy is not None:
+                tray.add_item(item)
+
     def item_updated_handler(self, item, changed_properties):
         for tray in self.trays:
             tray.update_item(item, changed_properties)
 
 
+_status_notifier_host_interface = None
+
+
 def init(host_id, trays: typing.List[Tray]):
+    global _status_notifier_host_interface
     _status_notifier_host_interface = StatusNotifierHostInterface(host_id, trays)
+
+
+def add_tray(tray: Tray):
+    if _status_notifier_host_interface is not None:
+        _status_notifier_host_interface.add_tray(tray)
@@ -51,6 +51,7 @@ class SwayMode(Gtk.Box):
             GLib.idle_add(self.hide, priority=GLib.PRIORITY_HIGH)
 
         self.i3.on(Event.MODE, self.on_i3ipc_event)
+        self.connect("destroy", lambda widget: self.i3.off(self.on_i3ipc_event))
 
     def check_initial_mode(self):
         # On panel startup we may already be in some mode other than default,
@@ -1,11 +1,10 @@
 #!/usr/bin/env python3
 
 import os
-from gi.repository import Gtk, Gdk, GLib
-from i3ipc import Event
+from gi.repository import Gtk, Gdk
 
 from nwg_panel.tools import check_key, get_icon_name, update_image, load_autotiling, get_config_dir, temp_dir, \
-    save_json, update_image, update_image_fallback_desktop
+    save_json, update_image, update_image_fallback_desktop, reconcile_box
 import nwg_panel.common
 
 
@@ -31,18 +30,22 @@ class SwayTaskbar(Gtk.Box):
 
         self.display_name = display_name
         self.i3 = i3
-        self.tree = i3.get_tree()
+        snapshot = nwg_panel.common.compositor_state.get_snapshot()
+        self.tree = snapshot.tree
+        self.generation = snapshot.generation
         self.displays_tree = self.list_tree()
 
         self.autotiling = load_autotiling() if settings["mark-autotiling"] else []
 
+        self.ws_boxes = {}  # {(workspace con id, num): WorkspaceBox}
+        self.win_boxes = {}  # {con id: WindowBox}
         self.build_box()
         self.ws_box = None
         self.subscribe()
 
     def subscribe(self):
-        self.i3.on(Event.WINDOW, self.on_i3ipc_event)
-        self.i3.on(Event.WORKSPACE, self.on_i3ipc_event)
+        nwg_panel.common.compositor_state.connect(self.on_state_changed)
+        self.connect("destroy", lambda widget: nwg_panel.common.compositor_state.disconnect(self.on_state_changed))
 
     def list_tree(self):
         """
@@ -71,39 +74,73 @@ class SwayTaskbar(Gtk.Box):
         return displays_tree
 
     def build_box(self):
+        """
+        Reconciles existing WorkspaceBox / WindowBox widgets with the current tree. Boxes are keyed by the con id,
+        so that only those which appeared, disappeared or changed get created, destroyed or patched in place.
+        """
         self.displays_tree = self.list_tree()
         all_workspaces = self.settings["all-workspaces"]
 
+        ws_boxes = {}
+        win_boxes = {}
+        top_level = []
         for display in self.displays_tree:
             for desc in display.descendants():
                 if desc.type == "workspace":
-                    # hide the workspace labels (WorkspaceBox) when all_workspaces is set to False
-                    if all_workspaces:
-                        self.ws_box = WorkspaceBox(desc, self.settings, self.autotiling)
+                    windows = []
                     if all_workspaces or desc.find_focused() is not None:
                         for con in desc.descendants():
                             if con.name or con.app_id:
-                                win_box = WindowBox(self.tree, con, self.settings, self.position, self.icons_path,
-                                                    self.cache_file, floating=con in desc.floating_nodes)
-                                if all_workspaces:
-                                    self.ws_box.pack_start(win_box, False, False, self.settings["task-padding"])
-                                else:
-                                    # bypass WorkspaceBox to hide the labels
-                                    self.pack_start(win_box, False, False, self.settings["task-padding"])
+                                win_box = self.get_window_box(con, floating=con in desc.floating_nodes)
+                                win_boxes[con.id] = win_box
+                                windows.append(win_box)
+
+                    # hide the workspace labels (WorkspaceBox) when all_workspaces is set to False
                     if all_workspaces:
-                        # again, omit WorkspaceBox
-                        self.pack_start(self.ws_box, False, False, 0)
+                        key = (desc.id, desc.num)
+                        ws_box = self.ws_boxes[key] if key in self.ws_boxes else WorkspaceBox(desc, self.settings,
+                                                                                              self.autotiling)
+                        ws_box.con = desc
+                        # the first child is the workspace label
+                        reconcile_box(ws_box, windows, padding=self.settings["task-padding"], keep=1)
+                        ws_boxes[key] = ws_box
+                        top_level.append(ws_box)
+                    else:
+                        # bypass WorkspaceBox to hide the labels
+                        top_level += windows
+
+        reconcile_box(self, top_level, padding=0 if all_workspaces else self.settings["task-padding"])
+
+        for key in self.win_boxes:
+            if key not in win_boxes:
+                self.win_boxes[key].destroy()
+        for key in self.ws_boxes:
+            if key not in ws_boxes:
+                self.ws_boxes[key].destroy()
+        self.win_boxes = win_boxes
+        self.ws_boxes = ws_boxes
+
         self.show_all()
 
-    def on_i3ipc_event(self, i3conn, event):
-        GLib.idle_add(self.refresh,
-                      i3conn.get_tree(),
-                      priority=GLib.PRIORITY_HIGH)
+    def get_window_box(self, con, floating=False):
+        win_box = self.win_boxes[con.id] if con.id in self.win_boxes else None
+        if win_box and win_box.signature == WindowBox.get_signature(con, floating):
+            win_box.update(self.tree, con)
+        else:
+            if win_box:
+                win_box.destroy()
+            win_box = WindowBox(self.tree, con, self.settings, self.position, self.icons_path, self.cache_file,
+                                floating=floating)
+        return win_box
+
+    def on_state_changed(self, snapshot):
+        # Called on the main loop by CompositorState, once per event burst
+        if snapshot.generation != self.generation:
+            self.generation = snapshot.generation
+            self.refresh(snapshot.tree)
 
     def refresh(self, tree):
         self.tree = tree
-        for item in self.get_children():
-            item.destroy()
         self.build_box()
 
 
@@ -143,15 +180,12 @@ class WindowBox(Gtk.EventBox):
         self.icons_path = icons_path
         self.tree = tree
         self.cache_file = cache_file
+        self.signature = WindowBox.get_signature(con, floating)
+        self.label = None
 
         self.old_name = ""
 
-        if con.urgent:
-            self.box.set_property("name", "task-box-urgent")
-        elif con.focused:
-            self.box.set_property("name", "task-box-focused")
-        else:
-            self.box.set_property("name", "task-box")
+        self.set_css_name(con)
 
         self.connect('enter-notify-event', self.on_enter_notify_event)
         self.connect('leave-notify-event', self.on_leave_notify_event)
@@ -171,14 +205,12 @@ class WindowBox(Gtk.EventBox):
         if con.name:
             check_key(settings, "show-app-name", True)
             check_key(settings, "name-max-len", 20)
-            name = con.name[:settings["name-max-len"]] if len(con.name) > settings["name-max-len"] else con.name
-            if settings["mark-xwayland"] and not con.app_id:
-                name = "X|" + name
+            name = self.window_name(con)
             if settings["show-app-name"]:
                 check_key(settings, "name-max-len", 10)
-                label = Gtk.Label(name)
-                label.set_angle(settings["angle"])
-                self.box.pack_start(label, False, False, 0)
+                self.label = Gtk.Label(name)
+                self.label.set_angle(settings["angle"])
+                self.box.pack_start(self.label, False, False, 0)
             else:
                 self.set_tooltip_text(name)
 
@@ -204,6 +236,44 @@ class WindowBox(Gtk.EventBox):
 
             self.box.pack_start(image, False, False, 4)
 
+    @staticmethod
+    def get_signature(con, floating):
+        # Properties that can't be patched in place: if any of them changes, the box needs to be rebuilt
+        return con.app_id, con.window_class, bool(con.name), con.parent.layout, floating
+
+    def window_name(self, con):
+        name = con.name[:self.settings["name-max-len"]] if len(con.name) > self.settings["name-max-len"] else con.name
+        if self.settings["mark-xwayland"] and not con.app_id:
+            name = "X|" + name
+        return name
+
+    def set_css_name(self, con):
+        if con.urgent:
+            name = "task-box-urgent"
+        elif con.focused:
+            name = "task-box-focused"
+        else:
+            name = "task-box"
+        if self.box.get_property("name") != name:
+            self.box.set_property("name", name)
+
+    def update(self, tree, con):
+        """
+        Patch the existing box with the new con data (title, urgency, focus)
+        """
+        self.tree = tree
+        self.con = con
+        self.pid = con.pid
+        self.set_css_name(con)
+
+        if con.name:
+            name = self.window_name(con)
+            if self.label:
+                if self.label.get_text() != name:
+                    self.label.set_text(name)
+            elif self.get_tooltip_text() != name:
+                self.set_tooltip_text(name)
+
     def on_enter_notify_event(self, widget, event):
         widget.set_state_flags(Gtk.StateFlags.DROP_ACTIVE, clear=False)
         widget.set_state_flags(Gtk.StateFlags.SELECTED, clear=False)
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
-from gi.repository import Gtk, Gdk, GLib
-from i3ipc import Event
+from gi.repository import Gtk, Gdk
 
 import nwg_panel.common
 from nwg_panel.tools import check_key, get_icon_name, update_image, update_image_fallback_desktop, load_autotiling
@@ -25,15 +24,17 @@ class SwayWorkspaces(Gtk.Box):
         self.layout_icon = Gtk.Image()
         self.icons_path = icons_path
         self.autotiling = load_autotiling()
-        self.build_box()
-        self.refresh()
+        snapshot = nwg_panel.common.compositor_state.get_snapshot()
+        self.generation = snapshot.generation
+        self.build_box(snapshot.tree, snapshot.workspaces)
+        self.refresh(snapshot.tree, snapshot.workspaces)
         self.subscribe()
 
     def subscribe(self):
-        self.i3.on(Event.WINDOW, self.on_i3ipc_event)
-        self.i3.on(Event.WORKSPACE, self.on_i3ipc_event)
+        nwg_panel.common.compositor_state.connect(self.on_state_changed)
+        self.connect("destroy", lambda widget: nwg_panel.common.compositor_state.disconnect(self.on_state_changed))
 
-    def build_box(self):
+    def build_box(self, tree, workspaces):
         check_key(self.settings, "numbers", [])
         check_key(self.settings, "custom-labels", [])
         check_key(self.settings, "focused-labels", [])
@@ -52,8 +53,8 @@ class SwayWorkspaces(Gtk.Box):
 
         # prevent from #142
         ws_num = -1
-        if self.i3.get_tree().find_focused():
-            ws_num, win_name, win_id, non_empty, win_layout, numbers = self.find_details()
+        if tree.find_focused():
+            ws_num, win_name, win_id, non_empty, win_layout, numbers = self.find_details(tree, workspaces)
 
         if len(self.settings["custom-labels"]) == 1:
             self.settings["custom-labels"] *= len(self.settings["numbers"])
@@ -127,12 +128,15 @@ class SwayWorkspaces(Gtk.Box):
 
         return eb, lbl
 
-    def on_i3ipc_event(self, i3conn, event):
-        GLib.idle_add(self.refresh, priority=GLib.PRIORITY_HIGH)
+    def on_state_changed(self, snapshot):
+        # Called on the main loop by CompositorState, once per event burst
+        if snapshot.generation != self.generation:
+            self.generation = snapshot.generation
+            self.refresh(snapshot.tree, snapshot.workspaces)
 
-    def refresh(self):
-        if self.i3.get_tree().find_focused():
-            ws_num, win_name, win_id, non_empty, win_layout, numbers = self.find_details()
+    def refresh(self, tree, workspaces):
+        if tree.find_focused():
+            ws_num, win_name, win_id, non_empty, win_layout, numbers = self.find_details(tree, workspaces)
 
             if len(self.settings["numbers"]) > 0:
                 numbers = self.settings["numbers"]
@@ -238,9 +242,7 @@ class SwayWorkspaces(Gtk.Box):
         if not loaded_icon and self.icon.get_visible():
             self.icon.hide()
 
-    def find_details(self):
-        tree = self.i3.get_tree()
-        workspaces = self.i3.get_workspaces()
+    def find_details(self, tree, workspaces):
         ws_num = -1
         win_name = ""
         win_id = ""  # app_id if available, else window_class
@@ -254,7 +256,7 @@ class SwayWorkspaces(Gtk.Box):
 
         non_empty = []
         if self.settings["show-name"] or self.settings["show-icon"]:
-            f = self.i3.get_tree().find_focused()
+            f = tree.find_focused()
             if f.type == "con" and f.name and str(f.parent.workspace().num) in self.settings["numbers"]:
                 win_name = f.name[:self.settings["name-length"]]
 
@@ -11,8 +11,8 @@ License: MIT
 
 import json
 import os
-import socket
 import sys
+import threading
 from enum import Enum
 
 import psutil
@@ -20,9 +20,9 @@ from i3ipc import Connection
 import gi
 
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk, Gdk, GLib
+from gi.repository import Gtk, Gdk, GLib, Pango
 
-from nwg_panel.tools import get_config_dir, load_json, save_json, check_key, eprint
+from nwg_panel.tools import get_config_dir, load_json, save_json, check_key, eprint, hyprctl, niri_ipc
 
 swaysock = os.getenv('SWAYSOCK')
 his = os.getenv("HYPRLAND_INSTANCE_SIGNATURE")
@@ -41,51 +41,20 @@ class SortOrder(Enum):
 
 sort_order = SortOrder.PID
 
-# We need to get_allocated_width of each one inside a function later
-btn_pid, btn_ppid, btn_owner, btn_cpu, btn_mem, btn_name = None, None, None, None, None, None,
-
-
-def hyprctl(cmd):
-    # /tmp/hypr moved to $XDG_RUNTIME_DIR/hypr in #5788
-    xdg_runtime_dir = os.getenv("XDG_RUNTIME_DIR")
-    hypr_dir = f"{xdg_runtime_dir}/hypr" if xdg_runtime_dir and os.path.isdir(
-        f"{xdg_runtime_dir}/hypr") else "/tmp/hypr"
-
-    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    s.connect(f"{hypr_dir}/{os.getenv('HYPRLAND_INSTANCE_SIGNATURE')}/.socket.sock")
-
-    s.send(cmd.encode("utf-8"))
-    output = s.recv(20480).decode('utf-8')
-    s.close()
-
-    return output
-
-
-def niri_ipc(cmd, is_json=False):
-    niri_sock = os.getenv("NIRI_SOCKET")
-    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    client.connect(niri_sock)
-    if not is_json:
-        client.send(f'"{cmd}"\n'.encode("utf-8"))
-    else:
-        client.send(f'{cmd}\n'.encode("utf-8"))
-
-    buffer = ""
-    while True:
-        chunk = client.recv(1024).decode('utf-8', errors='replace')
-        if not chunk:
-            break
-        buffer += chunk
-    try:
-        reply = json.loads(buffer)
-        key = next(iter(reply))
-        return reply[key]
-
-    except json.JSONDecodeError as e:
-        print("Failed to decode JSON:", e)
-        print("Buffer:", buffer)
-        return None
-
+# ListStore columns
+COL_KILL, COL_PID, COL_PPID, COL_OWNER, COL_OWNER_KEY, COL_CPU, COL_CPU_MARKUP, COL_MEM, COL_MEM_MARKUP, \
+    COL_ICON, COL_NAME, COL_NAME_KEY, COL_WINDOW = range(13)
+COLUMNS = list(range(13))
+
+# SortOrder: (model column, direction)
+sort_columns = {
+    SortOrder.PID: (COL_PID, Gtk.SortType.ASCENDING),
+    SortOrder.PPID: (COL_PPID, Gtk.SortType.ASCENDING),
+    SortOrder.NAME: (COL_NAME_KEY, Gtk.SortType.ASCENDING),
+    SortOrder.USERNAME: (COL_OWNER_KEY, Gtk.SortType.ASCENDING),
+    SortOrder.CPU_PERCENT: (COL_CPU, Gtk.SortType.DESCENDING),
+    SortOrder.MEMORY_PERCENT: (COL_MEM, Gtk.SortType.DESCENDING),
+}
 
 if not swaysock and not his and not niri_sock:
     eprint("Neither sway nor hyprland socket detected, terminating.")
@@ -93,6 +62,7 @@ if not swaysock and not his and not niri_sock:
 
 W_OWNER = 10
 W_NAME = 24
+W_WINDOW = 24
 
 # Fallback icon names dict: win_name -> icon_name
 aliases = {
@@ -101,11 +71,19 @@ aliases = {
 }
 
 settings = {}  # nwg-panel common settings
-scrolled_window = None
-grid = Gtk.Grid()
-window_lbl = None
+user = os.getenv('USER')
+sampler = None
+
+store = Gtk.ListStore(str, int, int, str, str, float, str, float, str, str, str, str, str)
+rows = {}  # {pid: Gtk.TreeIter}, ListStore iters persist as long as the row exists
+row_values = {}  # {pid: values last set to the row}
+tree_columns = {}  # {SortOrder: Gtk.TreeViewColumn}
+column_widths = {}  # {Gtk.TreeViewColumn: width in characters}
+kill_column = None
+window_column = None
 
 theme = Gtk.IconTheme.get_default()
+icon_names = {}  # {(process name, window name): icon name or None}
 
 
 def handle_keyboard(win, event):
@@ -120,249 +98,428 @@ def terminate(btn, pid):
     except Exception as e:
         eprint(e)
 
-    list_processes()
+    sampler.refresh()
 
 
-def list_processes(once=False):
-    tree = None
-    clients = {}
-    windows = {}
-    if swaysock:
-        tree = Connection().get_tree()
-    elif his:
-        output = hyprctl("j/clients")
-        clients = json.loads(output)
-    elif niri_sock:
-        command = "Windows"
-        windows = niri_ipc(json.dumps(command), is_json=True)["Windows"]
-
-    processes = {}
-
-    user = os.getenv('USER')
-    for proc in psutil.process_iter(['pid', 'ppid', 'name', 'username', 'cpu_percent', 'memory_percent']):
-        if proc.info['username'] == os.getenv('USER') or not settings["processes-own-only"]:
-            processes[proc.info['pid']] = proc.info
-
-    processes_list = []
-    for pid in processes:
-        item = {
-            "pid": pid,
-            "ppid": processes[pid]["ppid"],
-            "name": processes[pid]["name"],
-            "username": processes[pid]["username"],
-            "cpu_percent": processes[pid]["cpu_percent"],
-            "memory_percent": processes[pid]["memory_percent"]
-        }
-        processes_list.append(item)
-
-    if sort_order == SortOrder.PID:
-        sorted_list = processes_list  # they are already sorted by PID, no need to sort
-    elif sort_order == SortOrder.PPID:
-        sorted_list = sorted(processes_list, key=lambda d: d['ppid'])
-    elif sort_order == SortOrder.NAME:
-        sorted_list = sorted(processes_list, key=lambda d: d['name'].upper())
-    elif sort_order == SortOrder.USERNAME:
-        sorted_list = sorted(processes_list, key=lambda d: d['username'].upper())
-    elif sort_order == SortOrder.CPU_PERCENT:
-        sorted_list = sorted(processes_list, key=lambda d: d['cpu_percent'], reverse=True)
-    elif sort_order == SortOrder.MEMORY_PERCENT:
-        sorted_list = sorted(processes_list, key=lambda d: d['memory_percent'], reverse=True)
-    else:
-        sorted_list = processes_list
-
-    # At first, we need to add grid to the scrolled window (as in former add_with_viewport).
-    # In next iterations, we add the grid directly to already existing viewport, to avoid the scrolled window floating.
-    if scrolled_window and scrolled_window.get_children():
-        viewport = scrolled_window.get_children()[0]
-    else:
-        viewport = None
-
-    global grid
-    if grid:
-        grid.destroy()
-
-    grid = Gtk.Grid.new()
-    grid.set_column_spacing(3)
-
-    if viewport:
-        viewport.add(grid)
-    elif scrolled_window:
-        scrolled_window.add(grid)
-
-    idx = 1
-    for item in sorted_list:
-        cons = None
-        mapped = {}
-        pid = item['pid']
+class WindowIndex:
+    """
+    Compositor windows by pid, kept up to date from compositor events, so that sampling processes doesn't need
+    to fetch and walk all the windows on every tick.
+
+    Sway window events and niri `EventStream` events carry the window data, and are applied directly. Hyprland
+    events don't contain the pid: they just mark the index stale, and the clients list is fetched on the next
+    sample. If the event connection fails, windows are fetched on every sample, as before.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows = {}  # {window id: (pid, window name)}
+        self.stale = True
+        self.live = False  # receiving events
+        self.changes = 0  # window events applied so far
+        self.i3 = None
+
+    def start(self):
         if swaysock:
-            cons = tree.find_by_pid(pid)
+            target = self.watch_sway
         elif his:
-            for client in clients:
-                if client["pid"] == pid and client["mapped"]:
-                    mapped["pid"] = client["class"]
-                    break
+            target = self.watch_hyprland
         elif niri_sock:
-            for window in windows:
-                if window["pid"] == pid:
-                    mapped["pid"] = window["app_id"]
-                    break
-
-        if not cons or not settings["processes-background-only"]:
-            lbl = Gtk.Label.new(str(pid))
-            lbl.set_xalign(0)
-            grid.attach(lbl, 1, idx, 1, 1)
-
-            lbl = Gtk.Label.new(str(processes[pid]["ppid"]))
-            lbl.set_xalign(0)
-            grid.attach(lbl, 2, idx, 1, 1)
-
-            owner = processes[pid]["username"]
-            if len(owner) > W_OWNER - 1:
-                owner = "{}…".format(owner[:W_OWNER - 2])
-            lbl = Gtk.Label.new(owner)
-            lbl.set_xalign(0)
-            grid.attach(lbl, 3, idx, 1, 1)
-
-            percent = processes[pid]["cpu_percent"]
-            if percent == 0:
-                lbl = Gtk.Label.new("{}%".format(str(percent)))
+            target = self.watch_niri
+        else:
+            return
+        thread = threading.Thread(target=self.watch, args=(target,), daemon=True)
+        thread.start()
+
+    def watch(self, target):
+        try:
+            target()
+        except Exception as e:
+            eprint("Window events: {}".format(e))
+        with self.lock:
+            self.live = False
+            self.stale = True
+
+    def get_names(self):
+        """
+        :return: {pid: window name} of the first window found for each pid
+        """
+        with self.lock:
+            refetch = self.stale or not self.live
+            self.stale = False
+            changes = self.changes
+
+        # IPC outside the lock, not to block the event thread
+        if refetch:
+            try:
+                fetched = self.fetch()
+            except Exception:
+                with self.lock:
+                    self.stale = True
+                raise
+            with self.lock:
+                if self.changes == changes:
+                    self.windows = fetched
+                else:
+                    # events applied meanwhile may be missing from the fetched windows
+                    self.stale = True
+
+        with self.lock:
+            windows = list(self.windows.values())
+
+        names = {}
+        for pid, name in windows:
+            if pid and pid not in names:
+                names[pid] = name
+        return names
+
+    @staticmethod
+    def sway_window(con):
+        return con.pid, con.app_id or con.window_class or con.name or con.window_title or ""
+
+    def fetch(self):
+        windows = {}
+        if swaysock:
+            if not self.i3:
+                self.i3 = Connection()
+            try:
+                tree = self.i3.get_tree()
+            except Exception:
+                self.i3 = None
+                raise
+            for con in tree:
+                if con.pid:
+                    windows[con.id] = self.sway_window(con)
+        elif his:
+            for client in json.loads(hyprctl("j/clients")):
+                if client["mapped"]:
+                    windows[client["address"]] = (client["pid"], client["class"])
+        elif niri_sock:
+            for window in niri_ipc("Windows")["Windows"]:
+                windows[window["id"]] = (window["pid"], window["app_id"])
+        return windows
+
+    def set_window(self, window_id, value):
+        with self.lock:
+            if value:
+                self.windows[window_id] = value
             else:
-                lbl = Gtk.Label()
-                lbl.set_markup("<b>{}%</b>".format(str(percent)))
-            lbl.set_xalign(0)
-            grid.attach(lbl, 4, idx, 1, 1)
-
-            percent = processes[pid]["memory_percent"]
-            if percent < 1:
-                lbl = Gtk.Label.new("{}%".format(str(round(percent, 2))))
+                self.windows.pop(window_id, None)
+            self.changes += 1
+
+    def watch_sway(self):
+        from i3ipc import Event
+        i3 = Connection()
+
+        def on_window(i3conn, event):
+            con = event.container
+            self.set_window(con.id, None if event.change == "close" else self.sway_window(con))
+
+        i3.on(Event.WINDOW, on_window)
+        with self.lock:
+            self.live = True
+            self.stale = True
+        i3.main()
+
+    def watch_hyprland(self):
+        import socket
+        from nwg_panel.ipc import hypr_socket_path
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(hypr_socket_path(".socket2.sock"))
+        with self.lock:
+            self.live = True
+            self.stale = True
+
+        buffer = ""
+        while True:
+            chunk = client.recv(2048).decode('utf-8', errors='replace')
+            if not chunk:
+                break
+            buffer += chunk
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                if line.split(">>")[0] in ["openwindow", "closewindow"]:
+                    with self.lock:
+                        self.stale = True
+
+    def watch_niri(self):
+        import socket
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(niri_sock)
+        client.sendall(b"\"EventStream\"\n")
+        with self.lock:
+            self.live = True
+            self.stale = True
+
+        buffer = ""
+        while True:
+            chunk = client.recv(4096).decode('utf-8', errors='replace')
+            if not chunk:
+                break
+            buffer += chunk
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                if not line.strip():
+                    continue
+                message = json.loads(line)
+                if "WindowsChanged" in message:
+                    windows = {w["id"]: (w["pid"], w["app_id"]) for w in message["WindowsChanged"]["windows"]}
+                    with self.lock:
+                        self.windows = windows
+                        self.stale = False
+                        self.changes += 1
+                elif "WindowOpenedOrChanged" in message:
+                    w = message["WindowOpenedOrChanged"]["window"]
+                    self.set_window(w["id"], (w["pid"], w["app_id"]))
+                elif "WindowClosed" in message:
+                    self.set_window(message["WindowClosed"]["id"], None)
+
+
+class Sampler:
+    """
+    Samples processes and compositor windows on a worker thread, and passes the result to `update_store`
+    on the main loop. If the main loop is busy, only the latest sample gets applied.
+    """
+
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.latest = None
+        self.windows = WindowIndex()
+
+    def start(self):
+        self.windows.start()
+        thread = threading.Thread(target=self.loop, daemon=True)
+        thread.start()
+
+    def refresh(self):
+        self.wake.set()
+
+    def loop(self):
+        # with no interval set, cpu_percent still needs a second sample, 1 second later
+        timeout = self.interval if self.interval > 0 else 1
+        while True:
+            try:
+                snapshot = self.sample()
+            except Exception as e:
+                eprint("Couldn't list processes: {}".format(e))
             else:
-                lbl = Gtk.Label()
-                lbl.set_markup("<b>{}%</b>".format(str(round(percent, 2))))
-            lbl.set_xalign(0)
-            grid.attach(lbl, 5, idx, 1, 1)
-
-            win_name = ""
-            if cons:
-                if cons[0].app_id:
-                    win_name = cons[0].app_id
-                elif cons[0].window_class:
-                    win_name = cons[0].window_class
-                elif cons[0].name:
-                    win_name = cons[0].name
-                elif cons[0].window_title:
-                    win_name = cons[0].window_title
-            elif mapped:
-                win_name = mapped["pid"]
-
-            if win_name:
-                lbl = Gtk.Label.new(" {}".format(win_name))
-                lbl.set_xalign(0)
-                grid.attach(lbl, 8, idx, 1, 1)
-
-            name = processes[pid]["name"]
-            if theme.lookup_icon(name, 16, Gtk.IconLookupFlags.FORCE_SYMBOLIC):
-                img = Gtk.Image.new_from_icon_name(name, Gtk.IconSize.MENU)
-                img.set_property("halign", Gtk.Align.END)
-                grid.attach(img, 6, idx, 1, 1)
-            # fallback icon name
-            elif win_name and theme.lookup_icon(win_name, 16, Gtk.IconLookupFlags.FORCE_SYMBOLIC):
-                img = Gtk.Image.new_from_icon_name(win_name, Gtk.IconSize.MENU)
-                img.set_property("halign", Gtk.Align.END)
-                grid.attach(img, 6, idx, 1, 1)
-            elif win_name and win_name in aliases and theme.lookup_icon(aliases[win_name], 16,
-                                                                        Gtk.IconLookupFlags.FORCE_SYMBOLIC):
-                img = Gtk.Image.new_from_icon_name(aliases[win_name], Gtk.IconSize.MENU)
-                img.set_property("halign", Gtk.Align.END)
-                grid.attach(img, 6, idx, 1, 1)
-
-            if len(name) > W_NAME:
-                name = "{}…".format(name[:W_NAME - 1])
-            lbl = Gtk.Label.new(name)
-            lbl.set_width_chars(W_NAME)
-            lbl.set_xalign(0)
-            grid.attach(lbl, 7, idx, 1, 1)
-
-            if processes[pid]["username"] == user:
-                btn = Gtk.Button.new_from_icon_name("gtk-close", Gtk.IconSize.MENU)
-                btn.set_property("name", "btn-kill")
-                btn.set_property("halign", Gtk.Align.CENTER)
-                btn.connect("clicked", terminate, pid)
-                grid.attach(btn, 0, idx, 1, 1)
-
-            idx += 1
-
-    # placeholders to align column width with the button box on top
-    img = Gtk.Image()
-    grid.attach(img, 0, idx + 1, 2, 1)
-    img.set_size_request(btn_pid.get_allocated_width(), 0)
-
-    img = Gtk.Image()
-    grid.attach(img, 2, idx + 1, 1, 1)
-    img.set_size_request(btn_ppid.get_allocated_width(), 0)
-
-    img = Gtk.Image()
-    grid.attach(img, 3, idx + 1, 1, 1)
-    img.set_size_request(btn_owner.get_allocated_width(), 0)
-
-    img = Gtk.Image()
-    grid.attach(img, 4, idx + 1, 1, 1)
-    img.set_size_request(btn_cpu.get_allocated_width(), 0)
-
-    img = Gtk.Image()
-    grid.attach(img, 5, idx + 1, 1, 1)
-    img.set_size_request(btn_mem.get_allocated_width(), 0)
-
-    img = Gtk.Image()
-    grid.attach(img, 6, idx + 1, 2, 1)
-    img.set_size_request(btn_name.get_allocated_width(), 0)
-
-    grid.show_all()
-
-    if not once:
-        return True
-
-
-def set_sort_order(btn, order):
+                with self.lock:
+                    idle = self.latest is None
+                    self.latest = snapshot
+                if idle:
+                    GLib.idle_add(self.apply)
+
+            self.wake.wait(timeout)
+            self.wake.clear()
+            if self.interval <= 0:
+                timeout = None
+
+    def apply(self):
+        with self.lock:
+            snapshot = self.latest
+            self.latest = None
+        update_store(snapshot)
+
+        # GLib.SOURCE_REMOVE
+        return False
+
+    def sample(self):
+        windows = self.windows.get_names()
+        # on sway, the tree contains all windows, not only mapped ones
+        background_only = swaysock and settings["processes-background-only"]
+
+        processes = []
+        for proc in psutil.process_iter(['pid', 'ppid', 'name', 'username', 'cpu_percent', 'memory_percent']):
+            info = proc.info
+            if settings["processes-own-only"] and info['username'] != user:
+                continue
+            if background_only and info['pid'] in windows:
+                continue
+            info["window"] = windows.get(info['pid'], "")
+            processes.append(info)
+
+        return processes
+
+
+def get_icon_name(name, win_name):
+    key = (name, win_name)
+    if key not in icon_names:
+        icon_name = None
+        if theme.lookup_icon(name, 16, Gtk.IconLookupFlags.FORCE_SYMBOLIC):
+            icon_name = name
+        # fallback icon name
+        elif win_name and theme.lookup_icon(win_name, 16, Gtk.IconLookupFlags.FORCE_SYMBOLIC):
+            icon_name = win_name
+        elif win_name and win_name in aliases and theme.lookup_icon(aliases[win_name], 16,
+                                                                    Gtk.IconLookupFlags.FORCE_SYMBOLIC):
+            icon_name = aliases[win_name]
+        icon_names[key] = icon_name
+
+    return icon_names[key]
+
+
+def get_row_values(item):
+    name = item["name"] or ""
+    owner = item["username"] or ""
+    cpu = item["cpu_percent"] or 0.0
+    mem = round(item["memory_percent"] or 0.0, 2)
+
+    return ["gtk-close" if owner == user else None,
+            item["pid"],
+            item["ppid"],
+            owner,
+            owner.upper(),
+            cpu,
+            "{}%".format(cpu) if cpu == 0 else "<b>{}%</b>".format(cpu),
+            mem,
+            "{}%".format(mem) if mem < 1 else "<b>{}%</b>".format(mem),
+            get_icon_name(name, item["window"]),
+            name,
+            name.upper(),
+            item["window"]]
+
+
+def update_store(processes):
+    """
+    Apply a sample to the model: insert new rows, update changed values, remove the rows of finished processes.
+    The model sorts itself, and the TreeView only renders rows that get visible.
+    """
+    pids = set()
+    for item in processes:
+        pid = item["pid"]
+        pids.add(pid)
+        values = get_row_values(item)
+        if pid not in rows:
+            rows[pid] = store.append(values)
+        elif values != row_values[pid]:
+            old_values = row_values[pid]
+            changed = [col for col in COLUMNS if values[col] != old_values[col]]
+            store.set(rows[pid], changed, [values[col] for col in changed])
+        row_values[pid] = values
+
+    for pid in list(rows):
+        if pid not in pids:
+            store.remove(rows.pop(pid))
+            del row_values[pid]
+
+
+def set_sort_order(column, order):
     global sort_order
     sort_order = order
 
-    btn_pid.set_label("  PID   ")
-    btn_ppid.set_label(" PPID  ")
-    btn_owner.set_label(" Owner  ")
-    btn_cpu.set_label(" CPU%  ")
-    btn_mem.set_label(" Mem%  ")
-    btn_name.set_label("          Name          ")
-
-    if order == SortOrder.PID:
-        btn_pid.set_label("  PID  <")
-    if order == SortOrder.PPID:
-        btn_ppid.set_label(" PPID <")
-    if order == SortOrder.USERNAME:
-        btn_owner.set_label(" Owner <")
-    if order == SortOrder.CPU_PERCENT:
-        btn_cpu.set_label(" CPU% <")
-    if order == SortOrder.MEMORY_PERCENT:
-        btn_mem.set_label(" Mem% <")
-    if order == SortOrder.NAME:
-        btn_name.set_label("          Name         <")
-
-    list_processes()
+    model_column, direction = sort_columns[order]
+    store.set_sort_column_id(model_column, direction)
+
+    for o, c in tree_columns.items():
+        c.set_sort_indicator(o == order)
+        c.set_sort_order(direction)
+
+
+def on_tree_button_press(tree, event):
+    if event.type != Gdk.EventType.BUTTON_PRESS or event.button != 1:
+        return False
+
+    pos = tree.get_path_at_pos(int(event.x), int(event.y))
+    if pos and pos[1] == kill_column:
+        it = store.get_iter(pos[0])
+        if store.get_value(it, COL_KILL):
+            terminate(None, store.get_value(it, COL_PID))
+            return True
+
+    return False
+
+
+def add_column(tree, title, width, order=None, expand=False):
+    column = Gtk.TreeViewColumn(title)
+    column.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+    column.set_resizable(True)
+    column.set_expand(expand)
+    column_widths[column] = width
+    if order:
+        column.set_clickable(True)
+        column.connect("clicked", set_sort_order, order)
+        tree_columns[order] = column
+    tree.append_column(column)
+
+    return column
+
+
+def add_text_cell(column, attribute, model_column):
+    renderer = Gtk.CellRendererText()
+    renderer.set_property("ellipsize", Pango.EllipsizeMode.END)
+    column.pack_start(renderer, True)
+    column.add_attribute(renderer, attribute, model_column)
+
+
+def set_column_widths(tree):
+    # columns are sized in characters of the tree font; fixed sizes let the TreeView skip measuring all rows
+    char_width = tree.create_pango_layout("0").get_pixel_size()[0]
+    for column in tree.get_columns():
+        column.set_fixed_width(column_widths[column] * char_width + 16)
+
+
+def create_tree():
+    global kill_column, window_column
+
+    tree = Gtk.TreeView(model=store)
+    tree.set_fixed_height_mode(True)
+    tree.set_enable_search(True)
+    tree.set_search_column(COL_NAME)
+
+    kill_column = add_column(tree, "", 2)
+    renderer = Gtk.CellRendererPixbuf()
+    kill_column.pack_start(renderer, False)
+    kill_column.add_attribute(renderer, "icon-name", COL_KILL)
+
+    column = add_column(tree, "PID", 8, SortOrder.PID)
+    add_text_cell(column, "text", COL_PID)
+
+    column = add_column(tree, "PPID", 8, SortOrder.PPID)
+    add_text_cell(column, "text", COL_PPID)
+
+    column = add_column(tree, "Owner", W_OWNER, SortOrder.USERNAME)
+    add_text_cell(column, "text", COL_OWNER)
+
+    column = add_column(tree, "CPU%", 7, SortOrder.CPU_PERCENT)
+    add_text_cell(column, "markup", COL_CPU_MARKUP)
+
+    column = add_column(tree, "Mem%", 7, SortOrder.MEMORY_PERCENT)
+    add_text_cell(column, "markup", COL_MEM_MARKUP)
+
+    column = add_column(tree, "Name", W_NAME + 3, SortOrder.NAME)
+    renderer = Gtk.CellRendererPixbuf()
+    column.pack_start(renderer, False)
+    column.add_attribute(renderer, "icon-name", COL_ICON)
+    add_text_cell(column, "text", COL_NAME)
+
+    window_column = add_column(tree, "Window", W_WINDOW, expand=True)
+    add_text_cell(window_column, "text", COL_WINDOW)
+    window_column.set_visible(not settings["processes-background-only"])
+
+    tree.connect("realize", set_column_widths)
+    tree.connect("button-press-event", on_tree_button_press)
+
+    return tree
 
 
 def on_background_cb(check_button):
     settings["processes-background-only"] = check_button.get_active()
     save_json(settings, os.path.join(get_config_dir(), "common-settings.json"))
-    if window_lbl:
-        window_lbl.set_visible(not settings["processes-background-only"])
+    if window_column:
+        window_column.set_visible(not settings["processes-background-only"])
 
-    list_processes()
+    sampler.refresh()
 
 
 def on_own_cb(check_button):
     settings["processes-own-only"] = check_button.get_active()
     save_json(settings, os.path.join(get_config_dir(), "common-settings.json"))
 
-    list_processes()
+    sampler.refresh()
 
 
 def main():
@@ -386,52 +543,18 @@ def main():
     box = Gtk.Box.new(Gtk.Orientation.VERTICAL, 6)
     box.set_property("margin", 6)
     box.set_property("vexpand", True)
-    wrapper = Gtk.Box.new(Gtk.Orientation.VERTICAL, 0)
-    box.pack_start(wrapper, False, False, 0)
-    hbox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 3)
-    wrapper.pack_start(hbox, True, True, 0)
-
-    global btn_pid, btn_ppid, btn_owner, btn_cpu, btn_mem, btn_name
-
-    btn_pid = Gtk.Button.new_with_label("  PID  <")
-    btn_pid.connect("clicked", set_sort_order, SortOrder.PID)
-    hbox.pack_start(btn_pid, False, False, 0)
-    btn_pid.show()
-
-    btn_ppid = Gtk.Button.new_with_label(" PPID  ")
-    btn_ppid.connect("clicked", set_sort_order, SortOrder.PPID)
-    hbox.pack_start(btn_ppid, False, False, 0)
-    btn_ppid.show()
-
-    btn_owner = Gtk.Button.new_with_label(" Owner  ")
-    btn_owner.connect("clicked", set_sort_order, SortOrder.USERNAME)
-    hbox.pack_start(btn_owner, False, False, 0)
-
-    btn_cpu = Gtk.Button.new_with_label(" CPU%  ")
-    btn_cpu.connect("clicked", set_sort_order, SortOrder.CPU_PERCENT)
-    hbox.pack_start(btn_cpu, False, False, 0)
-
-    btn_mem = Gtk.Button.new_with_label(" Mem%  ")
-    btn_mem.connect("clicked", set_sort_order, SortOrder.MEMORY_PERCENT)
-    hbox.pack_start(btn_mem, False, False, 0)
-
-    btn_name = Gtk.Button.new_with_label("          Name          ")
-    btn_name.connect("clicked", set_sort_order, SortOrder.NAME)
-    hbox.pack_start(btn_name, False, False, 0)
-
-    global window_lbl
-    window_lbl = Gtk.Label.new(" Window")
-    window_lbl.set_xalign(0)
-    hbox.pack_start(window_lbl, False, False, 0)
 
     win.add(box)
 
-    global scrolled_window
     scrolled_window = Gtk.ScrolledWindow.new(None, None)
     scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
     scrolled_window.set_propagate_natural_height(True)
     box.pack_start(scrolled_window, True, True, 0)
 
+    tree = create_tree()
+    scrolled_window.add(tree)
+    set_sort_order(None, sort_order)
+
     dist = Gtk.Box.new(Gtk.Orientation.VERTICAL, 0)
     dist.set_property("vexpand", True)
     box.pack_start(dist, True, True, 0)
@@ -468,20 +591,16 @@ def main():
     provider = Gtk.CssProvider()
     style_context = Gtk.StyleContext()
     style_context.add_provider_for_screen(screen, provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
-    css = b""" #btn-kill { padding: 0; border: 0; margin: 0 }
-        label { font-family: DejaVu Sans Mono } """
+    css = b""" label, treeview { font-family: DejaVu Sans Mono } """
     provider.load_from_data(css)
 
     win.show_all()
 
     win.set_size_request(0, 500)
 
-    list_processes()
-
-    if settings["processes-interval-ms"] > 0:
-        Gdk.threads_add_timeout(GLib.PRIORITY_DEFAULT_IDLE, settings["processes-interval-ms"], list_processes)
-    else:
-        GLib.timeout_add(1000, list_processes, True)
+    global sampler
+    sampler = Sampler(settings["processes-interval-ms"])
+    sampler.start()
 
     Gtk.main()
 
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+Lazy loading of panel module classes.
+
+Modules are only imported when a panel first instantiates them, so that unused ones (and their dependencies, e.g.
+`requests`, dasbus or the Playerctl typelib) cost nothing on startup. Import and instantiation times are recorded
+for `nwg-panel --profile-startup`.
+"""
+
+import importlib
+import sys
+import time
+
+from nwg_panel import instrumentation
+
+# class name: module
+MODULES = {
+    "BrightnessSlider": "nwg_panel.modules.brightness_slider",
+    "Clock": "nwg_panel.modules.clock",
+    "Controls": "nwg_panel.modules.controls",
+    "CpuAvg": "nwg_panel.modules.cpu_avg",
+    "CustomButton": "nwg_panel.modules.custom_button",
+    "DwlTags": "nwg_panel.modules.dwl_tags",
+    "Executor": "nwg_panel.modules.executor",
+    "HyprlandSubmap": "nwg_panel.modules.hyprland_submap",
+    "HyprlandTaskbar": "nwg_panel.modules.hyprland_taskbar",
+    "HyprlandWorkspaces": "nwg_panel.modules.hyprland_workspaces",
+    "KeyboardLayout": "nwg_panel.modules.keyboard_layout",
+    "MenuStart": "nwg_panel.modules.menu_start",
+    "NiriTaskbar": "nwg_panel.modules.niri_taskbar",
+    "Notifications": "nwg_panel.modules.notifications",
+    "OpenWeather": "nwg_panel.modules.openweather",
+    "Pinned": "nwg_panel.modules.pinned",
+    "Playerctl": "nwg_panel.modules.playerctl",
+    "RandomWallpaper": "nwg_panel.modules.random_wallpaper",
+    "Scratchpad": "nwg_panel.modules.scratchpad",
+    "SwayMode": "nwg_panel.modules.sway_mode",
+    "SwayTaskbar": "nwg_panel.modules.sway_taskbar",
+    "SwayWorkspaces": "nwg_panel.modules.sway_workspaces",
+    "Tray": "nwg_panel.modules.sni_system_tray",
+}
+
+# what to suggest if a module fails to load
+HINTS = {
+    "OpenWeather": "is 'python-requests' installed?",
+    "Tray": "is 'python-dasbus' installed?",
+}
+
+_classes = {}  # {class name: class, or None if it failed to load}
+import_times = {}  # {class name: ms}
+instance_times = {}  # {module label: [count, total ms]}
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def module_class(name):
+    """
+    :param name: class name, as in MODULES
+    :return: the class, imported on first use; None if it couldn't be imported
+    """
+    if name not in _classes:
+        start = time.perf_counter()
+        try:
+            cls = getattr(importlib.import_module(MODULES[name]), name)
+            instrumentation.instrument_classes([cls])
+        except Exception as e:
+            eprint("Couldn't load {} module: {}{}".format(name, e,
+                                                         "; {}".format(HINTS[name]) if name in HINTS else ""))
+            cls = None
+        import_times[name] = (time.perf_counter() - start) * 1000
+        _classes[name] = cls
+
+    return _classes[name]
+
+
+def loaded(name):
+    return _classes.get(name) is not None
+
+
+def record_instance(label, start):
+    """
+    Add the time since `start` (a `time.perf_counter()` value) to the instantiation time of the `label` module.
+    """
+    if label.startswith("executor-"):
+        label = "executor-*"
+    elif label.startswith("button-"):
+        label = "button-*"
+    if label not in instance_times:
+        instance_times[label] = [0, 0.0]
+    instance_times[label][0] += 1
+    instance_times[label][1] += (time.perf_counter() - start) * 1000
+
+
+def print_profile(total_ms, before_main_ms):
+    """
+    Print the `--profile-startup` tables. Instantiation times of a module include importing it on first use.
+    """
+    print("\n{:<24}{:>12}".format("Import", "ms"))
+    for name, ms in sorted(import_times.items(), key=lambda item: item[1], reverse=True):
+        print("{:<24}{:>12.1f}{}".format(name, ms, "" if _classes[name] else "  (failed)"))
+
+    print("\n{:<24}{:>8}{:>12}".format("Instantiation", "count", "ms"))
+    for label, (count, ms) in sorted(instance_times.items(), key=lambda item: item[1][1], reverse=True):
+        print("{:<24}{:>8}{:>12.1f}".format(label, count, ms))
+
+    print("\n{:<24}{:>12.1f}".format("Before main()", before_main_ms))
+    print("{:<24}{:>12.1f}".format("Lazy imports", sum(import_times.values())))
+    print("{:<24}{:>12.1f}".format("main() until Gtk.main()", total_ms))
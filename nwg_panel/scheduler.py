@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+
+"""
+Central scheduler for polling modules.
+
+Jobs of the same interval share a single GLib timer, so that their ticks are aligned. On each tick the jobs are
+handed over to a small pool of worker threads, which caps the number of concurrently running tasks. Jobs which may
+block for long (scripts, network requests) go to a separate pool instead, which grows as needed, so that they can't
+hold up the others. A job is never queued twice: if its previous run is still in progress, the tick is skipped. Jobs
+owned by widgets are paused while none of the widgets is mapped (e.g. the panel is hidden), and cancelled when all
+of them get destroyed.
+
+Shared jobs (see `Scheduler.share`) let identical widgets, e.g. the same executor on mirrored panels, use a single
+producer: it runs once per tick, and its result is passed to every widget on the GTK main loop.
+"""
+
+import queue
+import sys
+import threading
+
+from gi.repository import GLib
+
+from nwg_panel import instrumentation
+
+MAX_WORKERS = 6
+IDLE_TIMEOUT = 60  # seconds after which idle workers exit
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+class Job:
+    def __init__(self, scheduler, target, interval, args, kwargs, pause_hidden, blocking=False, key=None):
+        self.scheduler = scheduler
+        self.target = target
+        self.interval = interval
+        self.args = args
+        self.kwargs = kwargs
+        self.pause_hidden = pause_hidden
+        self.blocking = blocking
+        self.key = key
+        self.owners = []
+
+        self.running = False
+        self.cancelled = False
+        self.rerun = False  # run_now() called while running
+        self.missed = False  # tick skipped while no owner was mapped
+
+    def __repr__(self):
+        return "{} every {}s".format(getattr(self.target, "__qualname__", self.target), self.interval)
+
+    def add_owner(self, owner):
+        self.owners.append(owner)
+        owner.connect("destroy", self.on_owner_destroyed)
+        owner.connect("map", self.on_owner_mapped)
+
+    def paused(self):
+        if not self.pause_hidden or not self.owners:
+            return False
+        for owner in self.owners:
+            if owner.get_mapped():
+                return False
+        return True
+
+    def run(self):
+        self.target(*self.args, **self.kwargs)
+
+    def run_now(self):
+        """
+        Run the job as soon as a worker is free, without affecting the schedule. If it's running, run it again
+        when done.
+        """
+        self.scheduler.submit(self, run_now=True)
+
+    def cancel(self, *args):
+        self.cancelled = True
+        self.scheduler.remove(self)
+
+    def on_owner_destroyed(self, owner):
+        if owner in self.owners:
+            self.owners.remove(owner)
+        if not self.owners:
+            self.cancel()
+
+    def on_owner_mapped(self, *args):
+        if self.missed:
+            self.missed = False
+            self.run_now()
+
+
+class SharedJob(Job):
+    def __init__(self, scheduler, target, interval, args, kwargs, pause_hidden, blocking, key):
+        Job.__init__(self, scheduler, target, interval, args, kwargs, pause_hidden, blocking=blocking, key=key)
+        self.consumers = []  # [(consume, owner)]
+        self.last_result = None
+        self.lock = threading.Lock()
+
+    def add_consumer(self, consume, owner):
+        with self.lock:
+            self.consumers.append((consume, owner))
+        if owner:
+            self.add_owner(owner)
+        # late subscribers don't need to wait for the next tick
+        if self.last_result is not None:
+            GLib.idle_add(self.deliver, consume, self.last_result)
+
+    def on_owner_destroyed(self, owner):
+        with self.lock:
+            self.consumers = [c for c in self.consumers if c[1] != owner]
+        Job.on_owner_destroyed(self, owner)
+
+    def run(self):
+        result = self.target(*self.args, **self.kwargs)
+        if result is None:
+            return
+        self.last_result = result
+        with self.lock:
+            consumers = list(self.consumers)
+        for consume, owner in consumers:
+            GLib.idle_add(self.deliver, consume, result)
+
+    def deliver(self, consume, result):
+        if not self.cancelled:
+            try:
+                consume(result)
+            except Exception as e:
+                eprint("{}: {}".format(self, e))
+
+        # GLib.SOURCE_REMOVE
+        return False
+
+
+class WorkerPool:
+    """
+    Worker threads taking jobs from a queue. Threads are started on demand, up to `max_workers` (None: no limit),
+    and exit after IDLE_TIMEOUT seconds without work.
+    """
+
+    def __init__(self, scheduler, max_workers):
+        self.scheduler = scheduler
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.workers = 0
+        self.idle_workers = 0  # waiting for a job, and not reserved for one already queued
+        self.backlog = 0  # jobs queued while all workers were busy
+
+    def put(self, job):
+        with self.lock:
+            if self.idle_workers > 0:
+                self.idle_workers -= 1
+                start_worker = False
+            else:
+                start_worker = self.max_workers is None or self.workers < self.max_workers
+                if start_worker:
+                    self.workers += 1
+                else:
+                    self.backlog += 1
+
+        self.queue.put(job)
+        if start_worker:
+            worker = threading.Thread(target=self.work, daemon=True)
+            worker.start()
+
+    def work(self):
+        while True:
+            try:
+                job = self.queue.get(timeout=IDLE_TIMEOUT)
+            except queue.Empty:
+                with self.lock:
+                    # unless reserved for a job being queued right now
+                    if self.idle_workers > 0:
+                        self.idle_workers -= 1
+                        self.workers -= 1
+                        return
+                continue
+
+            self.scheduler.run(job)
+            with self.lock:
+                if self.backlog > 0:
+                    # take a job queued while all workers were busy
+                    self.backlog -= 1
+                else:
+                    self.idle_workers += 1
+
+    def stats(self):
+        with self.lock:
+            return self.workers, self.idle_workers, self.queue.qsize()
+
+
+class Scheduler:
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.groups = {}  # {interval: [Job]}
+        self.timers = {}  # {interval: GLib source id}
+        self.shared = {}  # {key: SharedJob}
+        self.lock = threading.Lock()
+        self.pool = WorkerPool(self, max_workers)
+        self.blocking_pool = WorkerPool(self, None)
+
+    def schedule(self, target, interval, args=(), kwargs=None, owner=None, pause_hidden=True, blocking=False):
+        """
+        Run `target(*args, **kwargs)` on a worker thread every `interval` seconds, or just once if `interval` is 0.
+        :param owner: widget the job belongs to; the job gets cancelled when the widget is destroyed
+        :param pause_hidden: skip ticks while the owner is not mapped, catch up when it gets mapped again
+        :param blocking: the target may take long (e.g. runs a script or sends requests), use the growing pool
+        :return: Job
+        """
+        job = Job(self, target, interval, args, kwargs if kwargs else {}, pause_hidden, blocking=blocking)
+        if owner:
+            job.add_owner(owner)
+        self.start(job)
+
+        return job
+
+    def share(self, key, target, interval, consume, args=(), kwargs=None, owner=None, pause_hidden=True,
+              blocking=False):
+        """
+        Like `schedule`, but all callers passing the same `key` share a single job. `target(*args, **kwargs)` runs
+        once per tick, and its result (unless None) is passed to every `consume(result)` on the main loop.
+        The key must contain everything the result depends on, e.g. `("executor", script, interval)`.
+        :return: SharedJob
+        """
+        job = self.shared.get(key)
+        if job and not job.cancelled:
+            # keep the job running while hidden, if any of the consumers needs it
+            job.pause_hidden = job.pause_hidden and pause_hidden
+            job.add_consumer(consume, owner)
+            return job
+
+        job = SharedJob(self, target, interval, args, kwargs if kwargs else {}, pause_hidden, blocking, key)
+        job.add_consumer(consume, owner)
+        self.shared[key] = job
+        self.start(job)
+
+        return job
+
+    def start(self, job):
+        interval = job.interval
+        if interval > 0:
+            if interval not in self.groups:
+                self.groups[interval] = []
+            self.groups[interval].append(job)
+            if interval not in self.timers:
+                self.timers[interval] = GLib.timeout_add(int(interval * 1000), self.on_tick, interval)
+
+        if job.paused():
+            job.missed = True
+        else:
+            self.submit(job)
+
+    def stats(self):
+        """
+        Thread and job counts, for the debug dump.
+        """
+        with self.lock:
+            running = sum(1 for jobs in self.groups.values() for job in jobs if job.running)
+        workers, idle_workers, queued = self.pool.stats()
+        blocking_workers, blocking_idle_workers, blocking_queued = self.blocking_pool.stats()
+
+        return {"threads": threading.active_count(),
+                "workers": workers,
+                "idle workers": idle_workers,
+                "blocking workers": blocking_workers,
+                "idle blocking workers": blocking_idle_workers,
+                "timers": len(self.timers),
+                "jobs": sum(len(jobs) for jobs in self.groups.values()),
+                "shared jobs": len(self.shared),
+                "running": running,
+                "queued": queued + blocking_queued}
+
+    def dump(self):
+        lines = [", ".join("{}: {}".format(key, value) for key, value in self.stats().items())]
+        for interval in sorted(self.groups):
+            for job in self.groups[interval]:
+                lines.append("  {}{}{}".format(job, " (running)" if job.running else "",
+                                               " (paused)" if job.missed else ""))
+        return "\n".join(lines)
+
+    def remove(self, job):
+        if job.interval in self.groups and job in self.groups[job.interval]:
+            self.groups[job.interval].remove(job)
+        if job.key is not None and self.shared.get(job.key) is job:
+            del self.shared[job.key]
+
+    def on_tick(self, interval):
+        jobs = self.groups.get(interval)
+        if not jobs:
+            self.groups.pop(interval, None)
+            self.timers.pop(interval, None)
+            # GLib.SOURCE_REMOVE
+            return False
+
+        for job in list(jobs):
+            if job.paused():
+                job.missed = True
+            else:
+                self.submit(job)
+
+        return True
+
+    def submit(self, job, run_now=False):
+        """
+        Queue the job, unless it's running. Ticks landing while it runs are dropped, so that jobs slower than
+        their interval don't run back-to-back; `run_now` requests are run again after the current run.
+        """
+        with self.lock:
+            if job.cancelled:
+                return
+            if job.running:
+                if run_now:
+                    job.rerun = True
+                return
+            job.running = True
+
+        if job.blocking:
+            self.blocking_pool.put(job)
+        else:
+            self.pool.put(job)
+
+    def run(self, job):
+        # on a worker thread
+        try:
+            with instrumentation.context(job.owners[0] if job.owners else None):
+                job.run()
+        except Exception as e:
+            eprint("{}: {}".format(job, e))
+
+        with self.lock:
+            job.running = False
+            rerun = job.rerun
+            job.rerun = False
+        if rerun:
+            self.submit(job)
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler()
+    return _scheduler
+
+
+def schedule(target, interval, args=(), kwargs=None, owner=None, pause_hidden=True, blocking=False):
+    return get_scheduler().schedule(target, interval, args=args, kwargs=kwargs, owner=owner,
+                                    pause_hidden=pause_hidden, blocking=blocking)
+
+
+def share(key, target, interval, consume, args=(), kwargs=None, owner=None, pause_hidden=True, blocking=False):
+    return get_scheduler().share(key, target, interval, consume, args=args, kwargs=kwargs, owner=owner,
+                                 pause_hidden=pause_hidden, blocking=blocking)
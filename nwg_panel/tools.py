@@ -6,15 +6,18 @@ import json
 import subprocess
 import stat
 import time
-import socket
 import threading
 import re
 import glob
+from collections import OrderedDict
 
 import gi
 
 import nwg_panel.common
 from nwg_panel.icons import get_icon_name
+from nwg_panel.ipc import hypr_request, hypr_batch, niri_request
+from nwg_panel.audio import get_audio
+from nwg_panel.backlight import get_backlight
 
 gi.require_version('GdkPixbuf', '2.0')
 gi.require_version('Gtk', '3.0')
@@ -384,7 +387,25 @@ def create_background_task(target, interval, args=(), kwargs=None):
     return thread
 
 
+def audio_available(per_app=False):
+    """
+    :param per_app: without the native backend, per-app volume needs `pactl`
+    """
+    if get_audio():
+        return True
+    if per_app:
+        return nwg_panel.common.commands["pactl"]
+    return nwg_panel.common.commands["pamixer"] or nwg_panel.common.commands["pactl"]
+
+
 def get_balance(sink_name="@DEFAULT_SINK@"):
+    audio = get_audio()
+    if audio and sink_name == "@DEFAULT_SINK@":
+        try:
+            return audio.get_balance()
+        except Exception as e:
+            eprint("Audio backend: {}".format(e))
+
     if not nwg_panel.common.commands["pactl"]:
         return 0.0
 
@@ -407,6 +428,13 @@ def get_balance(sink_name="@DEFAULT_SINK@"):
 
 
 def get_volume():
+    audio = get_audio()
+    if audio:
+        try:
+            return audio.get_volume()
+        except Exception as e:
+            eprint("Audio backend: {}".format(e))
+
     vol = 0
     muted = False
     if nwg_panel.common.commands["pactl"]:
@@ -449,6 +477,13 @@ def list_sink_inputs():
     """
     Thanks to @fm16191 for https://github.com/fm16191/pactl-json-parser
     """
+    audio = get_audio()
+    if audio:
+        try:
+            return audio.list_sink_inputs()
+        except Exception as e:
+            eprint("Audio backend: {}".format(e))
+
     # This used to return localized output, returning unexpected values #327
     # p = subprocess.run("pactl list sink-inputs".split(), capture_output=True)
     # result = p.stdout.decode()
@@ -496,6 +531,13 @@ def list_sink_inputs():
     return sinks
 
 def list_sinks():
+    audio = get_audio()
+    if audio:
+        try:
+            return audio.list_sinks()
+        except Exception as e:
+            eprint("Audio backend: {}".format(e))
+
     sinks = []
     if nwg_panel.common.commands["pamixer"]:
         try:
@@ -548,6 +590,14 @@ def list_sinks():
 
 
 def toggle_mute(*args):
+    audio = get_audio()
+    if audio:
+        try:
+            audio.toggle_mute()
+            return
+        except Exception as e:
+            eprint("Audio backend: {}".format(e))
+
     if nwg_panel.common.commands["pamixer"]:
         vol, muted = get_volume()
         if muted:
@@ -580,7 +630,11 @@ def set_volume(percent, balance=0):
     if right > 100:
         right = 100
 
-    if nwg_panel.common.commands["pactl"]:
+    audio = get_audio()
+    if audio:
+        # asynchronous; when dragging the slider, only the latest value gets sent
+        audio.set_volume(left, right)
+    elif nwg_panel.common.commands["pactl"]:
         subprocess.call(f"pactl set-sink-volume @DEFAULT_SINK@ {left}% {right}%".split())
     elif nwg_panel.common.commands["pamixer"]:
         subprocess.call("pamixer --set-volume {}".format(percent).split())
@@ -588,7 +642,36 @@ def set_volume(percent, balance=0):
         eprint("Couldn't set volume, no 'pamixer' or 'pactl' found")
 
 
+def set_sink_input_volume(input_num, percent):
+    audio = get_audio()
+    if audio:
+        audio.set_sink_input_volume(input_num, percent)
+    elif nwg_panel.common.commands["pactl"]:
+        target = int(65536 * percent / 100)
+        subprocess.Popen('exec pactl set-sink-input-volume {} {}'.format(input_num, target), shell=True)
+
+
+def set_default_sink(name):
+    audio = get_audio()
+    if audio:
+        try:
+            audio.set_default_sink(name)
+            return
+        except Exception as e:
+            eprint("Audio backend: {}".format(e))
+
+    if nwg_panel.common.commands["pactl"]:
+        eprint("Sink: '{}'".format(name))
+        subprocess.Popen('exec pactl set-default-sink "{}"'.format(name), shell=True)
+    else:
+        eprint("Couldn't switch sinks, 'pactl' (libpulse) not found")
+
+
 def get_brightness(device="", controller=""):
+    backlight = get_backlight(device, controller)
+    if backlight:
+        return backlight.get()
+
     brightness = 0
     if nwg_panel.common.commands["light"] and controller == "light":
         cmd = "light -G -s {}".format(device) if device else "light -G"
@@ -617,6 +700,12 @@ def get_brightness(device="", controller=""):
 def set_brightness(percent, device="", controller=""):
     if percent == 0:
         percent = 1
+    backlight = get_backlight(device, controller)
+    if backlight:
+        # asynchronous; on fast scrolling / dragging only the latest value gets sent
+        backlight.set(percent)
+        return
+
     if nwg_panel.common.commands["light"] and controller == "light":
         if device:
             subprocess.Popen("light -s {} -S {}".format(device, percent).split())
@@ -723,40 +812,138 @@ def update_gtk_entry(entry, icon_pos, icon_name, icon_size, icons_path=""):
     entry.set_icon_from_pixbuf(icon_pos, pixbuf)
 
 
+class PixbufCache:
+    """
+    LRU cache of pixbufs created by `create_pixbuf`. Failed lookups are cached, too (as None). The cache gets
+    cleared when the icon theme changes.
+    """
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self.pixbufs = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.theme_watched = False
+
+    def watch_theme(self, icon_theme):
+        if not self.theme_watched:
+            icon_theme.connect("changed", self.clear)
+            self.theme_watched = True
+
+    def lookup(self, key):
+        """
+        :return: (found, pixbuf)
+        """
+        with self.lock:
+            if key in self.pixbufs:
+                self.pixbufs.move_to_end(key)
+                self.hits += 1
+                return True, self.pixbufs[key]
+            self.misses += 1
+            return False, None
+
+    def store(self, key, pixbuf):
+        with self.lock:
+            self.pixbufs[key] = pixbuf
+            while len(self.pixbufs) > self.max_size:
+                self.pixbufs.popitem(last=False)
+
+    def clear(self, *args):
+        with self.lock:
+            self.pixbufs.clear()
+
+    def stats(self):
+        return {"size": len(self.pixbufs), "hits": self.hits, "misses": self.misses}
+
+
+pixbuf_cache = PixbufCache()
+icon_search_paths = set()
+
+
+def add_icon_search_path(icon_theme, icons_path):
+    # the search path used to be extended on every create_pixbuf call
+    if icons_path not in icon_search_paths:
+        search_path = icon_theme.get_search_path()
+        if icons_path not in search_path:
+            search_path.append(icons_path)
+            icon_theme.set_search_path(search_path)
+        icon_search_paths.add(icons_path)
+
+
 def create_pixbuf(icon_name, icon_size, icons_path="", fallback=True):
-    try:
-        # In case a full path was given
-        if icon_name.startswith("/"):
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                icon_name, icon_size, icon_size)
-        else:
-            icon_theme = Gtk.IconTheme.get_default()
-            if icons_path:
-                search_path = icon_theme.get_search_path()
-                search_path.append(icons_path)
-                icon_theme.set_search_path(search_path)
+    # icon_size already includes the scale factor
+    key = (icon_name, icon_size, icons_path)
+    if icon_name.startswith("/"):
+        # files may get replaced under the same name, e.g. by executor scripts
+        try:
+            key += (os.path.getmtime(icon_name),)
+        except OSError:
+            pass
+
+    found, pixbuf = pixbuf_cache.lookup(key)
+    if not found:
+        try:
+            pixbuf = load_pixbuf(icon_name, icon_size, icons_path)
+        except Exception:
+            pixbuf = None
+        pixbuf_cache.store(key, pixbuf)
+
+    if pixbuf:
+        return pixbuf
 
+    if fallback:
+        return create_pixbuf(os.path.join(get_config_dir(), "icons_light/icon-missing.svg"), icon_size,
+                             fallback=False)
+    raise ValueError("Couldn't load icon '{}'".format(icon_name))
+
+
+def load_pixbuf(icon_name, icon_size, icons_path=""):
+    # In case a full path was given
+    if icon_name.startswith("/"):
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
+            icon_name, icon_size, icon_size)
+    else:
+        icon_theme = Gtk.IconTheme.get_default()
+        pixbuf_cache.watch_theme(icon_theme)
+        if icons_path:
+            add_icon_search_path(icon_theme, icons_path)
+
+        try:
+            if icons_path:
+                path = "{}/{}.svg".format(icons_path, icon_name)
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
+                    path, icon_size, icon_size)
+            else:
+                raise ValueError("icons_path not supplied.")
+        except:
             try:
-                if icons_path:
-                    path = "{}/{}.svg".format(icons_path, icon_name)
-                    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                        path, icon_size, icon_size)
-                else:
-                    raise ValueError("icons_path not supplied.")
+                pixbuf = icon_theme.load_icon(icon_name, icon_size, Gtk.IconLookupFlags.FORCE_SIZE)
             except:
-                try:
-                    pixbuf = icon_theme.load_icon(icon_name, icon_size, Gtk.IconLookupFlags.FORCE_SIZE)
-                except:
-                    pixbuf = icon_theme.load_icon(icon_name.lower(), icon_size, Gtk.IconLookupFlags.FORCE_SIZE)
-    except Exception as e:
-        if fallback:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
-                os.path.join(get_config_dir(), "icons_light/icon-missing.svg"), icon_size, icon_size)
-        else:
-            raise e
+                pixbuf = icon_theme.load_icon(icon_name.lower(), icon_size, Gtk.IconLookupFlags.FORCE_SIZE)
     return pixbuf
 
 
+def reconcile_box(box, widgets, padding=0, keep=0):
+    """
+    Make the box contain `widgets` in the given order, reusing the ones already packed. Widgets packed in
+    another container are moved here. Children no longer listed are removed, but not destroyed.
+    :param keep: number of leading children (e.g. a label) to leave untouched
+    """
+    wanted = set(widgets)
+    for child in box.get_children()[keep:]:
+        if child not in wanted:
+            box.remove(child)
+
+    for idx, widget in enumerate(widgets):
+        parent = widget.get_parent()
+        if parent != box:
+            if parent:
+                parent.remove(widget)
+            box.pack_start(widget, False, False, padding)
+        box.reorder_child(widget, idx + keep)
+
+
 def list_configs(config_dir):
     configs = {}
     # allow to store json files other than panel config files in the config directory
@@ -826,42 +1013,15 @@ def load_shell_data():
 
 
 def niri_ipc(cmd, is_json=False):
-    niri_sock = os.getenv("NIRI_SOCKET")
-    if not niri_sock:
-        print("NIRI_SOCKET environment variable not set.")
-        return None
-
-    try:
-        # Automatically closes the socket at the end of the with block
-        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
-            client.connect(niri_sock)
-
-            # Send command as stringified JSON or raw JSON
-            if not is_json:
-                client.send(f'"{cmd}"\n'.encode("utf-8"))
-            else:
-                client.send(f'{cmd}\n'.encode("utf-8"))
-
-            buffer = ""
-            while True:
-                chunk = client.recv(1024).decode('utf-8', errors='replace')
-                if not chunk:
-                    break
-                buffer += chunk
-                if buffer.endswith('\n'):  # Detect end of message
-                    break
-
-    except (socket.error, OSError) as e:
-        print("Socket error:", e)
+    # Send command as stringified JSON or raw JSON, over the persistent connection
+    reply = niri_request(cmd if is_json else f'"{cmd}"')
+    if reply is None:
         return None
-
     try:
-        reply = json.loads(buffer)
         key = next(iter(reply))
         return reply[key]
-    except json.JSONDecodeError as e:
-        print("Failed to decode JSON:", e)
-        print("Buffer:", buffer)
+    except (StopIteration, TypeError):
+        eprint("Unexpected reply: {}".format(reply))
         return None
 
 
@@ -894,29 +1054,8 @@ def niri_get_all():
     return niri_outputs(), niri_workspaces(), niri_windows(), niri_focused_window()
 
 
-def hyprctl(cmd, buf_size=2048):
-    # /tmp/hypr moved to $XDG_RUNTIME_DIR/hypr in #5788
-    xdg_runtime_dir = os.getenv("XDG_RUNTIME_DIR")
-    hypr_dir = f"{xdg_runtime_dir}/hypr" if xdg_runtime_dir and os.path.isdir(
-        f"{xdg_runtime_dir}/hypr") else "/tmp/hypr"
-
-    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    try:
-        s.connect(f"{hypr_dir}/{os.getenv('HYPRLAND_INSTANCE_SIGNATURE')}/.socket.sock")
-        s.send(cmd.encode("utf-8"))
-
-        output = b""
-        while True:
-            buffer = s.recv(buf_size)
-            if buffer:
-                output = b"".join([output, buffer])
-            else:
-                break
-        s.close()
-        return output.decode('utf-8', errors='replace')
-    except Exception as e:
-        eprint(f"hyprctl: {e}")
-        return ""
+def hyprctl(cmd, buf_size=8192):
+    return hypr_request(cmd, buf_size=buf_size)
 
 
 def h_list_monitors():
@@ -974,7 +1113,10 @@ def h_get_active_workspace():
 
 
 def h_modules_get_all():
-    return h_list_monitors(), h_list_workspaces(), h_list_clients(), h_get_activewindow(), h_get_active_workspace()
+    # single round trip
+    monitors, workspaces, clients, activewindow, activeworkspace = hypr_batch(
+        ["j/monitors", "j/workspaces", "j/clients", "j/activewindow", "j/activeworkspace"])
+    return monitors, workspaces, clients, activewindow, activeworkspace
 
 
 def cmd_through_compositor(cmd):
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Weather data provider shared by OpenWeather widgets.
+
+There's one provider per location, units & language, however many widgets show it, and a single fetch runs at a
+time. Requests go through a pooled session with timeouts and retries, and are conditional if the server sent an
+ETag or Last-Modified header. The last data is cached in a file per location, so that restarts don't trigger new
+requests.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from nwg_panel.tools import eprint, hms, temp_dir
+
+OWM_URL = "https://api.openweathermap.org/data/2.5"
+WEATHERBIT_URL = "https://api.weatherbit.io/v2.0"
+
+TIMEOUT = (5, 20)  # connect, read [s]
+RETRIES = 3
+
+_session = None
+_providers = {}
+_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            # retry on connection errors & server side failures, waiting 1, 2, 4... s (or as told by Retry-After)
+            retry = Retry(total=RETRIES, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+            adapter = HTTPAdapter(max_retries=retry)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def save_json_atomic(data, path):
+    # readers never see a partially written file
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        eprint("Couldn't save {}: {}".format(path, e))
+
+
+def is_ok(data):
+    return isinstance(data, dict) and data.get("cod") in [200, "200"]
+
+
+class WeatherProvider:
+    def __init__(self, lat, long, units, lang, appid, weatherbit_key="", owm_url=OWM_URL,
+                 weatherbit_url=WEATHERBIT_URL, cache_dir=None):
+        self.owm_url = owm_url
+        self.weatherbit_url = weatherbit_url
+        self.owm_params = {"lat": lat, "lon": long, "units": units, "lang": lang, "appid": appid}
+        self.alerts_params = {"lat": lat, "lon": long, "key": weatherbit_key} if weatherbit_key else None
+
+        digest = hashlib.sha1(repr((lat, long, units, lang)).encode("utf-8")).hexdigest()[:16]
+        self.cache_file = os.path.join(cache_dir if cache_dir else temp_dir(), "nwg-weather-{}.json".format(digest))
+        # {"weather": {}, "forecast": {}, "alerts": {} or None, "time": float, "validators": {name: {header: value}}}
+        self.data = None
+        self.lock = threading.Lock()
+
+    def fetch(self, max_age):
+        """
+        Request data older than `max_age` seconds. Concurrent callers wait for the fetch in progress, and get
+        its result.
+        :return: {"weather": {}, "forecast": {}, "alerts": {} or None, "time": last update}, None if no data
+        """
+        with self.lock:
+            if self.data is None:
+                self.data = {}
+                if os.path.isfile(self.cache_file):
+                    try:
+                        with open(self.cache_file) as f:
+                            self.data = json.load(f)
+                    except Exception as e:
+                        eprint("Couldn't load {}: {}".format(self.cache_file, e))
+
+            if self.data and time.time() - self.data["time"] < max_age:
+                return self.data
+
+            print(hms(), "Requesting weather data")
+            weather, weather_validators = self.request("weather", "{}/weather".format(self.owm_url),
+                                                       self.owm_params)
+            forecast, forecast_validators = self.request("forecast", "{}/forecast".format(self.owm_url),
+                                                         self.owm_params)
+            alerts, alerts_validators = self.request("alerts", "{}/alerts".format(self.weatherbit_url),
+                                                     self.alerts_params) if self.alerts_params else (None, {})
+
+            if is_ok(weather) and is_ok(forecast):
+                alerts = alerts if alerts and "alerts" in alerts else None
+                # validators only go with the replies they came with, or a 304 would revive discarded data
+                self.data["weather"] = weather
+                self.data["forecast"] = forecast
+                self.data["alerts"] = alerts
+                self.data["validators"] = {"weather": weather_validators, "forecast": forecast_validators,
+                                           "alerts": alerts_validators if alerts else {}}
+                self.data["time"] = time.time()
+                save_json_atomic(self.data, self.cache_file)
+                return self.data
+
+            for reply in [weather, forecast]:
+                if isinstance(reply, dict) and "message" in reply:
+                    eprint("OpenWeather: {}".format(reply["message"]))
+            if self.data:
+                # better outdated data than none
+                return self.data
+            # error replies, not cached
+            return {"weather": weather, "forecast": forecast, "alerts": None, "time": None} if weather else None
+
+    def request(self, name, url, params):
+        """
+        :return: (decoded reply, the cached one if not modified; None on failure), validators to send next time
+        """
+        cached = self.data.get(name)
+        validators = self.data.get("validators", {}).get(name, {}) if cached else {}
+        headers = {}
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last-modified" in validators:
+            headers["If-Modified-Since"] = validators["last-modified"]
+
+        try:
+            r = get_session().get(url, params=params, headers=headers, timeout=TIMEOUT)
+            if r.status_code == 304:
+                return cached, validators
+            reply = r.json()
+        except Exception as e:
+            eprint("{} request failed: {}".format(name, e))
+            return None, {}
+
+        validators = {}
+        if "ETag" in r.headers:
+            validators["etag"] = r.headers["ETag"]
+        if "Last-Modified" in r.headers:
+            validators["last-modified"] = r.headers["Last-Modified"]
+
+        return reply, validators
+
+
+def get_provider(lat, long, units, lang, appid, weatherbit_key=""):
+    key = (lat, long, units, lang, appid, weatherbit_key)
+    with _lock:
+        if key not in _providers:
+            _providers[key] = WeatherProvider(lat, long, units, lang, appid, weatherbit_key)
+        return _providers[key]
+
+
+def fetch_weather(lat, long, units, lang, appid, weatherbit_key, max_age):
+    return get_provider(lat, long, units, lang, appid, weatherbit_key).fetch(max_age)